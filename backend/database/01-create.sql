@@ -24,6 +24,21 @@ CREATE TABLE notification (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP    
 );
 
+CREATE TABLE notification_outbox (
+    id SERIAL PRIMARY KEY,
+    notification_id INTEGER NOT NULL REFERENCES notification(id),
+    channel VARCHAR(20) NOT NULL,
+    recipient VARCHAR(255) NOT NULL,
+    idempotency_key VARCHAR(64) NOT NULL UNIQUE,
+    status VARCHAR(20) NOT NULL DEFAULT 'PENDING',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP
+);
+CREATE INDEX notification_outbox_due_idx ON notification_outbox (next_attempt_at) WHERE status IN ('PENDING', 'SENDING');
+
 CREATE TABLE pnl_category (
     code VARCHAR(15) PRIMARY KEY,
     name VARCHAR(100) NOT NULL,
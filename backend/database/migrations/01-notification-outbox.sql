@@ -0,0 +1,18 @@
+-- Brings a database created before the notification outbox up to date, 01-create.sql only runs on an empty volume.
+-- Idempotent, apply with: psql "$DATABASE_URL" -f database/migrations/01-notification-outbox.sql
+CREATE TABLE IF NOT EXISTS notification_outbox (
+    id SERIAL PRIMARY KEY,
+    notification_id INTEGER NOT NULL REFERENCES notification(id),
+    channel VARCHAR(20) NOT NULL,
+    recipient VARCHAR(255) NOT NULL,
+    idempotency_key VARCHAR(64) NOT NULL UNIQUE,
+    status VARCHAR(20) NOT NULL DEFAULT 'PENDING',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP
+);
+-- Due entries are PENDING ones & SENDING ones whose lease (next_attempt_at) expired
+DROP INDEX IF EXISTS notification_outbox_pending_idx;
+CREATE INDEX IF NOT EXISTS notification_outbox_due_idx ON notification_outbox (next_attempt_at) WHERE status IN ('PENDING', 'SENDING');
@@ -0,0 +1,199 @@
+"""
+Micro-benchmark of every model in ModelRegistry: train, save, load and predict time plus artifact size,
+at increasing series counts. Results are compared against a JSON baseline and the run exits 1 when any
+metric regresses by more than --tolerance, or 2 when there is no baseline to compare against.
+
+    python benchmarks/model_benchmark.py                      # compare against the stored baseline
+    python benchmarks/model_benchmark.py --update-baseline    # record a new baseline on this machine
+    python benchmarks/model_benchmark.py --models static,autoets --sizes 10,100
+
+Baselines are machine specific, record them on the machine that runs the comparison.
+"""
+import argparse
+from datetime import datetime
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+from dateutil.relativedelta import relativedelta
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")) # forecast_service modules
+from synthetic_pnl import generateSeries, defaultEndMonth
+from models.ModelRegistry import ModelRegistry, MODEL_TO_WEIGHT_EXTENSION_TYPE_MAP
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "model_benchmark.json")
+MODEL_TREND = { # a trend each model serves in TREND_TO_MODEL_MAP, used to shape its synthetic series
+    'sarimax': 'seasonal_with_short_hump',
+    'autoets': 'gradual_steady_increase',
+    'nbeats': 'sales_seasonal_cycle',
+    'lstm': 'proportional_to_sales',
+    'static': 'static'
+}
+TRAINING_PARAMS = {"input_size": 12, "output_size": 3, "epochs": 50} # same as fc_app
+CONTEXT_MONTHS = 12 # forecasting window fc_app passes to predict_batch
+TIME_METRICS = ("train_s", "save_s", "load_s", "predict_s") # artifact_bytes is compared without the noise floor
+QUICK_TRAIN_S = 1.0 # trains faster than this are repeated like the other steps, they are mostly noise otherwise
+
+
+def parseArgs():
+    parser = argparse.ArgumentParser(description="Benchmark train/save/load/predict of every forecasting model")
+    parser.add_argument("--models", default=",".join(ModelRegistry.list_models()), help="comma separated model types")
+    parser.add_argument("--sizes", default="10,100,1000,10000", help="comma separated series counts")
+    parser.add_argument("--months", type=int, default=36, help="months of history per series")
+    parser.add_argument("--n-jobs", type=int, default=1, help="n_jobs passed to train (SERIES_FIT_WORKERS)")
+    parser.add_argument("--repeat", type=int, default=3, help="save, load & predict are repeated, the fastest counts")
+    parser.add_argument("--budget-s", type=float, default=600,
+            help="skip a model's larger sizes once its projected train time exceeds this")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown or growth")
+    parser.add_argument("--min-delta-s", type=float, default=0.05, help="timing differences below this are noise")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    return parser.parse_args()
+
+def generateData(model_type, n_series, n_months, seed):
+    rng = np.random.default_rng(seed)
+    end_month = defaultEndMonth()
+    data = {f"BENCH-{i:05d}::B{i % 100:03d}": generateSeries(MODEL_TREND[model_type], n_months, rng,
+            sales=generateSeries('sales_seasonal_cycle', n_months, rng)).tolist() for i in range(n_series)}
+    data["months"] = [(end_month - relativedelta(months=n_months - 1 - i)).strftime("%m-%Y") for i in range(n_months)]
+    return data
+
+def artifactBytes(artifact_dir):
+    # Everything the model wrote next to its weight file counts towards the artifact
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(artifact_dir) for name in names)
+
+def fastest(fn, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def benchmarkModel(model_type, n_series, args, work_dir):
+    data = generateData(model_type, n_series, args.months, args.seed)
+    series_names = [series_name for series_name in data if series_name != "months"]
+    contexts = [data[series_name][-CONTEXT_MONTHS:] for series_name in series_names]
+    artifact_dir = os.path.join(work_dir, f"{model_type}-{n_series}")
+    os.makedirs(artifact_dir)
+    weight_path = os.path.join(artifact_dir, f"weight.{MODEL_TO_WEIGHT_EXTENSION_TYPE_MAP[model_type]}")
+
+    def train():
+        model = ModelRegistry.create(model_type)
+        model.train(data=data, **TRAINING_PARAMS, n_jobs=args.n_jobs)
+        return model
+    train_s, model = fastest(train, 1)
+    if train_s < QUICK_TRAIN_S and args.repeat > 1:
+        train_s = min(train_s, fastest(train, args.repeat - 1)[0])
+
+    save_s, _ = fastest(lambda: model.save(weight_path), args.repeat)
+    load_s, loaded = fastest(lambda: ModelRegistry.load_model(model_type, weight_path, use_cache=False), args.repeat)
+    predict_s, _ = fastest(lambda: loaded.predict_batch(series_names=series_names, steps=3, contexts=contexts), args.repeat)
+    return {
+        "train_s": round(train_s, 4),
+        "save_s": round(save_s, 4),
+        "load_s": round(load_s, 4),
+        "predict_s": round(predict_s, 4),
+        "artifact_bytes": artifactBytes(artifact_dir)
+    }
+
+def warmUp(model_type, args):
+    # One untimed fit pays for lazy imports & first-call setup, so the order models run in does not matter
+    ModelRegistry.create(model_type).train(data=generateData(model_type, 2, args.months, args.seed), **TRAINING_PARAMS)
+
+def runBenchmarks(args):
+    results = {}
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+    work_dir = tempfile.mkdtemp(prefix="model_benchmark_")
+    try:
+        for model_type in args.models.split(","):
+            results[model_type] = {}
+            warmUp(model_type, args)
+            for i, n_series in enumerate(sizes):
+                print(f" * Benchmarking {model_type} with {n_series} series...")
+                metrics = benchmarkModel(model_type, n_series, args, work_dir)
+                results[model_type][str(n_series)] = metrics
+                print(f" * {model_type} x {n_series}: " + ", ".join(f"{key}={value}" for key, value in metrics.items()))
+                if i + 1 < len(sizes) and metrics["train_s"] * sizes[i + 1] / n_series > args.budget_s:
+                    print(f" * Skipping {model_type} above {n_series} series, projected train time exceeds {args.budget_s}s")
+                    break
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    # results structure: { "sarimax": { "10": {"train_s":..., "save_s":..., ...}, "100": {...} }, "autoets": {...} }
+    return results
+
+def compareToBaseline(results, baseline, tolerance, min_delta_s):
+    """Returns a list of (model, size, metric, baseline value, new value) for every metric that regressed"""
+    regressions = []
+    for model_type, sizes in results.items():
+        for n_series, metrics in sizes.items():
+            expected = baseline.get(model_type, {}).get(n_series)
+            if expected is None:
+                continue
+            for metric, value in metrics.items():
+                if metric not in expected:
+                    continue
+                allowed = expected[metric] * (1 + tolerance)
+                if metric in TIME_METRICS:
+                    allowed = max(allowed, expected[metric] + min_delta_s)
+                if value > allowed:
+                    regressions.append((model_type, n_series, metric, expected[metric], value))
+    return regressions
+
+def main():
+    args = parseArgs()
+    results = runBenchmarks(args)
+    report = {
+        "meta": {
+            "recorded_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "months": args.months,
+            "n_jobs": args.n_jobs
+        },
+        "results": results
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        baseline = {"meta": report["meta"], "results": {}}
+        if os.path.exists(args.baseline): # keep models and sizes that were not re-run
+            with open(args.baseline, "r") as f:
+                baseline = json.load(f)
+            baseline["meta"] = report["meta"]
+        for model_type, sizes in results.items():
+            baseline["results"].setdefault(model_type, {}).update(sizes)
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f" * Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline): # nothing to compare against must not pass as "no regressions"
+        print(f" * No baseline at {args.baseline}, run with --update-baseline to record one")
+        return 2
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+    regressions = compareToBaseline(results, baseline["results"], args.tolerance, args.min_delta_s)
+    for model_type, n_series, metric, expected, value in regressions:
+        print(f" * REGRESSION {model_type} x {n_series} {metric}: {expected} -> {value}")
+    if regressions:
+        print(f" * {len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}")
+        return 1
+    print(f" * No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
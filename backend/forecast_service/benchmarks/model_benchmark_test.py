@@ -0,0 +1,35 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+import model_benchmark
+from model_benchmark import compareToBaseline
+
+class TestCompareToBaseline(unittest.TestCase):
+    def setUp(self):
+        self.baseline = {"sarimax": {"100": {"train_s": 10.0, "predict_s": 0.01, "artifact_bytes": 1000}}}
+
+    def test_flags_metrics_beyond_the_tolerance(self):
+        results = {"sarimax": {"100": {"train_s": 13.0, "predict_s": 0.01, "artifact_bytes": 1300}}}
+        regressions = compareToBaseline(results, self.baseline, tolerance=0.25, min_delta_s=0.05)
+
+        self.assertEqual(regressions, [("sarimax", "100", "train_s", 10.0, 13.0),
+                ("sarimax", "100", "artifact_bytes", 1000, 1300)])
+
+    def test_ignores_timing_noise_and_unknown_entries(self):
+        results = {
+            "sarimax": {"100": {"train_s": 12.0, "predict_s": 0.04, "artifact_bytes": 900}, "1000": {"train_s": 99.0}},
+            "static": {"10": {"train_s": 1.0}}
+        }
+        self.assertEqual(compareToBaseline(results, self.baseline, tolerance=0.25, min_delta_s=0.05), [])
+
+class TestMain(unittest.TestCase):
+    def test_check_fails_without_a_baseline(self):
+        missing = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "missing.json")
+        with patch.object(sys, "argv", ["model_benchmark.py", "--baseline", missing]), \
+                patch.object(model_benchmark, "runBenchmarks", return_value={"static": {"10": {"train_s": 0.1}}}):
+            self.assertEqual(model_benchmark.main(), 2)
+
+if __name__ == '__main__':
+    unittest.main()
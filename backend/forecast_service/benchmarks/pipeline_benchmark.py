@@ -0,0 +1,289 @@
+"""
+End-to-end benchmark of the forecast pipeline on synthetic P&L data.
+
+Loads BUs x codes x months of generated series into a scratch Postgres database, runs processMessage
+with notifications stubbed out and reports wall time, peak RSS and throughput for every phase.
+The first run fits every series; later runs change --changed-fraction of the series first, like a monthly upload.
+
+    python benchmarks/pipeline_benchmark.py --database-url postgresql://.../bench_db --bus 20 --codes-per-trend 10
+
+The pipeline's upserts are Postgres-only, so there is no SQLite mode. Use a database you can throw away:
+the app's tables are dropped and recreated when --reset is given.
+"""
+import argparse
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+from dateutil.relativedelta import relativedelta
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")) # forecast_service modules
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "shared"))
+from synthetic_pnl import generateDataset, defaultEndMonth
+from kpi_engine import PROFIT_KPIS, SALES_KPIS, COST_KPIS, KPI_ALIASES
+from run_status import RunStatus
+
+try:
+    import psutil # counts the trend worker processes too
+except ImportError:
+    psutil = None
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "database", "01-create.sql")
+INSERT_CHUNK_SIZE = 5000
+
+
+class RSSSampler:
+    """Samples the resident memory of this process and its children, keeping the peak of each phase"""
+
+    def __init__(self, interval_s=0.05):
+        self.interval_s = interval_s
+        self.peaks = {}
+        self._phase = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def begin(self, phase):
+        self.peaks[phase] = self.rss() # seeded before the sampling thread sees the new phase
+        self._phase = phase
+
+    def rss(self):
+        if psutil is None: # peak so far of this process only
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        process = psutil.Process()
+        total = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            phase = self._phase
+            if phase is not None:
+                self.peaks[phase] = max(self.peaks[phase], self.rss())
+
+
+class BenchmarkStatus(RunStatus):
+    """Run status that keeps phase timings in memory and marks phase boundaries for the RSS sampler"""
+
+    def __init__(self, sampler):
+        super().__init__(None, [], observer=self._observe)
+        self.sampler = sampler
+        self.timings = []
+
+    @contextmanager
+    def phase(self, name):
+        self.sampler.begin(name)
+        with super().phase(name):
+            yield
+
+    def _observe(self, name, duration_s):
+        self.timings.append((name, duration_s))
+
+    def _write(self, fields):
+        pass
+
+
+def parseArgs():
+    parser = argparse.ArgumentParser(description="Benchmark processMessage on synthetic P&L data")
+    parser.add_argument("--database-url", default=os.environ.get("BENCHMARK_DATABASE_URL"),
+            help="scratch Postgres database (default: $BENCHMARK_DATABASE_URL)")
+    parser.add_argument("--reset", action="store_true", help="drop and recreate the app's tables in that database")
+    parser.add_argument("--bus", type=int, default=5, help="number of business units")
+    parser.add_argument("--codes-per-trend", type=int, default=5, help="P&L codes generated for each trend type")
+    parser.add_argument("--months", type=int, default=36, help="months of history per series")
+    parser.add_argument("--end-month", default=defaultEndMonth().strftime("%m-%Y"), help="latest month, MM-YYYY")
+    parser.add_argument("--training-months", type=int, default=36, help="overrides TRAINING_DATA_MONTHS")
+    parser.add_argument("--employees-per-bu", type=int, default=2)
+    parser.add_argument("--runs", type=int, default=2)
+    parser.add_argument("--changed-fraction", type=float, default=0.1,
+            help="share of series whose latest month changes before every run after the first")
+    parser.add_argument("--forecast-workers", type=int, default=1, help="FORECAST_WORKERS for the run")
+    parser.add_argument("--series-fit-workers", type=int, default=1, help="SERIES_FIT_WORKERS for the run")
+    parser.add_argument("--write-notifications", action="store_true", help="insert notifications and outbox rows")
+    parser.add_argument("--work-dir", help="where model weights are written (default: a temporary directory)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url or $BENCHMARK_DATABASE_URL is required")
+    return args
+
+def prepareDatabase(engine, base, reset):
+    from sqlalchemy import inspect
+    with engine.begin() as conn:
+        existing = set(inspect(conn).get_table_names()) & set(base.metadata.tables)
+        if existing and not reset:
+            sys.exit(f"Database already has {len(existing)} app tables, pass --reset to drop them")
+        base.metadata.drop_all(conn)
+        with open(SCHEMA_PATH, "r") as f:
+            conn.exec_driver_sql(f.read())
+
+def loadDataset(engine, dataset, args):
+    from db_classes import BusinessUnit, PNLCategory, PNLEntry, KPICategory, Employee, Parameter
+    rng = np.random.default_rng(args.seed + 1)
+    end_month = dataset["months"][-1]
+    forecast_months = [end_month + relativedelta(months=i) for i in range(1, 4)]
+    kpi_categories = [(alias, "PROFIT") for alias in PROFIT_KPIS] + [(alias, "SALES") for alias in SALES_KPIS] \
+            + [(alias, "COST") for alias in COST_KPIS]
+    employees = [{"id": f"{bu}-E{i}", "name": f"Employee {i} of {bu}", "email": f"{bu.lower()}.{i}@example.com",
+            "phone_number": f"+100{bu[1:]}{i:03d}", "role": "manager", "business_unit": bu, "password_hash": "x",
+            "created_at": datetime.now()} for bu in dataset["business_units"] for i in range(args.employees_per_bu)]
+
+    tables = [
+        (BusinessUnit, [{"alias": bu, "name": f"Business unit {bu}"} for bu in dataset["business_units"]]),
+        (PNLCategory, dataset["categories"]),
+        (PNLEntry, [{"pnl_code": code, "business_unit": bu, "month": month, "value": float(value)}
+                for (code, bu), values in dataset["series"].items() for month, value in zip(dataset["months"], values)]),
+        (KPICategory, [{"alias": alias, "name": alias, "category": category} for alias, category in kpi_categories]),
+        (Employee, employees),
+        (Parameter, [{"employee_id": employee["id"], "kpi_alias": alias, "month": month,
+                "value": float(rng.uniform(0, 100))} for employee in employees for alias in KPI_ALIASES
+                for month in forecast_months])
+    ]
+    with engine.begin() as conn:
+        for table, rows in tables:
+            for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+                conn.execute(table.__table__.insert(), rows[start:start + INSERT_CHUNK_SIZE])
+
+def perturbLatestMonth(engine, dataset, fraction, rng):
+    """Change the latest value of a share of the series, like a re-uploaded month would"""
+    from sqlalchemy import update, bindparam
+    from db_classes import PNLEntry
+    keys = list(dataset["series"])
+    picked = rng.choice(len(keys), size=int(round(len(keys) * fraction)), replace=False)
+    rows = [{"code": keys[i][0], "bu": keys[i][1], "value": float(dataset["series"][keys[i]][-1] * rng.uniform(0.8, 1.2))}
+            for i in picked]
+    if rows:
+        with engine.begin() as conn:
+            conn.execute(update(PNLEntry.__table__)
+                    .where(PNLEntry.__table__.c.pnl_code == bindparam("code"))
+                    .where(PNLEntry.__table__.c.business_unit == bindparam("bu"))
+                    .where(PNLEntry.__table__.c.month == dataset["months"][-1])
+                    .values(value=bindparam("value")), rows)
+    return len(rows)
+
+def stubNotification(dbSession, employee, subject, body):
+    return {"employee_id": employee["id"], "subject": subject, "body": body}
+
+def phaseItems(name, dataset, args, window_months):
+    n_series = len(dataset["series"])
+    n_bus = len(dataset["business_units"])
+    if name == "load":
+        return n_series * window_months, "entries"
+    if name == "train_forecast":
+        return n_series, "series"
+    if ":" in name: # train:<trend> or forecast:<trend>
+        return n_bus * args.codes_per_trend, "series"
+    if name == "store_forecasts":
+        return n_series * 3, "rows"
+    if name == "kpi":
+        return n_bus * 3 * len(KPI_ALIASES), "rows"
+    if name == "notify":
+        return n_bus * args.employees_per_bu, "employees"
+    return 0, ""
+
+def runBenchmark(fc_app, engine, dataset, args):
+    rng = np.random.default_rng(args.seed + 2)
+    window_months = min(args.months, max(args.training_months, fc_app.FORECAST_DATA_MONTHS))
+    message = json.dumps({"full": True, "run_ids": []})
+    results = []
+    for run in range(1, args.runs + 1):
+        changed = perturbLatestMonth(engine, dataset, args.changed_fraction, rng) if run > 1 else len(dataset["series"])
+        sampler = RSSSampler()
+        status = BenchmarkStatus(sampler)
+        dbSession = fc_app.SessionLocal()
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            fc_app.processMessage(message, dbSession, status)
+        finally:
+            total_s = time.perf_counter() - start
+            sampler.stop()
+            dbSession.close()
+
+        phases = []
+        for name, duration_s in status.timings:
+            items, unit = phaseItems(name, dataset, args, window_months)
+            peak = sampler.peaks.get(name)
+            phases.append({
+                "name": name,
+                "wall_s": round(duration_s, 4),
+                "peak_rss_mb": round(peak / 1024 ** 2, 1) if peak is not None else None,
+                "items": items,
+                "unit": unit,
+                "items_per_s": round(items / duration_s, 1) if duration_s > 0 else None
+            })
+        results.append({
+            "run": run,
+            "changed_series": changed,
+            "total_s": round(total_s, 4),
+            "peak_rss_mb": round(max(sampler.peaks.values(), default=0) / 1024 ** 2, 1),
+            "series_per_s": round(len(dataset["series"]) / total_s, 1),
+            "phases": phases
+        })
+    return results
+
+def printResults(results, dataset):
+    print(f"\n{len(dataset['business_units'])} BUs x {len(dataset['categories'])} codes x {len(dataset['months'])} months"
+            f" = {len(dataset['series'])} series" + ("" if psutil else " (peak RSS without psutil: this process only)"))
+    for result in results:
+        print(f"\nRun {result['run']}: {result['changed_series']} series changed, {result['total_s']:.2f}s total,"
+                f" {result['series_per_s']} series/s, peak RSS {result['peak_rss_mb']} MB")
+        print(f"  {'phase':<38}{'wall s':>10}{'peak MB':>10}{'items':>10}  {'throughput':<20}")
+        for phase in result["phases"]:
+            peak = "" if phase["peak_rss_mb"] is None else phase["peak_rss_mb"]
+            rate = "" if phase["items_per_s"] is None else f"{phase['items_per_s']} {phase['unit']}/s"
+            print(f"  {phase['name']:<38}{phase['wall_s']:>10.3f}{peak:>10}{phase['items']:>10}  {rate:<20}")
+
+def main():
+    args = parseArgs()
+    # fc_app reads its configuration at import time
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("REDIS_URL", "localhost:6379") # never contacted, the benchmark keeps run status in memory
+    os.environ.setdefault("REDIS_TOPIC", "benchmark")
+    os.environ["FORECAST_WORKERS"] = str(args.forecast_workers)
+    os.environ["SERIES_FIT_WORKERS"] = str(args.series_fit_workers)
+    import fc_app
+    from db_classes import base
+    fc_app.TRAINING_DATA_MONTHS = args.training_months
+    if not args.write_notifications:
+        fc_app.insertDBNotification = stubNotification
+
+    end_month = datetime.strptime(args.end_month, "%m-%Y").date()
+    dataset = generateDataset(args.bus, args.codes_per_trend, args.months, end_month, args.seed)
+    prepareDatabase(fc_app.engine, base, args.reset)
+    start = time.perf_counter()
+    loadDataset(fc_app.engine, dataset, args)
+    print(f" * Loaded {len(dataset['series']) * len(dataset['months'])} synthetic P&L entries in {time.perf_counter() - start:.2f}s")
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="pipeline_benchmark_")
+    os.makedirs(work_dir, exist_ok=True)
+    os.chdir(work_dir) # weights/<trend>/ is relative to the working directory
+    print(f" * Writing model weights under {work_dir}")
+
+    results = runBenchmark(fc_app, fc_app.engine, dataset, args)
+    printResults(results, dataset)
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
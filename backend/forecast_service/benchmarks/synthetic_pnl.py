@@ -0,0 +1,65 @@
+from datetime import date
+from dateutil.relativedelta import relativedelta
+import numpy as np
+
+# P&L code prefix per trend, so the synthetic codes land in the KPI buckets a real report would
+TREND_CODE_PREFIX = {
+    'sales_seasonal_cycle': '5000-S',
+    'gradual_steady_increase': '5000-G',
+    'proportional_to_sales': '6000-P',
+    'profit_linked': '8000-L',
+    'gentle_drift_noise': '9010-D',
+    'rate_cycle_rise_ease': '9020-R',
+    'seasonal_with_short_hump': '9000-H',
+    'static': '9020-C'
+}
+
+
+def generateSeries(trend_name, n_months, rng, sales=None):
+    """One monthly series shaped after a trend type. sales is the BU's sales series, used by the sales-linked trends"""
+    t = np.arange(n_months)
+    level = rng.uniform(5_000, 50_000)
+    noise = rng.normal(0, 0.02 * level, n_months)
+    if trend_name == 'sales_seasonal_cycle':
+        values = level * (1 + 0.004 * t + 0.25 * np.sin(2 * np.pi * (t + rng.integers(12)) / 12)) + noise
+    elif trend_name == 'gradual_steady_increase':
+        values = level * (1 + rng.uniform(0.005, 0.02) * t) + noise
+    elif trend_name == 'proportional_to_sales':
+        values = rng.uniform(0.3, 0.7) * sales + noise * 0.5
+    elif trend_name == 'profit_linked':
+        values = rng.uniform(0.02, 0.1) * sales + noise * 0.1
+    elif trend_name == 'gentle_drift_noise':
+        values = level + np.cumsum(rng.normal(0.002 * level, 0.01 * level, n_months)) + noise
+    elif trend_name == 'rate_cycle_rise_ease':
+        values = level * (1 + 0.3 * np.sin(2 * np.pi * t / rng.integers(24, 48))) + noise
+    elif trend_name == 'seasonal_with_short_hump':
+        hump_month = rng.integers(12)
+        values = level * (1 + 0.8 * np.isin(t % 12, [hump_month, (hump_month + 1) % 12])) + noise
+    elif trend_name == 'static':
+        values = np.full(n_months, round(level, -2))
+    else:
+        raise ValueError(f"Unknown trend: {trend_name}")
+    return np.round(np.maximum(values, 0), 2)
+
+def generateDataset(n_bus, codes_per_trend, n_months, end_month, seed=0):
+    """
+    Synthetic P&L for n_bus BUs with codes_per_trend codes of every trend type over n_months months up to end_month.
+    Returns {"business_units": [...], "categories": [{code, name, trend}], "months": [date, ...],
+    "series": {(code, bu): np.ndarray}}
+    """
+    rng = np.random.default_rng(seed)
+    months = [end_month - relativedelta(months=n_months - 1 - i) for i in range(n_months)]
+    business_units = [f"B{i:03d}" for i in range(n_bus)]
+    categories = [{"code": f"{prefix}{i:03d}", "name": f"Synthetic {trend_name} {i}", "trend": trend_name}
+            for trend_name, prefix in TREND_CODE_PREFIX.items() for i in range(codes_per_trend)]
+
+    series = {}
+    for bu in business_units:
+        sales = generateSeries('sales_seasonal_cycle', n_months, rng) # drives the sales-linked codes of this BU
+        for category in categories:
+            series[(category["code"], bu)] = generateSeries(category["trend"], n_months, rng, sales)
+    return {"business_units": business_units, "categories": categories, "months": months, "series": series}
+
+def defaultEndMonth():
+    today = date.today()
+    return date(today.year, today.month, 1) - relativedelta(months=1)
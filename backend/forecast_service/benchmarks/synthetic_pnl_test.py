@@ -0,0 +1,32 @@
+import unittest
+import os
+import sys
+from datetime import date
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "shared"))
+from synthetic_pnl import generateDataset, TREND_CODE_PREFIX
+from kpi_engine import BUCKETS, codeBuckets
+
+class TestSyntheticPNL(unittest.TestCase):
+    def test_dataset_shape_and_determinism(self):
+        dataset = generateDataset(3, 2, 24, date(2025, 6, 1), seed=7)
+
+        self.assertEqual(len(dataset["business_units"]), 3)
+        self.assertEqual(len(dataset["categories"]), 2 * len(TREND_CODE_PREFIX))
+        self.assertEqual(len(dataset["series"]), 3 * 2 * len(TREND_CODE_PREFIX))
+        self.assertEqual((dataset["months"][0], dataset["months"][-1]), (date(2023, 7, 1), date(2025, 6, 1)))
+        self.assertTrue(all(len(values) == 24 and (values >= 0).all() for values in dataset["series"].values()))
+
+        again = generateDataset(3, 2, 24, date(2025, 6, 1), seed=7)
+        self.assertTrue(all((again["series"][key] == values).all() for key, values in dataset["series"].items()))
+
+    def test_codes_feed_the_kpi_buckets(self):
+        dataset = generateDataset(1, 1, 12, date(2025, 6, 1))
+        buckets = {BUCKETS[i] for category in dataset["categories"]
+                for i, member in enumerate(codeBuckets(category["code"])) if member}
+
+        self.assertTrue({"sales_revenue", "cogs", "other_incomes", "expenses", "op_expenses"} <= buckets)
+        self.assertTrue(all(len(category["code"]) <= 15 for category in dataset["categories"]))
+
+if __name__ == '__main__':
+    unittest.main()
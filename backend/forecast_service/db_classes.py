@@ -62,6 +62,35 @@ class Notification(base):
             'created_at': self.created_at.strftime('%d-%m-%Y %H:%M:%S') if self.created_at else None
         }
     
+class NotificationOutbox(base):
+    __tablename__ = 'notification_outbox'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    notification_id = Column(Integer, ForeignKey('notification.id'), nullable=False)
+    channel = Column(String(20), nullable=False)
+    recipient = Column(String(255), nullable=False)
+    idempotency_key = Column(String(64), nullable=False, unique=True)
+    status = Column(String(20), nullable=False, server_default=text("'PENDING'"))
+    attempts = Column(Integer, nullable=False, server_default=text('0'))
+    next_attempt_at = Column(DateTime, nullable=False, server_default=text('CURRENT_TIMESTAMP'))
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, server_default=text('CURRENT_TIMESTAMP'))
+    sent_at = Column(DateTime, nullable=True)
+
+    def json(self):
+        return {
+            'id': self.id,
+            'notification_id': self.notification_id,
+            'channel': self.channel,
+            'recipient': self.recipient,
+            'idempotency_key': self.idempotency_key,
+            'status': self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.strftime('%d-%m-%Y %H:%M:%S') if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.strftime('%d-%m-%Y %H:%M:%S') if self.created_at else None,
+            'sent_at': self.sent_at.strftime('%d-%m-%Y %H:%M:%S') if self.sent_at else None
+        }
+
 class PNLCategory(base):
     __tablename__ = 'pnl_category'
     code = Column(String(15), primary_key=True)
@@ -1,21 +1,31 @@
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 import os
+import sys
+import socket
+import threading
+import uuid
+import json
+import hashlib
 import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
 from dotenv import load_dotenv
-import requests
 
-import pandas as pd
-from sqlalchemy import create_engine, select
+import numpy as np
+import torch
+from sqlalchemy import create_engine, select, cast, Float, literal_column
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import sessionmaker
 import redis
-
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
 
 from db_classes import *
-from models.ModelRegistry import ModelRegistry
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared")) # shared/ is copied next to the app in Docker
+from kpi_engine import calculateKPIMatrix, kpiRowToDict
+from run_status import RunStatus, now
+from snapshot import PNLSnapshot
+from models.ModelRegistry import ModelRegistry, MODEL_TO_WEIGHT_EXTENSION_TYPE_MAP, LEGACY_WEIGHT_EXTENSION_TYPE_MAP
 
 load_dotenv()
 
@@ -24,16 +34,25 @@ engine = create_engine(os.environ.get("DATABASE_URL"), pool_size=10, max_overflo
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Redis Consumer Setup
-REDIS_URL = os.environ.get("REDIS_URL").split(":") #TODO: Might need to switch to RabbitMQ for one-time consume & guaranteed delivery
-REDIS_TOPIC = os.environ.get("REDIS_TOPIC")
+REDIS_URL = os.environ.get("REDIS_URL").split(":")
+REDIS_TOPIC = os.environ.get("REDIS_TOPIC") # Redis stream written by main_service
+REDIS_GROUP = os.environ.get("REDIS_GROUP", "forecast_service") # workers in one group share the triggers
+REDIS_CONSUMER = os.environ.get("REDIS_CONSUMER", socket.gethostname()) # must be unique per worker
+REDIS_BLOCK_MS = int(os.environ.get("REDIS_BLOCK_MS", 5000))
+REDIS_CLAIM_IDLE_MS = int(os.environ.get("REDIS_CLAIM_IDLE_MS", 30 * 60 * 1000)) # longer than any forecast run
+REDIS_MAX_DELIVERIES = int(os.environ.get("REDIS_MAX_DELIVERIES", 5)) # then the trigger is dropped
+TRIGGER_DEBOUNCE_MS = int(os.environ.get("TRIGGER_DEBOUNCE_MS", 15000)) # quiet period that closes a burst of triggers
+TRIGGER_DEBOUNCE_MAX_MS = int(os.environ.get("TRIGGER_DEBOUNCE_MAX_MS", 120000)) # never hold a run back longer than this
+RUN_LOCK_KEY = f"{REDIS_TOPIC}:run-lock" # single-flight lock shared by every worker
+RUN_DEFERRED_KEY = f"{REDIS_TOPIC}:run-deferred" # triggers that arrived during a run, for its follow-up run
+DEAD_LETTER_TOPIC = f"{REDIS_TOPIC}:dead" # triggers dropped after REDIS_MAX_DELIVERIES, kept for inspection & replay
+RUN_LOCK_TTL_MS = int(os.environ.get("RUN_LOCK_TTL_MS", 60000)) # renewed while the run is alive
+RUN_STATUS_TTL_S = int(os.environ.get("RUN_STATUS_TTL_S", 7 * 24 * 3600)) # how long a run's status can be polled
 r = redis.Redis(host=REDIS_URL[0], port=REDIS_URL[1])
-consumer = r.pubsub()
-
-# Notification Constants
-WHATSAPP_PHONE_ID = os.getenv("WHATSAPP_PHONE_ID")
-WHATSAPP_ACCESS_TOKEN = os.getenv("WHATSAPP_ACCESS_TOKEN")
-SENDER_EMAIL = os.getenv("SENDER_EMAIL")
-SENDER_PASSWORD = os.getenv("SENDER_PASSWORD")
+release_lock_script = r.register_script(
+    "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end")
+renew_lock_script = r.register_script(
+    "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) else return 0 end")
 
 # Forecasting Models Constants
 TREND_TO_MODEL_MAP = {
@@ -47,99 +66,305 @@ TREND_TO_MODEL_MAP = {
     'static': 'static'
 }
 TREND_SET = set(TREND_TO_MODEL_MAP.keys())
-MODEL_TO_WEIGHT_EXTENSION_TYPE_MAP = {
-    'sarimax': 'pkl',
-    'autoets': 'json',
-    'lstm': 'pt',
-    'nbeats': 'ckpt',
-    'static': 'json'
+TRAINING_PARAMS = { # Hyperparameters passed to every model's train, part of each series' fingerprint
+    "input_size": 12,
+    "output_size": 3,
+    "epochs": 50
 }
 TRAINING_DATA_MONTHS = 12
 FORECAST_DATA_MONTHS = 12
+DB_WRITE_CHUNK_SIZE = 1000 # Rows per multi-row upsert statement
+
+# Parallelism Constants
+FORECAST_WORKERS = int(os.environ.get("FORECAST_WORKERS", 1)) # Number of trends trained & forecasted concurrently, 1 runs in-process
+SERIES_FIT_WORKERS = int(os.environ.get("SERIES_FIT_WORKERS", 1)) # Processes per trend for fitting statistical models series-by-series, nested under FORECAST_WORKERS
+MODEL_CACHE_MB = int(os.environ.get("MODEL_CACHE_MB", 512)) # Bound on loaded models kept in memory between train, forecast & runs
+ModelRegistry.set_cache_limit(MODEL_CACHE_MB * 1024 ** 2)
+
+# Metrics Setup (scraped from METRICS_PORT, worker processes report back to this process)
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 5011))
+DURATION_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+PHASE_SECONDS = Histogram("forecast_phase_seconds", "Wall time of each forecast run phase", ["phase"],
+        buckets=DURATION_BUCKETS)
+TREND_STEP_SECONDS = Histogram("forecast_trend_step_seconds", "Train and forecast time of each trend",
+        ["step", "trend", "model"], buckets=DURATION_BUCKETS)
+SERIES_FITTED = Counter("forecast_series_fitted", "Series fitted successfully", ["model"])
+SERIES_FAILED = Counter("forecast_series_failed", "Series that failed to fit", ["model"])
+DB_ROWS_WRITTEN = Counter("forecast_db_rows_written", "Rows inserted or updated by forecast runs", ["table", "change"])
+RUNS = Counter("forecast_runs", "Forecast runs by outcome", ["outcome"])
+TRIGGERS_RECEIVED = Counter("forecast_triggers_received", "Trigger messages taken from the Redis stream")
+SECONDS_SINCE_LAST_TRIGGER = Gauge("forecast_seconds_since_last_trigger", "Time since this worker last received a trigger")
+last_trigger_time = float("nan") # NaN until the first trigger
+SECONDS_SINCE_LAST_TRIGGER.set_function(lambda: time.time() - last_trigger_time)
 
 # App Functionality
 def runConsumer():
     try: 
         dbSession = SessionLocal() # Try to set up DB session
-        consumer.subscribe(REDIS_TOPIC) # Try to subscribe
+        createConsumerGroup()
+        print(f" * Joined Redis stream {REDIS_TOPIC} as {REDIS_CONSUMER} in group {REDIS_GROUP}",
+                "\n * Listening for messages...")
+        entries = readMessages("0") # triggers this worker took but never acknowledged before a restart
         while True:
-            message = consumer.get_message(timeout=1.0) # Polls for new messages at interval of 1 second
-            if message == None:
-                continue
-            if message['type'] == 'subscribe': # Indicates successful subscription
-                print(f" * Subscribed to Redis topic successfully:", message['channel'].decode(), 
-                        "\n * Listening for messages...")
-                continue
-            print(" * Received message:", message)
-            if message['type'] == 'message':
-                processMessage(message['data'].decode(),dbSession)
-                print(f" * Message processed successfully, listening for more messages...")
-            time.sleep(0.1) # Apparently avoids some error
+            entries += claimStaleMessages()
+            if entries:
+                entries += collectTriggers() # let a burst of uploads settle into one run
+                handleTriggers(entries, dbSession)
+            elif r.exists(RUN_DEFERRED_KEY) and not r.exists(RUN_LOCK_KEY): # deferred to a run that ended or died first
+                handleTriggers([], dbSession)
+            entries = readMessages(">", block=REDIS_BLOCK_MS) # blocks until a new trigger arrives
     except KeyboardInterrupt:
         print(" * Service interrupted manually by user")
     finally:
-        consumer.unsubscribe()
         dbSession.close()
-        
+
+def createConsumerGroup():
+    try:
+        r.xgroup_create(REDIS_TOPIC, REDIS_GROUP, id="0", mkstream=True)
+    except redis.exceptions.ResponseError as e:
+        if "BUSYGROUP" not in str(e): # group already exists
+            raise
+
+def readMessages(start_id, block=None):
+    response = r.xreadgroup(REDIS_GROUP, REDIS_CONSUMER, {REDIS_TOPIC: start_id}, count=10, block=block)
+    return [entry for _, entries in response for entry in entries if entry[1]] # deleted entries come back empty
+
+def claimStaleMessages():
+    # Take over triggers left pending by a worker that died mid-run
+    _, claimed, _ = r.xautoclaim(REDIS_TOPIC, REDIS_GROUP, REDIS_CONSUMER, min_idle_time=REDIS_CLAIM_IDLE_MS, count=10)
+    stale = []
+    for entry_id, fields in claimed:
+        deliveries = r.xpending_range(REDIS_TOPIC, REDIS_GROUP, min=entry_id, max=entry_id, count=1)
+        if deliveries and deliveries[0]["times_delivered"] > REDIS_MAX_DELIVERIES:
+            print(f" * Dropping message {entry_id.decode()} to {DEAD_LETTER_TOPIC} after {REDIS_MAX_DELIVERIES} failed deliveries")
+            deadLetter(entry_id, fields, deliveries[0]["times_delivered"])
+        else:
+            stale.append((entry_id, fields))
+    return stale
+
+def deadLetter(entry_id, fields, times_delivered):
+    pipe = r.pipeline() # MULTI/EXEC, so the trigger is either dead-lettered & acknowledged or still pending
+    pipe.xadd(DEAD_LETTER_TOPIC, {**fields, b"entry_id": entry_id, b"times_delivered": times_delivered})
+    pipe.xack(REDIS_TOPIC, REDIS_GROUP, entry_id)
+    pipe.execute()
+    newRunStatus(triggerRunIds(fields[b"message"].decode())).finish(
+            f"Trigger dropped after {times_delivered} deliveries, see {DEAD_LETTER_TOPIC}")
+
+def collectTriggers():
+    collected = []
+    deadline = time.monotonic() + TRIGGER_DEBOUNCE_MAX_MS / 1000
+    while True:
+        wait_ms = int(min(TRIGGER_DEBOUNCE_MS, (deadline - time.monotonic()) * 1000))
+        if wait_ms < 1:
+            break
+        new_entries = readMessages(">", block=wait_ms)
+        if not new_entries:
+            break
+        collected += new_entries
+    return collected
+
+def handleTriggers(entries, dbSession):
+    global last_trigger_time
+    entry_ids = [entry_id for entry_id, _ in entries]
+    messages = [fields[b"message"].decode() for _, fields in entries]
+    if entry_ids:
+        print(f" * Received {len(entries)} message(s):", ", ".join(entry_id.decode() for entry_id in entry_ids))
+        TRIGGERS_RECEIVED.inc(len(entries))
+        last_trigger_time = time.time()
+    token = acquireRunLock()
+    if token is None: # another worker is mid-run, it will do one follow-up run for these
+        if messages:
+            r.rpush(RUN_DEFERRED_KEY, *messages)
+        acknowledge(entry_ids)
+        print(" * Forecast run already in progress, queued a follow-up run")
+        return
+
+    stop_renewal = threading.Event()
+    renewal = threading.Thread(target=renewRunLock, args=(token, stop_renewal), daemon=True)
+    renewal.start()
+    try:
+        deferred = drainDeferredTriggers() # acknowledged already, only kept in the deferred list
+        messages += deferred # this run covers every trigger so far
+        while messages:
+            message = mergeTriggerMessages(messages)
+            status = newRunStatus(triggerRunIds(message)) # shared by every coalesced trigger
+            status.start()
+            try:
+                processMessage(message, dbSession, status)
+                status.finish()
+                RUNS.labels("succeeded").inc()
+            except Exception as e:
+                dbSession.rollback()
+                status.finish(e) # back to RUNNING when the retry picks it up
+                RUNS.labels("failed").inc()
+                if deferred: # stream entries stay pending, deferred triggers must go back to the list for the next attempt
+                    r.rpush(RUN_DEFERRED_KEY, *deferred)
+                print(f" * Error processing message(s), leaving them pending for retry:", str(e))
+                return
+            acknowledge(entry_ids) # only acknowledge once the run's DB writes are done
+            entry_ids = []
+            messages = deferred = drainDeferredTriggers()
+            if messages:
+                print(" * Triggers arrived during the run, starting one follow-up run...")
+        print(f" * Message processed successfully, listening for more messages...")
+    finally:
+        stop_renewal.set()
+        renewal.join()
+        release_lock_script(keys=[RUN_LOCK_KEY], args=[token])
+
+def drainDeferredTriggers():
+    pipe = r.pipeline() # MULTI/EXEC, so no trigger pushed in between is lost
+    pipe.lrange(RUN_DEFERRED_KEY, 0, -1)
+    pipe.delete(RUN_DEFERRED_KEY)
+    messages, _ = pipe.execute()
+    return [message.decode() for message in messages]
+
+def acknowledge(entry_ids):
+    if entry_ids:
+        r.xack(REDIS_TOPIC, REDIS_GROUP, *entry_ids)
+
+def acquireRunLock():
+    token = uuid.uuid4().hex
+    return token if r.set(RUN_LOCK_KEY, token, nx=True, px=RUN_LOCK_TTL_MS) else None
+
+def renewRunLock(token, stop_renewal):
+    while not stop_renewal.wait(RUN_LOCK_TTL_MS / 3000):
+        if not renew_lock_script(keys=[RUN_LOCK_KEY], args=[token, RUN_LOCK_TTL_MS]):
+            print(" * Lost the forecast run lock, another run may start concurrently")
+            return
+
+# Run Status & Metrics Functions
+def newRunStatus(run_ids):
+    return RunStatus(r, run_ids, RUN_STATUS_TTL_S, observer=observePhase)
+
+def observePhase(name, duration_s):
+    if ":" in name: # train:<trend> or forecast:<trend>
+        step, trend_name = name.split(":", 1)
+        TREND_STEP_SECONDS.labels(step, trend_name, TREND_TO_MODEL_MAP[trend_name]).observe(duration_s)
+    else:
+        PHASE_SECONDS.labels(name).observe(duration_s)
+
+def countRowsWritten(table, change_statuses):
+    counts = {}
+    for change_status in change_statuses:
+        counts[change_status] = counts.get(change_status, 0) + 1
+    for change_status, count in counts.items():
+        DB_ROWS_WRITTEN.labels(table, change_status).inc(count)
+
+def recordTrendReport(status, trend_name, report):
+    for name, started_at, duration_s in report["phases"]:
+        status.record(name, duration_s, started_at)
+    model_name = TREND_TO_MODEL_MAP[trend_name]
+    SERIES_FITTED.labels(model_name).inc(report["series_fitted"])
+    SERIES_FAILED.labels(model_name).inc(report["series_failed"])
+
+# Trigger Scope Functions
+def parseTriggerScope(message):
+    payload = json.loads(message)
+    if not isinstance(payload, dict) or payload.get("full"): # "initiate" from older producers is also full
+        return None
+    return {
+        "months": set(payload.get("months", [])) | ({payload["month"]} if payload.get("month") else set()),
+        "business_units": {bu.strip().upper() for bu in payload.get("business_units", [])},
+        "codes": {code.strip() for code in payload.get("codes", [])}
+    }
+
+def triggerRunIds(message):
+    payload = json.loads(message)
+    if not isinstance(payload, dict):
+        return []
+    return payload.get("run_ids", []) + ([payload["run_id"]] if payload.get("run_id") else [])
+
+def mergeTriggerMessages(messages):
+    scope = {"months": set(), "business_units": set(), "codes": set()}
+    full = False
+    for message in messages:
+        message_scope = parseTriggerScope(message)
+        if message_scope is None: # one full trigger makes the whole run full
+            full = True
+        else:
+            for key in scope:
+                scope[key] |= message_scope[key]
+    run_ids = list(dict.fromkeys(run_id for message in messages for run_id in triggerRunIds(message)))
+    if full:
+        return json.dumps({"full": True, "run_ids": run_ids})
+    return json.dumps({**{key: sorted(values) for key, values in scope.items()}, "run_ids": run_ids})
+
+def isInScope(series_name, scope):
+    if scope is None:
+        return True
+    pnl_code, business_unit = series_name.split("::")
+    return pnl_code in scope["codes"] and business_unit in scope["business_units"]
+
+def filterToScope(data, scope):
+    return {series_name: values for series_name, values in data.items()
+            if series_name == "months" or isInScope(series_name, scope)}
+
 # Business Logic (Generate forecasts)
-def processMessage(message, dbSession):
+def processMessage(message, dbSession, status=None):
     print(" * Processing message: " + message + "...")
-    latest_date = getLatestPNLEntryDate(dbSession)
-
-    # Model Training Phase
-    training_data = retrieveTrainingData(dbSession, latest_date)
-    for trend_name in TREND_SET:
-        # if trend_name != "gentle_drift_noise": #TEST 
-        #     continue #TEST
-        train_status = trainForTrend(trend_name.lower(), training_data[trend_name])
-        if train_status:
-            pass # Send a redis message if needed
-
-    # Forecasting Phase
+    scope = parseTriggerScope(message) # None means every series, BU and code
+    status = status or newRunStatus([]) # untracked, phases only feed the metrics
     output_data = {
         "pnl_forecasts": [],
         "kpi_forecasts": [],
         "notifications": []
     }
-    all_forecasts = {} # Format for KPI calculation function >> looks like {"BB1":[{"A001-0001":3},{},{}]}
-    
-    forecasted_months = [(latest_date+relativedelta(months=i)).strftime("%m-%Y") for i in range(1,4)]
-    forecasting_data = retrieveForecastingData(dbSession, latest_date)
-    print(" * Generating forecasts for months: ", ", ".join(forecasted_months))
-    for trend_name in TREND_SET:
-        # if trend_name != "gentle_drift_noise": #TEST
-        #     continue #TEST
-        model_forecasts = forecastForTrend(trend_name.lower(), forecasting_data[trend_name]) # outputs data like {"A001-0001::BB1":[val1,val2,val3],...}
-        print(f" * Updating forecasts in DB for {trend_name}...")
-        output_data["pnl_forecasts"].append(updateDBForecasts(dbSession, forecasted_months, model_forecasts))
-        
-        for cat_bu, fcs in model_forecasts.items():
-            pnl_category, business_unit = cat_bu.split("::")
-            if business_unit not in all_forecasts:
-                all_forecasts[business_unit] = [{},{},{}]
-            for i in range(len(fcs)):
-                all_forecasts[business_unit][i][pnl_category] = fcs[i]
+
+    # Data Loading Phase
+    with status.phase("load"):
+        latest_date = getLatestPNLEntryDate(dbSession)
+        forecasted_months = [(latest_date+relativedelta(months=i)).strftime("%m-%Y") for i in range(1,4)]
+        all_forecasts = {} # Format for KPI calculation function >> looks like {"BB1":[{"A001-0001":3},{},{}]}
+        if scope is not None: # KPIs of an affected BU also need the stored forecasts of its out-of-scope codes
+            all_forecasts = retrieveStoredForecasts(dbSession, scope["business_units"], forecasted_months)
+
+        snapshot = retrieveDataSnapshot(dbSession, latest_date) # one fetch serves both phases
+        training_data = retrieveTrainingData(snapshot)
+        forecasting_data = {trend_name: filterToScope(data, scope) for trend_name, data in retrieveForecastingData(snapshot).items()}
+
+    # Model Training & Forecasting Phase
+    print(" * Training models and generating forecasts for months: ", ", ".join(forecasted_months))
+    with status.phase("train_forecast"): # train:<trend> & forecast:<trend> are recorded as each trend finishes
+        trend_forecasts = runTrendPipelines(training_data, forecasting_data, scope, status)
+    with status.phase("store_forecasts"):
+        for trend_name in TREND_SET:
+            model_forecasts = trend_forecasts[trend_name] # outputs data like {"A001-0001::BB1":[val1,val2,val3],...}
+            print(f" * Updating forecasts in DB for {trend_name}...")
+            output_data["pnl_forecasts"].append(updateDBForecasts(dbSession, forecasted_months, model_forecasts))
+
+            for cat_bu, fcs in model_forecasts.items():
+                pnl_category, business_unit = cat_bu.split("::")
+                if business_unit not in all_forecasts:
+                    all_forecasts[business_unit] = [{},{},{}]
+                for i in range(len(fcs)):
+                    all_forecasts[business_unit][i][pnl_category] = fcs[i]
 
     # KPI Calculation Phase
-    bu_kpis = {}
-    print(" * Calculating and updating KPI forecasts in DB...")
-    for bu, monthly_fcs in all_forecasts.items():
-        monthly_fkpis = {}
-        for i in range(len(monthly_fcs)):
-            added_kpis = insertKPIForecastsPerBUAndMonth(dbSession, 
-                    monthly_fcs[i], bu, forecasted_months[i]) # Insert once and get change log
-            output_data["kpi_forecasts"].extend(added_kpis) # Add to output data
-            monthly_fkpis[forecasted_months[i]] = { entry["kpi_alias"]:entry["value"] for entry in added_kpis } # Store KPI - value mappings for each BU for notifications
-        bu_kpis[bu] = monthly_fkpis
+    with status.phase("kpi"):
+        output_data["kpi_forecasts"] = calculateKPIForecasts(dbSession, all_forecasts, forecasted_months)
+
+    bu_kpis = {bu: {mth: {} for mth in forecasted_months} for bu in all_forecasts}
+    for entry in output_data["kpi_forecasts"]: # Store KPI - value mappings for each BU for notifications
+        bu_kpis[entry["business_unit"]][entry["month"]][entry["kpi_alias"]] = entry["value"]
     # bu_kpis structure: { "BB1": { "10-2025":{"PROF":val, "GPM":val,...}, "11-2025":{...}, "12-2025":{...} }, "BB2": {...} }
 
     # Notification Phase
+    with status.phase("notify"):
+        output_data["notifications"] = createNotifications(dbSession, bu_kpis, forecasted_months)
+    return output_data
+
+# Notification Functions
+def createNotifications(dbSession, bu_kpis, forecasted_months):
+    output_data = []
     bu_employee_dict = retrieveBUsAndEmployees(dbSession)
     employee_param_dict = retrieveEmployeesAndParams(dbSession, forecasted_months)
     param_guide = retrieveParametersByCategory(dbSession)
 
     print(" * Creating notification alerts for employees...")
     for bu, employees in bu_employee_dict.items():
+        if bu not in bu_kpis: # BU not affected by this run
+            continue
         monthly_kpis = bu_kpis[bu]
         for emp in employees:
             if emp["id"] not in employee_param_dict:
@@ -147,11 +372,10 @@ def processMessage(message, dbSession):
             parameters = employee_param_dict[emp["id"]]
             if parameters:
                 flags = flagParameters(monthly_kpis, parameters, param_guide)
-                output_data["notifications"].append(sendNotification(dbSession, emp, flags, forecasted_months))
-                print(" * Forecast alert sent to employee:", emp["name"], "for BU:", bu)
+                output_data.append(sendNotification(dbSession, emp, flags, forecasted_months))
+                print(" * Forecast alert queued for employee:", emp["name"], "for BU:", bu) # sent by outbox_dispatcher.py
     return output_data
-        
-# Notification Functions
+
 def retrieveBUsAndEmployees(dbSession):
     employees = dbSession.scalars(select(Employee)
             .where(Employee.business_unit != None)).all()
@@ -222,13 +446,7 @@ def sendNotification(dbSession, employee, flags, forecasted_months):
 
     subject, body = craftNotificationContent(employee,flags, forecasted_months)
 
-    output_data = insertDBNotification(dbSession, employee, subject, body)
-    if employee["phone_number"]:
-        sendWhatsappNotification(employee["phone_number"], subject, body)
-    if employee["email"]:
-        sendEmailNotification(employee["email"], subject, body)
-    
-    return output_data
+    return insertDBNotification(dbSession, employee, subject, body) # delivered later from the outbox
 
 def craftNotificationContent(employee, flags, forecasted_months):
     subject = "[FORECAST ALERT] Business Unit: " + employee["business_unit"]
@@ -258,48 +476,72 @@ def insertDBNotification(dbSession, employee, subject, body):
     dbSession.add(notification)
 
     try:
-        dbSession.commit()
+        dbSession.flush() # assigns notification.id for the outbox rows
+        recipients = {"whatsapp": employee["phone_number"], "email": employee["email"]}
+        for channel, recipient in recipients.items():
+            if recipient:
+                dbSession.add(NotificationOutbox(
+                    notification_id=notification.id,
+                    channel=channel,
+                    recipient=recipient,
+                    idempotency_key=f"{notification.id}:{channel}"
+                    ))
+        dbSession.commit() # notification and its outbox rows land together or not at all
+        countRowsWritten("notification", ["created"])
+        countRowsWritten("notification_outbox", ["created"] * sum(1 for recipient in recipients.values() if recipient))
         return notification.json()
     except Exception as e:
+        dbSession.rollback()
         print(f" * Error inserting notification into DB:", str(e))
         return {}
 
-def sendWhatsappNotification(phone_number, subject, body):
-    url = f"https://graph.facebook.com/v22.0/{WHATSAPP_PHONE_ID}/messages"
-    headers = {
-        "Authorization": f"Bearer {WHATSAPP_ACCESS_TOKEN}",
-        "Content-Type": "application/json"
-    }
-    data = {
-        "messaging_product": "whatsapp",
-        "to": phone_number,      # single number
-        "type": "text",
-        "text": {"body": f"{subject}\n\n{body}"}
-    }
-    try:
-        response = requests.post(url, headers=headers, json=data)
-        response.raise_for_status()
-        print(f" * WhatsApp message sent to {phone_number} successfully!")
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        return {f" * Error sending WhatsApp message to {phone_number}: {e}"}
+# Trend Pipeline Functions
+def runTrendPipelines(training_data, forecasting_data, scope=None, status=None):
+    # Trends share nothing but the DB, so each one can train & forecast in its own process
+    status = status or newRunStatus([])
+    output_data = {}
+    if FORECAST_WORKERS <= 1:
+        for trend_name in TREND_SET:
+            _, output_data[trend_name], report = runTrendPipeline(trend_name, training_data[trend_name],
+                    forecasting_data[trend_name], scope)
+            recordTrendReport(status, trend_name, report)
+        return output_data
 
+    workers = min(FORECAST_WORKERS, len(TREND_SET))
+    print(f" * Running trend pipelines across {workers} worker processes...")
+    # spawn (not fork) so that workers do not inherit torch/DB state from the consumer process
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+            initializer=initTrendWorker, initargs=(max(1, (os.cpu_count() or 1) // workers),)) as executor:
+        futures = {executor.submit(runTrendPipeline, trend_name, training_data[trend_name], 
+                        forecasting_data[trend_name], scope): trend_name for trend_name in TREND_SET}
+        for future in as_completed(futures): # record progress in the order trends finish
+            trend_name = futures[future]
+            try:
+                _, output_data[trend_name], report = future.result()
+                recordTrendReport(status, trend_name, report)
+            except Exception as e:
+                print(f" * Error in trend pipeline worker for {trend_name}:", str(e))
+                output_data[trend_name] = {}
+    # output_data structure: { "static": {"A001-0001::BB1":[val1,val2,val3],...}, "gentle_drift_noise": {...}, ... }
+    return output_data
 
-def sendEmailNotification(email, subject, body):
-    message = MIMEMultipart()
-    message["From"] = f"Traffic-light Simulation Hub <{SENDER_EMAIL}>"
-    message["To"] = email
-    message["Subject"] = subject
-    message.attach(MIMEText(body, "plain"))
+def initTrendWorker(torch_threads):
+    # torch starts one intra-op thread per core in every process, split the cores between the workers instead
+    torch.set_num_threads(torch_threads)
 
-    try:
-        with smtplib.SMTP("smtp.gmail.com", 587) as server:
-            server.starttls() # Upgrade the connection to a secure encrypted SSL/TLS connection
-            server.login(SENDER_EMAIL, SENDER_PASSWORD) # Log in to Gmail account
-            server.send_message(message) # Send the email
-        print(f" * Email sent to {email} successfully")
-    except Exception as e:
-        print(f" * Failed to send email to {email}: {e}")
+def runTrendPipeline(trend_name, training_data, forecasting_data, scope=None):
+    # Timed & counted here and returned, a worker process cannot record into the parent's run status or metrics
+    report = {"phases": []}
+    started_at, start = now(), time.perf_counter()
+    train_status, report["series_fitted"], report["series_failed"] = trainForTrend(trend_name.lower(), training_data, scope)
+    report["phases"].append((f"train:{trend_name}", started_at, time.perf_counter() - start))
+    if train_status:
+        pass # Send a redis message if needed
+
+    started_at, start = now(), time.perf_counter()
+    forecasts = forecastForTrend(trend_name.lower(), forecasting_data)
+    report["phases"].append((f"forecast:{trend_name}", started_at, time.perf_counter() - start))
+    return trend_name, forecasts, report
 
 # Utility Functions
 def getLatestPNLEntryDate(dbSession):
@@ -309,81 +551,150 @@ def getLatestPNLEntryDate(dbSession):
     latest_date = datetime.strptime(latest_entry.json()['month'], "%m-%Y").date() if latest_entry else datetime.now().date()
     return latest_date
 
-# Training Functions
-def retrieveTrainingData(dbSession, latest_date):
+def retrieveDataSnapshot(dbSession, latest_date):
+    # Column projection straight into arrays, no PNLEntry objects or lazy pnl_category loads per row
     stmt = (
-        select(PNLEntry)
+        select(PNLEntry.pnl_code, PNLEntry.business_unit, PNLEntry.month, cast(PNLEntry.value, Float), PNLCategory.trend)
         .join(PNLCategory, PNLCategory.code == PNLEntry.pnl_code)
-        .where(PNLEntry.month > latest_date - relativedelta(months=TRAINING_DATA_MONTHS))
+        .where(PNLEntry.month > latest_date - relativedelta(months=max(TRAINING_DATA_MONTHS, FORECAST_DATA_MONTHS)))
         .order_by(PNLEntry.month)
     )
-    entries = dbSession.scalars(stmt).all()
+    rows = dbSession.execute(stmt).all()
+    pnl_codes, business_units, months, values, trends = zip(*rows) if rows else ([], [], [], [], [])
+
+    return PNLSnapshot(latest_date, pnl_codes, business_units, months, values, trends)
+
+def retrieveStoredForecasts(dbSession, business_units, forecasted_months):
+    months = [datetime.strptime(mth, "%m-%Y").date() for mth in forecasted_months]
+    rows = dbSession.execute(
+        select(PNLForecast.pnl_code, PNLForecast.business_unit, PNLForecast.month, cast(PNLForecast.value, Float))
+        .where(PNLForecast.business_unit.in_(sorted(business_units)))
+        .where(PNLForecast.month.in_(months))
+    ).all()
 
-    months = []
     output_data = {}
-    output_data.update({trend_name:{} for trend_name in TREND_SET})
-    for entry in entries:
-        trend_name = entry.pnl_category.trend.lower()
-        key = entry.pnl_code + "::" + entry.business_unit
-        mth = entry.month.strftime("%m-%Y")
-        if mth not in months:
-            months.append(mth)
-        if key not in output_data[trend_name]:
-            output_data[trend_name][key] = []
-        output_data[trend_name][key].append(float(entry.value) if entry.value is not None else None)
-    
-    for trend in output_data:
-        output_data[trend]["months"] = months
-    
+    for pnl_code, business_unit, month, value in rows:
+        if business_unit not in output_data:
+            output_data[business_unit] = [{},{},{}]
+        output_data[business_unit][months.index(month)][pnl_code] = value
+    # output_data structure: same as all_forecasts >> {"BB1":[{"A001-0001":3},{},{}]}
     return output_data
 
-def trainForTrend(trend_name,training_data):
+# Training Functions
+def retrieveTrainingData(snapshot):
+    return {trend_name: snapshot.window(trend_name, TRAINING_DATA_MONTHS) for trend_name in TREND_SET}
+
+def trainForTrend(trend_name,training_data, scope=None):
+    """Returns (success, series fitted, series failed). Series that fail to fit are saved without a fingerprint, so the next run retries them"""
     model_name = TREND_TO_MODEL_MAP[trend_name]
     print(f" * Training model {model_name} for {trend_name}...")
+    changed_series = []
     try: 
+        weight_extension_type = MODEL_TO_WEIGHT_EXTENSION_TYPE_MAP[model_name]
+        weight_path = f"weights/{trend_name}/weight.{weight_extension_type}"
+        fingerprint_path = f"weights/{trend_name}/fingerprints.json"
+        migrateLegacyWeights(model_name, trend_name, weight_path)
+
+        # FIND SERIES WHOSE TRAINING WINDOW CHANGED SINCE THE SAVED WEIGHTS
+        fingerprints = computeSeriesFingerprints(model_name, training_data)
+        previous_model, previous_fingerprints = loadPreviousTraining(model_name, weight_path, fingerprint_path)
+        # Out-of-scope series are only fitted when they have no weights yet, otherwise they wait for their own trigger
+        changed_series = [series_name for series_name, fingerprint in fingerprints.items()
+                if previous_fingerprints.get(series_name) != fingerprint
+                and (isInScope(series_name, scope) or series_name not in previous_fingerprints)]
+        unchanged_series = [series_name for series_name in fingerprints if series_name not in changed_series]
+        if not changed_series:
+            print(f" * No series changed for {trend_name}, keeping existing weights")
+            return True, 0, 0
+        print(f" * Refitting {len(changed_series)} changed series, carrying over {len(unchanged_series)}...")
+
         # INSTANTIATE UNFITTED MODEL OBJECT
         train_model = ModelRegistry.create(model_name)
 
-        # TRAIN MODEL
-        train_model.train(data=training_data, input_size=12,
-                        output_size=3, epochs=50)
-
-        # SAVE WEIGHTS
-        weight_extension_type = MODEL_TO_WEIGHT_EXTENSION_TYPE_MAP[model_name]
-        train_model.save(f"weights/{trend_name}/weight.{weight_extension_type}")
+        # TRAIN MODEL ON CHANGED SERIES, CARRY OVER THE REST
+        changed_data = {series_name: training_data[series_name] for series_name in changed_series}
+        changed_data["months"] = training_data["months"]
+        failed_series = []
+        try:
+            train_model.train(data=changed_data, **TRAINING_PARAMS, n_jobs=SERIES_FIT_WORKERS,
+                            warm_start=previous_model)
+        except ValueError as e:
+            # Models fitting series one by one keep the good fits & list the failures, any other error fails the trend
+            failed_series = list(getattr(train_model, "fit_errors", {}))
+            if not failed_series:
+                raise
+            print(f" * {len(failed_series)} series failed to fit, saving the other {len(changed_series) - len(failed_series)}:", str(e))
+        # Failed series keep their previous weights (if any) until they fit again
+        carried_series = unchanged_series + [series_name for series_name in failed_series
+                if previous_model is not None and series_name in previous_model.series_names]
+        if carried_series:
+            train_model.carry_over(previous_model, carried_series)
+        if not train_model.series_names:
+            print(f" * No series could be fitted for {trend_name}")
+            return False, 0, len(failed_series)
+
+        # SAVE WEIGHTS & FINGERPRINTS
+        train_model.save(weight_path)
+        ModelRegistry.cache_model(model_name, weight_path, train_model) # forecast phase reuses it without reloading
+        saved_fingerprints = {series_name: fingerprints[series_name] if series_name in changed_series 
+                else previous_fingerprints[series_name] for series_name in fingerprints
+                if series_name not in failed_series} # carried series keep theirs, failed ones get none
+        with open(fingerprint_path, "w") as f:
+            json.dump(saved_fingerprints, f, indent=2)
+        if failed_series:
+            return False, len(changed_series) - len(failed_series), len(failed_series)
         print(" * Model trained successfully!")
-        return True
+        return True, len(changed_series), 0
     except Exception as e:
         print(f" * Error training model:", str(e))
-        return False
-    
-# Forecasting Functions
-def retrieveForecastingData(dbSession, latest_date):
-    stmt = (
-        select(PNLEntry)
-        .join(PNLCategory, PNLCategory.code == PNLEntry.pnl_code)
-        .where(PNLEntry.month > latest_date - relativedelta(months=FORECAST_DATA_MONTHS))
-        .order_by(PNLEntry.month)
-    )
-    entries = dbSession.scalars(stmt).all()
+        return False, 0, len(changed_series)
 
-    months = []
+def computeSeriesFingerprints(model_name, training_data):
     output_data = {}
-    output_data.update({trend_name:{} for trend_name in TREND_SET})
-    for entry in entries:
-        trend_name = entry.pnl_category.trend.lower()
-        key = entry.pnl_code + "::" + entry.business_unit
-        mth = entry.month.strftime("%m-%Y")
-        if mth not in months:
-            months.append(mth)
-        if key not in output_data[trend_name]:
-            output_data[trend_name][key] = []
-        output_data[trend_name][key].append(float(entry.value) if entry.value is not None else None)
-    
-    for trend in output_data:
-        output_data[trend]["months"] = months
-
+    for series_name, values in training_data.items():
+        if series_name == "months":
+            continue
+        payload = json.dumps([model_name, TRAINING_PARAMS, values], sort_keys=True)
+        output_data[series_name] = hashlib.sha256(payload.encode()).hexdigest()
+    # output_data structure: { "A001-0001::BB1": "<sha256 of model, params & training values>", ... }
     return output_data
+
+def migrateLegacyWeights(model_name, trend_name, weight_path):
+    if model_name not in LEGACY_WEIGHT_EXTENSION_TYPE_MAP or os.path.exists(weight_path):
+        return
+    legacy_path = f"weights/{trend_name}/weight.{LEGACY_WEIGHT_EXTENSION_TYPE_MAP[model_name]}"
+    if not os.path.exists(legacy_path):
+        return
+    try:
+        legacy_model = ModelRegistry.load_model(model_name, legacy_path, use_cache=False)
+        legacy_model.save(weight_path)
+        os.remove(legacy_path)
+        print(f" * Converted {legacy_path} to {weight_path}")
+    except Exception as e:
+        print(f" * Could not convert legacy weights {legacy_path}, retraining all series:", str(e))
+
+def loadPreviousTraining(model_name, weight_path, fingerprint_path):
+    if not os.path.exists(weight_path):
+        return None, {}
+    try:
+        previous_model = ModelRegistry.load_model(model_name, weight_path)
+        previous_fingerprints = {}
+        if os.path.exists(fingerprint_path):
+            with open(fingerprint_path, "r") as f:
+                previous_fingerprints = json.load(f)
+        else: # weights from before fingerprints, every series refits but warm starts from them
+            print(f" * No fingerprints for {weight_path}, refitting all series from the existing weights")
+    except Exception as e:
+        print(f" * Could not load previous weights, retraining all series:", str(e))
+        return None, {}
+    # Only trust fingerprints of series that are actually in the saved weights
+    previous_fingerprints = {series_name: fingerprint for series_name, fingerprint in previous_fingerprints.items()
+            if series_name in previous_model.series_names}
+    return previous_model, previous_fingerprints
+    
+# Forecasting Functions
+def retrieveForecastingData(snapshot):
+    return {trend_name: snapshot.window(trend_name, FORECAST_DATA_MONTHS) for trend_name in TREND_SET}
     
 def forecastForTrend(trend_name, forecasting_data):
     model_name = TREND_TO_MODEL_MAP[trend_name]
@@ -394,19 +705,17 @@ def forecastForTrend(trend_name, forecasting_data):
         pred_model = ModelRegistry.load_model(
             model_name, f'weights/{trend_name}/weight.{weight_extension_type}')
         
-        # GENERATE FORECASTS PER CATEGORY::BUSINESS_UNIT
-        output_data = {}
-        for cat_bu in forecasting_data:
-            if cat_bu == "months":
-                continue
-
-            context_data = forecasting_data[cat_bu]
-
-            output_data[cat_bu] = pred_model.predict(
-                series_name=cat_bu,
-                steps=3,
-                last_values=context_data
-            )
+        # GENERATE FORECASTS PER CATEGORY::BUSINESS_UNIT, SERIES THAT NEVER FIT HAVE NO WEIGHTS TO FORECAST FROM
+        fitted_series = set(pred_model.series_names)
+        series_names = [cat_bu for cat_bu in forecasting_data if cat_bu != "months" and cat_bu in fitted_series]
+        unfitted_series = [cat_bu for cat_bu in forecasting_data if cat_bu != "months" and cat_bu not in fitted_series]
+        if unfitted_series:
+            print(f" * Skipping {len(unfitted_series)} series without fitted weights:", ", ".join(unfitted_series))
+        output_data = pred_model.predict_batch(
+            series_names=series_names,
+            steps=3,
+            contexts=[forecasting_data[cat_bu] for cat_bu in series_names]
+        )
         print(" * Forecasts generated successfully!")
         return output_data
     except Exception as e:
@@ -414,42 +723,33 @@ def forecastForTrend(trend_name, forecasting_data):
         return {}
 
 def updateDBForecasts(dbSession, forecasted_months, forecasts):
-
-    # GET EXISTING FORECASTS
-    existing_forecasts = dbSession.scalars(select(PNLForecast)).all()
-    existing_forecasts = {(efc.pnl_code, efc.business_unit, efc.month.strftime("%m-%Y")):efc for efc in existing_forecasts}
-    
-    output_data = []
+    months = [datetime.strptime(mth, "%m-%Y").date() for mth in forecasted_months]
+    rows = []
     for cat_bu, fcs in forecasts.items():
         pnl_category, business_unit = cat_bu.split("::")
-
         for i in range(len(forecasted_months)):
-            key = (pnl_category, business_unit, forecasted_months[i])
-            change_status = "unchanged"
-
-            # UPDATE EXISTING FORECAST
-            if key in existing_forecasts.keys():
-                fc_entry = existing_forecasts[key]
-                fc_entry.value = float(fcs[i])
-                change_status = "updated"
-
-            # INSERT NEW FORECAST
-            else:
-                fc_entry = PNLForecast(
-                    pnl_code=pnl_category,
-                    business_unit=business_unit,
-                    month=datetime.strptime(forecasted_months[i], "%m-%Y").date(),
-                    value=float(fcs[i])
-                )
-                dbSession.add(fc_entry)
-                change_status = "created"
-
-            output_fc = fc_entry.json()
-            output_fc.update({"change_status": change_status})
-            output_data.append(output_fc)
+            rows.append({"pnl_code": pnl_category, "business_unit": business_unit, "month": months[i], "value": float(fcs[i])})
 
+    # UPSERT IN CHUNKS, xmax = 0 ONLY FOR ROWS THIS STATEMENT INSERTED
+    output_data = []
     try:
+        for start in range(0, len(rows), DB_WRITE_CHUNK_SIZE):
+            stmt = insert(PNLForecast).values(rows[start:start + DB_WRITE_CHUNK_SIZE])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[PNLForecast.pnl_code, PNLForecast.business_unit, PNLForecast.month],
+                set_={"value": stmt.excluded.value}
+            ).returning(PNLForecast.pnl_code, PNLForecast.business_unit, PNLForecast.month, PNLForecast.value,
+                    literal_column("(xmax = 0)").label("inserted"))
+            for fc_entry in dbSession.execute(stmt):
+                output_data.append({
+                    "pnl_code": fc_entry.pnl_code,
+                    "business_unit": fc_entry.business_unit,
+                    "month": fc_entry.month.strftime("%m-%Y"),
+                    "value": float(fc_entry.value) if fc_entry.value is not None else None,
+                    "change_status": "created" if fc_entry.inserted else "updated"
+                })
         dbSession.commit()
+        countRowsWritten("pnl_forecast", [fc_entry["change_status"] for fc_entry in output_data])
         print(" * Forecasts updated successfully")
         return output_data
     except Exception as e:
@@ -458,202 +758,55 @@ def updateDBForecasts(dbSession, forecasted_months, forecasts):
         return []
 
 # KPI Functions
-def insertKPIForecastsPerBUAndMonth(dbSession, entry_dict, bu, month_str): # TODO: Accept dictionary instead of df
-    output_data = []
-    month = datetime.strptime(month_str, "%m-%Y").date()
-
-    kpi_dict = { # calculate KPIs and consolidate
-        **calculateProfitKPIs(entry_dict),
-        **calculateSalesKPIs(entry_dict),
-        **calculateCostKPIs(entry_dict)
-    }
-
-    for kpi_alias, kpi_value in kpi_dict.items():
-        change_status = "unchanged"
-
-        # print(f"Checking database if KPI Entry exists: {kpi_alias} - {bu} - {month_str}")
-        kpi_entry = dbSession.scalars(
-            select(KPIForecast)
-            .filter_by(kpi_alias=kpi_alias, business_unit=bu, month=month)
-        ).first()
-
-        if kpi_entry:
-            # print(f"\tExisting KPI Entry found: {kpi_entry.kpi_alias} - {kpi_entry.business_unit} - {kpi_entry.month}")
-            if isFloatEqualSafe(kpi_entry.value, kpi_value, dp=4):
-                # print(f"\t\tValue matches, no action required.")
-                pass
-            else:
-                # print(f"\t\tValue mismatch, updating value: {kpi_entry.value} -> {kpi_value}")
-                kpi_entry.value = kpi_value
-                change_status = "updated"
-
-        else:
-            # print(f"\tNo existing KPI Entry found, proceeding to create: {kpi_alias} - {bu} - {month_str} - {kpi_value}")
-            kpi_entry = KPIForecast(
-                kpi_alias=kpi_alias,
-                business_unit=bu,
-                month=month,
-                value=kpi_value
-            )
-            dbSession.add(kpi_entry)
-            change_status = "created"
-
-        output_entry = kpi_entry.json()
-        output_entry.update({"change_status": change_status})
-        output_data.append(output_entry)
+def calculateKPIForecasts(dbSession, all_forecasts, forecasted_months):
+    print(" * Calculating and updating KPI forecasts in DB...")
+    kpi_forecasts = []
+    bu_months = [(bu, i) for bu, monthly_fcs in all_forecasts.items() for i in range(len(monthly_fcs))]
+    pnl_codes = sorted({code for monthly_fcs in all_forecasts.values() for fcs in monthly_fcs for code in fcs})
+    code_idx = {code: j for j, code in enumerate(pnl_codes)}
+    values = np.full((len(bu_months), len(pnl_codes)), np.nan) # one row per BU and month, NaN where no forecast
+    for row, (bu, i) in enumerate(bu_months):
+        for code, fc in all_forecasts[bu][i].items():
+            values[row, code_idx[code]] = np.nan if fc is None else fc
+    kpi_matrix = calculateKPIMatrix(pnl_codes, values) # every KPI for every BU and month in one pass
+    for (bu, i), kpi_row in zip(bu_months, kpi_matrix):
+        kpi_forecasts.extend({"kpi_alias": kpi_alias, "business_unit": bu, "month": forecasted_months[i], "value": kpi_value}
+                for kpi_alias, kpi_value in kpiRowToDict(kpi_row).items())
+    return upsertKPIForecasts(dbSession, kpi_forecasts) # Insert once and get change log
+
+def upsertKPIForecasts(dbSession, kpi_forecasts):
+    rows = [{**entry, "month": datetime.strptime(entry["month"], "%m-%Y").date()} for entry in kpi_forecasts]
+
+    # UPSERT IN ONE TRANSACTION, THE DB ONLY TOUCHES (AND RETURNS) ROWS WHOSE STORED VALUE DIFFERS
+    changed = {}
     try:
+        for start in range(0, len(rows), DB_WRITE_CHUNK_SIZE):
+            stmt = insert(KPIForecast).values(rows[start:start + DB_WRITE_CHUNK_SIZE])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[KPIForecast.kpi_alias, KPIForecast.business_unit, KPIForecast.month],
+                set_={"value": stmt.excluded.value},
+                where=KPIForecast.value.is_distinct_from(stmt.excluded.value) # compared at the column's NUMERIC(15,4)
+            ).returning(KPIForecast.kpi_alias, KPIForecast.business_unit, KPIForecast.month,
+                    literal_column("(xmax = 0)").label("inserted"))
+            for kpi_entry in dbSession.execute(stmt):
+                changed[(kpi_entry.kpi_alias, kpi_entry.business_unit, kpi_entry.month)] = \
+                        "created" if kpi_entry.inserted else "updated"
         dbSession.commit()
-        print(f" * KPI forecasts for {bu}: {month_str} calculated & updated successfully")
-        return output_data
+        countRowsWritten("kpi_forecast", changed.values()) # unchanged rows are not written
+        print(f" * KPI forecasts for {len({row['business_unit'] for row in rows})} BUs calculated & updated successfully")
     except Exception as e:
         dbSession.rollback()
         print(f" * Error updating KPI forecasts:", str(e))
         return []
 
-def isFloatEqualSafe(a,b,dp):
-    if a is None and b is None:
-        return True
-    if a is not None and b is not None:
-        return f"{a:.{dp}f}" == f"{b:.{dp}f}"
-    return False
-
-def calculateProfitKPIs(entries):
-    output_data = {
-        "PROF": None,
-        "GPM": None,
-        "OPM": None,
-        "NPM": None,
-        "QR": None
-    }
-    
-    # summing data
-    sales_revenue = 0
-    sales_adjustments = 0
-    other_incomes = 0
-    cogs = 0
-    op_expenses = 0
-    fin_expenses = 0
-    for code, val in entries.items():
-        if pd.isna(val): # skip if value is pd.NA (does not trigger ValueError because NaN is a special float value) or None
-            continue
-        try:
-            val = float(str(val).strip())
-        except ValueError:
-            continue  # skip if value cannot be converted to float (non-numeric)
-
-        if code.startswith("5000-") and code not in ["5000-A015", "5000-M004"]:
-            sales_revenue += val
-        if code.startswith("5500"):
-            sales_adjustments += val
-        if code.startswith("8") or code in ["5000-A015", "5000-M004"]:
-            other_incomes += val
-        if code.startswith("6"):
-            cogs += val
-        if code.startswith("901") or code.startswith("902"):
-            op_expenses += val
-        if code.startswith("900"):
-            fin_expenses += val
-
-    # intermediate calculations
-    net_sales = sales_revenue - sales_adjustments
-    all_expenses = op_expenses + fin_expenses
-    all_incomes = sales_revenue + other_incomes - sales_adjustments
-
-    # KPI calculations
-    output_data["PROF"] = round(all_incomes - cogs - all_expenses, 2)
-    output_data["GPM"] = round((sales_revenue - cogs) / sales_revenue * 100, 4) if sales_revenue != 0 else None
-    output_data["OPM"] = round((net_sales - cogs - op_expenses) / net_sales * 100, 4) if net_sales != 0 else None
-    output_data["NPM"] = round((all_incomes - cogs - all_expenses) / all_incomes * 100, 4) if all_incomes != 0 else None
-    output_data["QR"] = None
-
-    return output_data
-
-def calculateSalesKPIs(entries):
-    output_data = {
-        "SALES": None, 
-        "ROS": None,
-        "DSO": None,
-        "RT": None
-    }
-
-    # summing data
-    sales_revenue = 0
-    sales_adjustments = 0
-    cogs = 0
-    op_expenses = 0
-    for code, val in entries.items():
-        if pd.isna(val): # skip if value is pd.NA (does not trigger ValueError because NaN is a special float value) or None
-            continue
-        try:
-            val = float(str(val).strip())
-        except ValueError:
-            continue  # skip if value cannot be converted to float (non-numeric)
-
-        if code.startswith("5000-") and code not in ["5000-A015", "5000-M004"]:
-            sales_revenue += val
-        if code.startswith("5500"):
-            sales_adjustments += val
-        if code.startswith("6"):
-            cogs += val
-        if code.startswith("901") or code.startswith("902"):
-            op_expenses += val
-
-    # intermediate calculations
-    net_sales = sales_revenue - sales_adjustments
-    operating_profit = sales_revenue - sales_adjustments - cogs - op_expenses
-
-    # KPI calculations
-    output_data["SALES"] = round(net_sales, 2)
-    output_data["ROS"] = round(operating_profit / net_sales * 100, 4) if net_sales != 0 else None
-    output_data["DSO"] = None
-    output_data["RT"] = None
-
-    return output_data
-
-def calculateCostKPIs(entries):
-    output_data = {
-        "COST": None, 
-        "COGSR": None,
-        "DPO": None,
-        "OHR": None
-    }
-
-    # summing data
-    sales_revenue = 0
-    sales_adjustments = 0
-    cogs = 0
-    all_expenses = 0
-    overhead_costs = 0
-    for code, val in entries.items():
-        if pd.isna(val): # skip if value is pd.NA (does not trigger ValueError because NaN is a special float value) or None
-            continue
-        try:
-            val = float(str(val).strip())
-        except ValueError:
-            continue  # skip if value cannot be converted to float (non-numeric)
-
-        if code.startswith("5000-") and code not in ["5000-A015", "5000-M004"]:
-            sales_revenue += val
-        if code.startswith("5500"):
-            sales_adjustments += val
-        if code.startswith("6"):
-            cogs += val
-        if code.startswith("9"):
-            all_expenses += val
-        if code.startswith("902") or code.startswith("9000-D"):
-            overhead_costs += val
-
-    # intermediate calculations
-    net_sales = sales_revenue - sales_adjustments
-
-    # KPI calculations
-    output_data["COST"] = round(cogs + all_expenses, 2)
-    output_data["COGSR"] = round(cogs / net_sales * 100, 4) if net_sales != 0 else None
-    output_data["DPO"] = None
-    output_data["OHR"] = round(overhead_costs / net_sales * 100, 4) if net_sales != 0 else None
-
+    output_data = []
+    for entry, row in zip(kpi_forecasts, rows):
+        change_status = changed.get((row["kpi_alias"], row["business_unit"], row["month"]), "unchanged")
+        output_data.append({**entry, "change_status": change_status})
     return output_data
 
 if __name__ == '__main__':
     print(" * Forecast service running:" + os.path.basename(__file__) + "...")
+    start_http_server(METRICS_PORT)
+    print(f" * Serving metrics on port {METRICS_PORT}")
     runConsumer()
\ No newline at end of file
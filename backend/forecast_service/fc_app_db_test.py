@@ -0,0 +1,208 @@
+from datetime import date
+import math
+import os
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import create_engine, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+
+# fc_app reads its connection settings on import, nothing connects until a test uses them
+os.environ.setdefault("DATABASE_URL", "postgresql://postgres@localhost/forecast_test")
+os.environ.setdefault("REDIS_URL", "localhost:6379")
+os.environ.setdefault("REDIS_TOPIC", "trigger-training-forecast-test")
+import fc_app
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL") # an empty, disposable Postgres DB, its tables are dropped
+FORECASTED_MONTHS = ["01-2025", "02-2025", "03-2025"]
+
+class TestUpdateDBForecastsStatements(unittest.TestCase):
+    def test_rows_are_upserted_in_chunks_and_labelled_by_xmax(self):
+        statements = []
+        def execute(stmt):
+            statements.append(stmt)
+            params = stmt.compile(dialect=postgresql.dialect()).params
+            n_rows = sum(1 for key in params if key.startswith("pnl_code_m"))
+            return [SimpleNamespace(pnl_code=params[f"pnl_code_m{i}"], business_unit=params[f"business_unit_m{i}"],
+                    month=params[f"month_m{i}"], value=params[f"value_m{i}"], inserted=i % 2 == 0) for i in range(n_rows)]
+        dbSession = MagicMock()
+        dbSession.execute.side_effect = execute
+
+        with patch.object(fc_app, "DB_WRITE_CHUNK_SIZE", 4):
+            output = fc_app.updateDBForecasts(dbSession, FORECASTED_MONTHS, {"4000::B1": [1, 2, 3], "4100::B1": [4, 5, 6]})
+
+        self.assertEqual([len(stmt.compile(dialect=postgresql.dialect()).params) // 4 for stmt in statements], [4, 2])
+        sql = str(statements[0].compile(dialect=postgresql.dialect()))
+        self.assertIn("ON CONFLICT (pnl_code, business_unit, month) DO UPDATE", sql)
+        self.assertIn("(xmax = 0)", sql)
+        self.assertEqual([(entry["pnl_code"], entry["month"], entry["value"], entry["change_status"]) for entry in output], [
+                ("4000", "01-2025", 1.0, "created"), ("4000", "02-2025", 2.0, "updated"),
+                ("4000", "03-2025", 3.0, "created"), ("4100", "01-2025", 4.0, "updated"),
+                ("4100", "02-2025", 5.0, "created"), ("4100", "03-2025", 6.0, "updated")])
+        dbSession.commit.assert_called_once()
+
+    def test_a_failed_chunk_rolls_back_every_chunk(self):
+        dbSession = MagicMock()
+        dbSession.execute.side_effect = [[], RuntimeError("connection lost")]
+
+        with patch.object(fc_app, "DB_WRITE_CHUNK_SIZE", 2):
+            self.assertEqual(fc_app.updateDBForecasts(dbSession, FORECASTED_MONTHS, {"4000::B1": [1, 2, 3]}), [])
+        dbSession.rollback.assert_called_once()
+        dbSession.commit.assert_not_called()
+
+class TestUpsertKPIForecastsStatements(unittest.TestCase):
+    def test_conflicting_rows_are_only_updated_when_their_value_is_distinct(self):
+        dbSession = MagicMock()
+        dbSession.execute.return_value = []
+
+        output = fc_app.upsertKPIForecasts(dbSession, [{"kpi_alias": "GM", "business_unit": "B1", "month": "01-2025", "value": 0.2}])
+
+        sql = str(dbSession.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+        self.assertIn("WHERE kpi_forecast.value IS DISTINCT FROM excluded.value", sql)
+        self.assertEqual(output[0]["change_status"], "unchanged") # not returned, so not written
+
+class TestRetrieveDataSnapshotStatement(unittest.TestCase):
+    ENTRIES = [ # month order, like the query's ORDER BY
+        {"pnl_code": "4000", "business_unit": "B1", "month": date(2024, 12, 1), "value": 1.0, "trend": "STATIC"},
+        {"pnl_code": "4100", "business_unit": "B2", "month": date(2024, 12, 1), "value": None, "trend": "Sales_Seasonal_Cycle"},
+        {"pnl_code": "4000", "business_unit": "B1", "month": date(2025, 1, 1), "value": 2.0, "trend": "STATIC"},
+        {"pnl_code": "4100", "business_unit": "B2", "month": date(2025, 1, 1), "value": 5.0, "trend": "Sales_Seasonal_Cycle"},
+    ]
+
+    def retrieveSnapshot(self):
+        statements = []
+        def execute(stmt):
+            # Answer like the driver would, one tuple per row in the statement's column order
+            statements.append(stmt)
+            result = MagicMock()
+            result.all.return_value = [tuple(entry[key] for key in stmt.selected_columns.keys()) for entry in self.ENTRIES]
+            return result
+        dbSession = MagicMock()
+        dbSession.execute.side_effect = execute
+        return fc_app.retrieveDataSnapshot(dbSession, date(2025, 1, 1)), statements
+
+    def test_columns_are_selected_in_the_order_the_snapshot_reads_them(self):
+        snapshot, statements = self.retrieveSnapshot()
+
+        self.assertEqual(list(statements[0].selected_columns.keys()), ["pnl_code", "business_unit", "month", "value", "trend"])
+        self.assertEqual(snapshot.trends, ("sales_seasonal_cycle", "static"))
+        self.assertEqual(snapshot.window("static", fc_app.TRAINING_DATA_MONTHS), {"4000::B1": [1.0, 2.0], "months": ["12-2024", "01-2025"]})
+        self.assertEqual(snapshot.window("sales_seasonal_cycle", fc_app.TRAINING_DATA_MONTHS)["4100::B2"][1:], [5.0])
+
+    def test_query_covers_the_wider_window_in_month_order(self):
+        _, statements = self.retrieveSnapshot()
+
+        compiled = statements[0].compile(dialect=postgresql.dialect())
+        self.assertIn("JOIN pnl_category ON pnl_category.code = pnl_entry.pnl_code", str(compiled))
+        self.assertIn("ORDER BY pnl_entry.month", str(compiled))
+        self.assertEqual(list(compiled.params.values()),
+                [date(2025, 1, 1) - relativedelta(months=max(fc_app.TRAINING_DATA_MONTHS, fc_app.FORECAST_DATA_MONTHS))])
+
+@unittest.skipUnless(TEST_DATABASE_URL, "TEST_DATABASE_URL is not set")
+class PostgresTestCase(unittest.TestCase):
+    """Runs against the real upserts, the tables are created from db_classes and dropped afterwards"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_engine(TEST_DATABASE_URL)
+        fc_app.base.metadata.drop_all(cls.engine)
+        fc_app.base.metadata.create_all(cls.engine)
+        cls.Session = sessionmaker(bind=cls.engine)
+        with cls.Session() as dbSession:
+            dbSession.add_all([fc_app.BusinessUnit(alias="B1"), fc_app.BusinessUnit(alias="B2"),
+                    fc_app.PNLCategory(code="4000", name="Sales"), fc_app.PNLCategory(code="4100", name="Services"),
+                    fc_app.KPICategory(alias="GM", name="Gross margin", category="Profitability"),
+                    fc_app.KPICategory(alias="NM", name="Net margin", category="Profitability")])
+            dbSession.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        fc_app.base.metadata.drop_all(cls.engine)
+        cls.engine.dispose()
+
+    def setUp(self):
+        self.dbSession = self.Session()
+
+    def tearDown(self):
+        self.dbSession.close()
+        with self.Session() as dbSession:
+            dbSession.query(fc_app.PNLForecast).delete()
+            dbSession.query(fc_app.KPIForecast).delete()
+            dbSession.commit()
+
+class TestUpdateDBForecastsPostgres(PostgresTestCase):
+    def test_inserted_and_updated_rows_are_told_apart_across_chunks(self):
+        with patch.object(fc_app, "DB_WRITE_CHUNK_SIZE", 2):
+            first = fc_app.updateDBForecasts(self.dbSession, FORECASTED_MONTHS, {"4000::B1": [1, 2, 3]})
+            second = fc_app.updateDBForecasts(self.dbSession, FORECASTED_MONTHS,
+                    {"4000::B1": [1.5, 2, 3], "4100::B2": [4, 5, 6]})
+
+        self.assertEqual([entry["change_status"] for entry in first], ["created"] * 3)
+        self.assertEqual([(entry["pnl_code"], entry["change_status"]) for entry in second],
+                [("4000", "updated")] * 3 + [("4100", "created")] * 3)
+        stored = {(row.pnl_code, row.month): float(row.value) for row in self.dbSession.scalars(select(fc_app.PNLForecast))}
+        self.assertEqual(len(stored), 6)
+        self.assertEqual(stored[("4000", date(2025, 1, 1))], 1.5)
+
+class TestRetrieveDataSnapshotPostgres(PostgresTestCase):
+    def tearDown(self):
+        super().tearDown()
+        with self.Session() as dbSession:
+            dbSession.query(fc_app.PNLEntry).delete()
+            dbSession.commit()
+
+    def test_rows_come_back_in_the_order_the_snapshot_reads_them(self):
+        self.dbSession.add_all([fc_app.PNLEntry(pnl_code="4000", business_unit="B1", month=date(2024, 12, 1), value=1.5),
+                fc_app.PNLEntry(pnl_code="4000", business_unit="B1", month=date(2025, 1, 1), value=None),
+                fc_app.PNLEntry(pnl_code="4100", business_unit="B2", month=date(2025, 1, 1), value=3),
+                fc_app.PNLEntry(pnl_code="4100", business_unit="B2", month=date(2023, 1, 1), value=9)]) # outside every window
+        self.dbSession.commit()
+
+        snapshot = fc_app.retrieveDataSnapshot(self.dbSession, date(2025, 1, 1))
+
+        window = snapshot.window("static", fc_app.FORECAST_DATA_MONTHS) # categories default to the STATIC trend
+        self.assertEqual(snapshot.trends, ("static",))
+        self.assertEqual(list(window), ["4000::B1", "4100::B2", "months"])
+        self.assertEqual(window["4000::B1"][0], 1.5)
+        self.assertTrue(math.isnan(window["4000::B1"][1]))
+        self.assertEqual(window["4100::B2"], [3.0])
+        self.assertEqual(window["months"], ["12-2024", "01-2025"])
+
+class TestUpsertKPIForecastsPostgres(PostgresTestCase):
+    def kpiForecasts(self, values):
+        return [{"kpi_alias": kpi_alias, "business_unit": "B1", "month": month, "value": value}
+                for (kpi_alias, month), value in values.items()]
+
+    def test_only_rows_whose_value_differs_are_written(self):
+        fc_app.upsertKPIForecasts(self.dbSession, self.kpiForecasts({("GM", "01-2025"): None, ("GM", "02-2025"): 0.25,
+                ("GM", "03-2025"): 0.3, ("NM", "01-2025"): 0.1}))
+
+        with patch.object(fc_app, "countRowsWritten") as countRowsWritten:
+            output = fc_app.upsertKPIForecasts(self.dbSession, self.kpiForecasts({
+                    ("GM", "01-2025"): 0.2, # NULL -> value
+                    ("GM", "02-2025"): 0.25,
+                    ("GM", "03-2025"): 0.30000001, # equal at the column's 4 decimals
+                    ("NM", "01-2025"): None, # value -> NULL
+                    ("NM", "02-2025"): 0.05}))
+
+        self.assertEqual([entry["change_status"] for entry in output], ["updated", "unchanged", "unchanged", "updated", "created"])
+        self.assertEqual(sorted(countRowsWritten.call_args.args[1]), ["created", "updated", "updated"])
+        stored = {(row.kpi_alias, row.month.strftime("%m-%Y")): row.value for row in self.dbSession.scalars(select(fc_app.KPIForecast))}
+        self.assertEqual(float(stored[("GM", "01-2025")]), 0.2)
+        self.assertIsNone(stored[("NM", "01-2025")])
+
+    def test_re_upserting_the_same_forecasts_writes_nothing(self):
+        forecasts = self.kpiForecasts({("GM", "01-2025"): 0.2, ("NM", "01-2025"): None})
+        fc_app.upsertKPIForecasts(self.dbSession, forecasts)
+
+        with patch.object(fc_app, "countRowsWritten") as countRowsWritten:
+            output = fc_app.upsertKPIForecasts(self.dbSession, forecasts)
+
+        self.assertEqual([entry["change_status"] for entry in output], ["unchanged", "unchanged"])
+        self.assertEqual(list(countRowsWritten.call_args.args[1]), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,209 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import torch
+
+# fc_app reads its connection settings on import, nothing connects until a test uses them
+os.environ.setdefault("DATABASE_URL", "postgresql://postgres@localhost/forecast_test")
+os.environ.setdefault("REDIS_URL", "localhost:6379")
+os.environ.setdefault("REDIS_TOPIC", "trigger-training-forecast-test")
+import fc_app
+from run_status import RunStatus
+from models.LSTM.Model import LSTMModel
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+MONTHS = [f"{month:02d}-2024" for month in range(1, 13)]
+
+def trendData(series):
+    """Training/forecasting data of every trend, series only given for the trends in series"""
+    return {trend_name: {"months": MONTHS, **series.get(trend_name, {})} for trend_name in fc_app.TREND_SET}
+
+class WorkDirTestCase(unittest.TestCase):
+    """Runs every test in its own working directory, fc_app keeps weights/<trend>/ relative to it"""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.work_dir = tempfile.mkdtemp(prefix="fc_app_test_")
+        os.chdir(self.work_dir)
+        fc_app.ModelRegistry.clear_cache()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        fc_app.ModelRegistry.clear_cache()
+
+class TestTrainForTrend(WorkDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.static = {"months": MONTHS, "9020-C000::B000": [1.0] * 12, "9020-C001::B000": [2.0] * 12,
+                "9030-C002::B001": [3.0] * 12}
+
+    def savedFingerprints(self, trend_name):
+        with open(f"weights/{trend_name}/fingerprints.json") as f:
+            return json.load(f)
+
+    def lastValues(self):
+        model = fc_app.ModelRegistry.load_model("static", "weights/static/weight.json", use_cache=False)
+        return model.last_values
+
+    def test_unchanged_series_are_skipped_and_carried_over(self):
+        self.assertEqual(fc_app.trainForTrend("static", self.static), (True, 3, 0))
+        self.assertEqual(fc_app.trainForTrend("static", self.static), (True, 0, 0))
+
+        fingerprints = self.savedFingerprints("static")
+        self.static["9020-C001::B000"] = [2.0] * 11 + [5.0]
+        self.assertEqual(fc_app.trainForTrend("static", self.static), (True, 1, 0))
+
+        self.assertEqual(self.lastValues(), {"9020-C000::B000": 1.0, "9020-C001::B000": 5.0, "9030-C002::B001": 3.0})
+        saved = self.savedFingerprints("static")
+        self.assertNotEqual(saved["9020-C001::B000"], fingerprints["9020-C001::B000"])
+        self.assertEqual({k: v for k, v in saved.items() if k != "9020-C001::B000"},
+                {k: v for k, v in fingerprints.items() if k != "9020-C001::B000"})
+
+    def test_weights_without_fingerprints_warm_start_a_full_refit(self):
+        t = np.arange(24.0)
+        data = {"months": [], **{f"6000-P{i:03d}::B000": list(100 + 5 * t + i) for i in range(2)}}
+        params = {"input_size": 6, "output_size": 3, "epochs": 2}
+        with patch.object(fc_app, "TRAINING_PARAMS", params):
+            fc_app.trainForTrend("proportional_to_sales", data)
+        os.remove("weights/proportional_to_sales/fingerprints.json") # as saved before fingerprints existed
+        fc_app.ModelRegistry.clear_cache()
+
+        with patch.object(fc_app, "TRAINING_PARAMS", params), \
+                patch.object(LSTMModel, "train", autospec=True, side_effect=LSTMModel.train) as train:
+            self.assertEqual(fc_app.trainForTrend("proportional_to_sales", data), (True, 2, 0))
+
+        self.assertEqual(set(train.call_args.kwargs["warm_start"].series_names), set(data) - {"months"})
+        self.assertEqual(set(self.savedFingerprints("proportional_to_sales")), set(data) - {"months"})
+
+    def test_changed_series_out_of_scope_keep_their_weights(self):
+        fc_app.trainForTrend("static", self.static)
+        fingerprints = self.savedFingerprints("static")
+        self.static["9020-C000::B000"] = [1.0] * 11 + [4.0]
+        self.static["9030-C002::B001"] = [3.0] * 11 + [6.0]
+        self.static["9040-C003::B001"] = [7.0] * 12 # new, so fitted even though out of scope
+        scope = {"months": {"12-2024"}, "business_units": {"B000"}, "codes": {"9020-C000"}}
+
+        self.assertEqual(fc_app.trainForTrend("static", self.static, scope), (True, 2, 0))
+
+        self.assertEqual(self.lastValues(), {"9020-C000::B000": 4.0, "9020-C001::B000": 2.0, "9030-C002::B001": 3.0,
+                "9040-C003::B001": 7.0})
+        self.assertEqual(self.savedFingerprints("static")["9030-C002::B001"], fingerprints["9030-C002::B001"])
+
+    def test_series_that_fail_to_fit_are_saved_without_a_fingerprint(self):
+        data = {"months": MONTHS + [f"{month:02d}-2025" for month in range(1, 13)]}
+        t = np.arange(24.0)
+        for i in range(2):
+            data[f"5000-G{i:03d}::B000"] = list(1000 + 10 * t + 50 * np.sin(2 * np.pi * t / 12) + i)
+        data["5000-G999::B000"] = [1.0, 2.0] + [None] * 22 # Holt-Winters cannot fit NaNs
+
+        self.assertEqual(fc_app.trainForTrend("gradual_steady_increase", data), (False, 2, 1))
+        self.assertEqual(set(self.savedFingerprints("gradual_steady_increase")), {"5000-G000::B000", "5000-G001::B000"})
+        forecasts = fc_app.forecastForTrend("gradual_steady_increase", data) # every series, as runTrendPipeline passes them
+        self.assertEqual(set(forecasts), {"5000-G000::B000", "5000-G001::B000"})
+        for values in forecasts.values():
+            self.assertEqual(len(values), 3)
+
+        # Only the failed series is refitted on the next run
+        data["5000-G999::B000"] = list(500 + 5 * t + 20 * np.cos(2 * np.pi * t / 12))
+        self.assertEqual(fc_app.trainForTrend("gradual_steady_increase", data), (True, 1, 0))
+        self.assertEqual(len(self.savedFingerprints("gradual_steady_increase")), 3)
+
+class TestMigrateLegacyWeights(WorkDirTestCase):
+    def saveLegacyLSTM(self, legacy_path):
+        # The single torch checkpoint LSTM weights were saved as before the weight matrix
+        torch.manual_seed(0)
+        model = fc_app.ModelRegistry.create("lstm")
+        model.train({"months": [], **{f"6000-P{i:03d}::B000": list(100 + 5 * np.arange(20.0) + i) for i in range(3)}},
+                input_size=6, output_size=3, hidden_size=8, num_layers=1, epochs=2)
+        os.makedirs(os.path.dirname(legacy_path), exist_ok=True)
+        torch.save({
+            "models": {series_name: {"model_state_dict": model.models[series_name]["model"].state_dict(),
+                    "scaler": model.models[series_name]["scaler"]} for series_name in model.series_names},
+            "series_names": model.series_names, "input_size": 6, "output_size": 3, "hidden_size": 8, "num_layers": 1,
+            "is_fitted": True
+        }, legacy_path)
+        return model
+
+    def test_legacy_checkpoint_is_converted_once(self):
+        model = self.saveLegacyLSTM("weights/proportional_to_sales/weight.pt")
+        weight_path = "weights/proportional_to_sales/weight.npy"
+
+        fc_app.migrateLegacyWeights("lstm", "proportional_to_sales", weight_path)
+
+        self.assertFalse(os.path.exists("weights/proportional_to_sales/weight.pt"))
+        migrated = fc_app.ModelRegistry.load_model("lstm", weight_path, use_cache=False)
+        contexts = [[100.0 + i] * 6 for i in range(3)]
+        expected = model.predict_batch(model.series_names, steps=3, contexts=contexts)
+        for series_name, forecast in migrated.predict_batch(model.series_names, steps=3, contexts=contexts).items():
+            np.testing.assert_allclose(forecast, expected[series_name], rtol=1e-6)
+
+        mtime = os.stat(weight_path).st_mtime_ns
+        fc_app.migrateLegacyWeights("lstm", "proportional_to_sales", weight_path) # nothing left to convert
+        self.assertEqual(os.stat(weight_path).st_mtime_ns, mtime)
+
+    def test_unreadable_legacy_weights_are_left_for_a_full_retrain(self):
+        os.makedirs("weights/proportional_to_sales")
+        with open("weights/proportional_to_sales/weight.pt", "wb") as f:
+            f.write(b"not a checkpoint")
+
+        fc_app.migrateLegacyWeights("lstm", "proportional_to_sales", "weights/proportional_to_sales/weight.npy")
+
+        self.assertTrue(os.path.exists("weights/proportional_to_sales/weight.pt"))
+        self.assertFalse(os.path.exists("weights/proportional_to_sales/weight.npy"))
+
+    def test_series_added_since_training_are_not_forecast(self):
+        t = np.arange(24.0)
+        data = {"months": [], "6000-P000::B000": list(100 + 5 * t), "6000-P001::B000": list(200 + 3 * t)}
+        with patch.object(fc_app, "TRAINING_PARAMS", {"input_size": 6, "output_size": 3, "epochs": 2}):
+            self.assertEqual(fc_app.trainForTrend("proportional_to_sales", data), (True, 2, 0))
+        data["6000-P002::B000"] = list(50 + t) # uploaded after the train phase, so it has no weights yet
+
+        forecasts = fc_app.forecastForTrend("proportional_to_sales", data)
+
+        self.assertEqual(set(forecasts), {"6000-P000::B000", "6000-P001::B000"})
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class TestRunTrendPipelines(WorkDirTestCase):
+    def setUp(self):
+        super().setUp()
+        rng = np.random.default_rng(0)
+        self.data = trendData({
+            "static": {f"9020-C{i:03d}::B000": [round(float(rng.uniform(100, 200)), 2)] * 12 for i in range(3)},
+            "gradual_steady_increase": {f"5000-G{i:03d}::B000": list(1000 + 10 * np.arange(12.0) + rng.normal(0, 5, 12))
+                    for i in range(3)}
+        })
+
+    def runPipelines(self, workers, work_dir):
+        os.makedirs(work_dir)
+        os.chdir(work_dir)
+        status = RunStatus(fakeredis.FakeRedis(), ["run1"])
+        with patch.object(fc_app, "FORECAST_WORKERS", workers):
+            forecasts = fc_app.runTrendPipelines(self.data, self.data, status=status)
+        return forecasts, status
+
+    def test_worker_pool_matches_in_process_run(self):
+        pooled, pooled_status = self.runPipelines(2, os.path.join(self.work_dir, "pool"))
+        fc_app.ModelRegistry.clear_cache()
+        serial, _ = self.runPipelines(1, os.path.join(self.work_dir, "serial"))
+
+        self.assertEqual(set(pooled), fc_app.TREND_SET)
+        for trend_name in ["static", "gradual_steady_increase"]:
+            self.assertEqual(set(pooled[trend_name]), set(serial[trend_name]))
+            for series_name, values in serial[trend_name].items():
+                np.testing.assert_allclose(pooled[trend_name][series_name], values)
+        self.assertEqual(pooled["profit_linked"], {}) # no series and no weights for the other trends
+        self.assertEqual(sorted(phase["name"] for phase in pooled_status.phases),
+                sorted(f"{step}:{trend_name}" for trend_name in fc_app.TREND_SET for step in ["train", "forecast"]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,215 @@
+import json
+import os
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+# fc_app reads its connection settings on import, nothing connects until a test uses them
+os.environ.setdefault("DATABASE_URL", "postgresql://postgres@localhost/forecast_test")
+os.environ.setdefault("REDIS_URL", "localhost:6379")
+os.environ.setdefault("REDIS_TOPIC", "trigger-training-forecast-test")
+import fc_app
+from run_status import RunStatus
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+class TestTriggerScope(unittest.TestCase):
+    def test_scope_is_parsed_from_a_scoped_trigger(self):
+        scope = fc_app.parseTriggerScope(json.dumps({"month": "01-2025", "months": ["02-2025"],
+                "business_units": [" b1 ", "B2"], "codes": [" 4000 "], "run_id": "run1"}))
+
+        self.assertEqual(scope, {"months": {"01-2025", "02-2025"}, "business_units": {"B1", "B2"}, "codes": {"4000"}})
+
+    def test_full_and_legacy_triggers_have_no_scope(self):
+        for message in [json.dumps({"full": True}), json.dumps("initiate"), "[]"]:
+            self.assertIsNone(fc_app.parseTriggerScope(message), message)
+
+    def test_merged_scope_is_the_union_of_every_trigger(self):
+        merged = json.loads(fc_app.mergeTriggerMessages([
+                json.dumps({"months": ["02-2025"], "business_units": ["B2"], "codes": ["4100"], "run_id": "run1"}),
+                json.dumps({"month": "01-2025", "business_units": ["B1"], "codes": ["4000"], "run_ids": ["run2", "run1"]})]))
+
+        self.assertEqual(merged, {"months": ["01-2025", "02-2025"], "business_units": ["B1", "B2"],
+                "codes": ["4000", "4100"], "run_ids": ["run1", "run2"]}) # in trigger order, once each
+
+    def test_one_full_trigger_makes_the_merged_run_full(self):
+        merged = json.loads(fc_app.mergeTriggerMessages([json.dumps({"codes": ["4000"], "run_id": "run1"}),
+                json.dumps("initiate"), json.dumps({"full": True, "run_id": "run2"})]))
+
+        self.assertEqual(merged, {"full": True, "run_ids": ["run1", "run2"]})
+
+    def test_series_is_in_scope_when_its_code_and_business_unit_are(self):
+        scope = {"months": {"01-2025"}, "business_units": {"B1"}, "codes": {"4000"}}
+
+        self.assertTrue(fc_app.isInScope("4000::B1", scope))
+        self.assertFalse(fc_app.isInScope("4000::B2", scope))
+        self.assertFalse(fc_app.isInScope("4100::B1", scope))
+        self.assertTrue(fc_app.isInScope("4100::B2", None)) # full run
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class FakeRedisTestCase(unittest.TestCase):
+    """Points fc_app at an in-memory Redis with its lock scripts registered, and joins the consumer group"""
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        patches = [patch.object(fc_app, "r", self.redis),
+                patch.object(fc_app, "release_lock_script", self.redis.register_script(fc_app.release_lock_script.script)),
+                patch.object(fc_app, "renew_lock_script", self.redis.register_script(fc_app.renew_lock_script.script))]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        fc_app.createConsumerGroup()
+
+    def trigger(self, run_id, **scope):
+        return self.redis.xadd(fc_app.REDIS_TOPIC, {"message": json.dumps({**scope, "run_id": run_id})})
+
+    def pending(self):
+        return self.redis.xpending(fc_app.REDIS_TOPIC, fc_app.REDIS_GROUP)["pending"]
+
+class TestClaimStaleMessages(FakeRedisTestCase):
+    def setUp(self):
+        super().setUp()
+        for p in [patch.object(fc_app, "REDIS_CLAIM_IDLE_MS", 0), patch.object(fc_app, "REDIS_MAX_DELIVERIES", 2)]:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_triggers_left_pending_are_reclaimed(self):
+        entry_id = self.trigger("run1", full=True)
+        self.assertEqual([entry_id for entry_id, _ in fc_app.readMessages(">")], [entry_id]) # then the worker died
+
+        stale = fc_app.claimStaleMessages()
+
+        self.assertEqual([(entry_id, fields[b"message"]) for entry_id, fields in stale],
+                [(entry_id, json.dumps({"full": True, "run_id": "run1"}).encode())])
+        self.assertEqual(self.pending(), 1) # still pending until its run succeeds
+
+    def test_trigger_is_dead_lettered_after_the_delivery_limit(self):
+        entry_id = self.trigger("run1", full=True)
+        fc_app.readMessages(">")
+        self.assertEqual(len(fc_app.claimStaleMessages()), 1) # delivered twice, within the limit
+
+        self.assertEqual(fc_app.claimStaleMessages(), [])
+
+        self.assertEqual(self.pending(), 0)
+        dead = self.redis.xrange(fc_app.DEAD_LETTER_TOPIC)
+        self.assertEqual(len(dead), 1)
+        self.assertEqual(dead[0][1][b"entry_id"], entry_id)
+        self.assertEqual(dead[0][1][b"times_delivered"], b"3")
+        self.assertEqual(json.loads(dead[0][1][b"message"])["run_id"], "run1")
+        status = RunStatus.read(self.redis, "run1")
+        self.assertEqual(status["state"], "FAILED")
+        self.assertIn(fc_app.DEAD_LETTER_TOPIC, status["error"])
+
+class TestRunLock(FakeRedisTestCase):
+    def test_only_the_owner_releases_the_lock(self):
+        token = fc_app.acquireRunLock()
+        self.assertIsNotNone(token)
+        self.assertIsNone(fc_app.acquireRunLock())
+
+        self.assertEqual(fc_app.release_lock_script(keys=[fc_app.RUN_LOCK_KEY], args=["someone-else"]), 0)
+        self.assertEqual(self.redis.get(fc_app.RUN_LOCK_KEY), token.encode())
+        self.assertEqual(fc_app.release_lock_script(keys=[fc_app.RUN_LOCK_KEY], args=[token]), 1)
+        self.assertIsNotNone(fc_app.acquireRunLock())
+
+    @patch.object(fc_app, "RUN_LOCK_TTL_MS", 300)
+    def test_the_owner_keeps_renewing_the_lock_past_its_ttl(self):
+        token = fc_app.acquireRunLock()
+        stop_renewal = threading.Event()
+        renewal = threading.Thread(target=fc_app.renewRunLock, args=(token, stop_renewal))
+        renewal.start()
+        time.sleep(0.6)
+        try:
+            self.assertEqual(self.redis.get(fc_app.RUN_LOCK_KEY), token.encode())
+        finally:
+            stop_renewal.set()
+            renewal.join()
+
+    @patch.object(fc_app, "RUN_LOCK_TTL_MS", 300)
+    def test_renewal_stops_once_another_worker_holds_the_lock(self):
+        token = fc_app.acquireRunLock()
+        self.redis.set(fc_app.RUN_LOCK_KEY, "other-worker", px=60000) # our lock expired and was taken over
+
+        renewal = threading.Thread(target=fc_app.renewRunLock, args=(token, threading.Event()))
+        renewal.start()
+        renewal.join(timeout=2)
+
+        self.assertFalse(renewal.is_alive())
+        self.assertEqual(self.redis.get(fc_app.RUN_LOCK_KEY), b"other-worker")
+        self.assertGreater(self.redis.pttl(fc_app.RUN_LOCK_KEY), 50000) # not re-expired with our TTL
+
+class TestHandleTriggers(FakeRedisTestCase):
+    def readTriggers(self, *run_ids):
+        for run_id in run_ids:
+            self.trigger(run_id, months=["01-2025"], business_units=["B1"], codes=[f"4000-{run_id}"])
+        return fc_app.readMessages(">")
+
+    def test_triggers_are_deferred_while_another_worker_runs(self):
+        self.redis.set(fc_app.RUN_LOCK_KEY, "other-worker")
+
+        with patch.object(fc_app, "processMessage") as processMessage:
+            fc_app.handleTriggers(self.readTriggers("run1", "run2"), MagicMock())
+
+        processMessage.assert_not_called()
+        self.assertEqual(self.pending(), 0) # the running worker's follow-up run owns them now
+        self.assertEqual([fc_app.triggerRunIds(message) for message in fc_app.drainDeferredTriggers()], [["run1"], ["run2"]])
+        self.assertEqual(fc_app.drainDeferredTriggers(), [])
+        self.assertEqual(self.redis.get(fc_app.RUN_LOCK_KEY), b"other-worker")
+
+    def test_triggers_arriving_mid_run_get_exactly_one_follow_up_run(self):
+        messages = []
+        def processMessage(message, dbSession, status):
+            messages.append(message)
+            if len(messages) == 1: # two more uploads while the first run is busy
+                fc_app.handleTriggers(self.readTriggers("run2", "run3"), dbSession)
+
+        with patch.object(fc_app, "processMessage", side_effect=processMessage):
+            fc_app.handleTriggers(self.readTriggers("run1"), MagicMock())
+
+        self.assertEqual([fc_app.triggerRunIds(message) for message in messages], [["run1"], ["run2", "run3"]])
+        self.assertEqual(json.loads(messages[1])["codes"], ["4000-run2", "4000-run3"])
+        self.assertEqual(self.pending(), 0)
+        self.assertFalse(self.redis.exists(fc_app.RUN_DEFERRED_KEY))
+        self.assertFalse(self.redis.exists(fc_app.RUN_LOCK_KEY))
+        for run_id in ["run1", "run2", "run3"]:
+            self.assertEqual(RunStatus.read(self.redis, run_id)["state"], "SUCCEEDED")
+
+    def test_a_run_does_not_release_a_lock_it_lost(self):
+        def processMessage(message, dbSession, status):
+            self.redis.set(fc_app.RUN_LOCK_KEY, "other-worker") # our lock expired mid-run and was taken over
+
+        with patch.object(fc_app, "processMessage", side_effect=processMessage):
+            fc_app.handleTriggers(self.readTriggers("run1"), MagicMock())
+
+        self.assertEqual(self.redis.get(fc_app.RUN_LOCK_KEY), b"other-worker")
+
+    def test_deferred_triggers_survive_a_failed_run_with_stream_entries(self):
+        self.redis.rpush(fc_app.RUN_DEFERRED_KEY, json.dumps({"codes": ["4000-run0"], "run_id": "run0"}))
+
+        with patch.object(fc_app, "processMessage", side_effect=RuntimeError("DB down")) as processMessage:
+            fc_app.handleTriggers(self.readTriggers("run1"), MagicMock())
+
+        self.assertEqual(fc_app.triggerRunIds(processMessage.call_args.args[0]), ["run1", "run0"])
+        self.assertEqual(self.pending(), 1) # the stream entry is retried from the pending list
+        self.assertEqual([fc_app.triggerRunIds(message) for message in fc_app.drainDeferredTriggers()], [["run0"]])
+        self.assertEqual(RunStatus.read(self.redis, "run0")["state"], "FAILED")
+        self.assertFalse(self.redis.exists(fc_app.RUN_LOCK_KEY))
+
+    def test_a_failed_follow_up_run_keeps_its_triggers(self):
+        def processMessage(message, dbSession, status):
+            if fc_app.triggerRunIds(message) == ["run1"]:
+                fc_app.handleTriggers(self.readTriggers("run2"), dbSession)
+            else:
+                raise RuntimeError("DB down")
+
+        with patch.object(fc_app, "processMessage", side_effect=processMessage):
+            fc_app.handleTriggers(self.readTriggers("run1"), MagicMock())
+
+        self.assertEqual(self.pending(), 0)
+        self.assertEqual([fc_app.triggerRunIds(message) for message in fc_app.drainDeferredTriggers()], [["run2"]])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")) # forecast_service modules
+from models.AutoETS.Model import AutoETSModel
+
+def seasonalData(n_series, n_months=36, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_months)
+    data = {f"5000-G{i:03d}::B000": list(1000 + 5 * t + 100 * np.sin(2 * np.pi * t / 12) + rng.normal(0, 10, n_months))
+            for i in range(n_series)}
+    data["months"] = [f"{t_i % 12 + 1:02d}-{2020 + t_i // 12}" for t_i in t]
+    return data
+
+class TestAutoETSTrain(unittest.TestCase):
+    def test_process_pool_fits_the_same_models_as_in_process(self):
+        data = seasonalData(6)
+        serial, pooled = AutoETSModel(), AutoETSModel()
+        serial.train(data, n_jobs=1)
+        pooled.train(data, n_jobs=2)
+
+        self.assertEqual(pooled.series_names, serial.series_names)
+        self.assertEqual(list(pooled.models), list(serial.models))
+        self.assertEqual(pooled.models, serial.models)
+
+    def test_failed_series_are_reported_after_every_series_is_tried(self):
+        data = seasonalData(3)
+        data["5000-G999::B000"] = [1.0, 2.0, 3.0] + [None] * 33 # NaNs, Holt-Winters cannot fit it
+        for n_jobs in [1, 2]:
+            model = AutoETSModel()
+            with self.assertRaises(ValueError):
+                model.train(data, n_jobs=n_jobs)
+            self.assertEqual(list(model.fit_errors), ["5000-G999::B000"])
+            self.assertEqual(len(model.models), 3)
+
+class TestAutoETSPredictBatch(unittest.TestCase):
+    def test_predict_batch_matches_predict(self):
+        model = AutoETSModel()
+        model.train(seasonalData(4))
+        series_names = model.series_names[::-1] + model.series_names[1:2] # out of order, one series twice
+
+        batch = model.predict_batch(series_names, steps=18) # longer than a season
+        for series_name in series_names:
+            np.testing.assert_allclose(batch[series_name], model.predict(series_name, steps=18), rtol=1e-9)
+
+    def test_unknown_series_are_skipped(self):
+        model = AutoETSModel()
+        model.train(seasonalData(2))
+
+        batch = model.predict_batch(["5000-G999::B000", model.series_names[1]], steps=3)
+
+        self.assertEqual(list(batch), [model.series_names[1]])
+        np.testing.assert_allclose(batch[model.series_names[1]], model.predict(model.series_names[1], steps=3))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,68 +1,100 @@
 from ..ForecastModel import ForecastModel
 
-from abc import ABC, abstractmethod
 import numpy as np
-import pandas as pd
 import json
-from typing import Dict, Any, List, Tuple
+from typing import Dict, List
 from pathlib import Path
-import pickle
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 
-import torch
-import torch.nn as nn
-from sklearn.preprocessing import StandardScaler
-from statsmodels.tsa.statespace.sarimax import SARIMAX
 from statsmodels.tsa.holtwinters import ExponentialSmoothing
 
-class AutoETSModel:
-    """Holt-Winters - Already works perfectly!"""
+def _fit_series(series_name, series_data, seasonal_periods, trend, seasonal):
+    """Fit one series into its JSON-serializable state, returning the error instead of raising"""
+    try:
+        # Fit Holt-Winters model
+        model = ExponentialSmoothing(
+            series_data,
+            seasonal_periods=seasonal_periods,
+            trend=trend,
+            seasonal=seasonal
+        )
+        fitted_model = model.fit()
+        
+        # Store parameters in JSON-serializable format
+        return series_name, {
+            'params': {
+                'smoothing_level': float(fitted_model.params['smoothing_level']),
+                'smoothing_trend': float(fitted_model.params.get('smoothing_trend', 0)),
+                'smoothing_seasonal': float(fitted_model.params.get('smoothing_seasonal', 0))
+            },
+            'level': float(fitted_model.level[-1]) if hasattr(fitted_model, 'level') else None,
+            'trend': float(fitted_model.trend[-1]) if hasattr(fitted_model, 'trend') else None,
+            'season': fitted_model.season[-seasonal_periods:].tolist() 
+                     if hasattr(fitted_model, 'season') else None,
+            'seasonal_periods': seasonal_periods,
+            'trend_type': trend,
+            'seasonal_type': seasonal
+        }, None
+    except Exception as e:
+        return series_name, None, str(e)
+
+
+class AutoETSModel(ForecastModel):
+    """Holt-Winters - one model per series, fitted in a spawn process pool when n_jobs > 1, stored in ONE JSON file"""
     
     def __init__(self):
         self.model_name = "AutoETS"
         self.models = {}  # {series_name: model_params}
         self.series_names = []
         self.is_fitted = False
+        self.fit_errors = {}  # {series_name: error_message} from the last train
+        self._states = None  # Level, trend & season of all series as arrays, built on first predict_batch
     
-    def train(self, data: Dict[str, List], **kwargs):
+    def train(self, data: Dict[str, List], n_jobs: int = 1, **kwargs):
+        """
+        Fit Holt-Winters per series, fanned out over n_jobs spawn processes when n_jobs > 1. Results come back in
+        series order either way. Every series is tried, then a ValueError lists the ones that failed (see fit_errors).
+        """
         dates = data['months']
         self.series_names = [k for k in data.keys() if k != 'months']
+        self.fit_errors = {}
+        self._states = None
         
         print(f"Training AutoETS for {len(self.series_names)} series...")
         
-        for series_name in self.series_names:
-            series_data = data[series_name]
+        n = len(self.series_names)
+        args = (list(self.series_names),
+                [data[series_name] for series_name in self.series_names],
+                [kwargs.get('seasonal_periods', 12)] * n,
+                [kwargs.get('trend', 'add')] * n,
+                [kwargs.get('seasonal', 'add')] * n)
+        if n_jobs > 1 and n > 1:
+            # map() yields in submission order, so results (and the log) stay deterministic
+            with ProcessPoolExecutor(max_workers=n_jobs, mp_context=multiprocessing.get_context("spawn")) as executor:
+                results = list(executor.map(_fit_series, *args, chunksize=max(1, n // (n_jobs * 4))))
+        else:
+            results = map(_fit_series, *args)
+        
+        for i, (series_name, model_data, error) in enumerate(results, start=1):
+            if error is not None:
+                self.fit_errors[series_name] = error
+                print(f"  ✗ [{i}/{n}] {series_name}: {error}")
+                continue
             
-            # Fit Holt-Winters model
-            model = ExponentialSmoothing(
-                series_data,
-                seasonal_periods=kwargs.get('seasonal_periods', 12),
-                trend=kwargs.get('trend', 'add'),
-                seasonal=kwargs.get('seasonal', 'add')
-            )
-            fitted_model = model.fit()
+            self.models[series_name] = model_data
             
-            # Store parameters in JSON-serializable format
-            self.models[series_name] = {
-                'params': {
-                    'smoothing_level': float(fitted_model.params['smoothing_level']),
-                    'smoothing_trend': float(fitted_model.params.get('smoothing_trend', 0)),
-                    'smoothing_seasonal': float(fitted_model.params.get('smoothing_seasonal', 0))
-                },
-                'level': float(fitted_model.level[-1]) if hasattr(fitted_model, 'level') else None,
-                'trend': float(fitted_model.trend[-1]) if hasattr(fitted_model, 'trend') else None,
-                'season': fitted_model.season[-kwargs.get('seasonal_periods', 12):].tolist() 
-                         if hasattr(fitted_model, 'season') else None,
-                'seasonal_periods': kwargs.get('seasonal_periods', 12),
-                'trend_type': kwargs.get('trend', 'add'),
-                'seasonal_type': kwargs.get('seasonal', 'add')
-            }
-            
-            print(f"  ✓ {series_name}")
+            print(f"  ✓ [{i}/{n}] {series_name}")
         
-        self.is_fitted = True
+        # The series that did fit stay usable, so the caller can still save them & refit only the failures
+        self.series_names = [series_name for series_name in self.series_names if series_name not in self.fit_errors]
+        self.is_fitted = bool(self.models)
+        if self.fit_errors:
+            raise ValueError(f"AutoETS failed to fit {len(self.fit_errors)}/{n} series: "
+                             + ", ".join(self.fit_errors.keys()))
     
     def predict(self, series_name: str, steps: int, **kwargs) -> np.ndarray:
-        """Predict single series - Already works!"""
+        """Predict single series from its stored level, trend & season"""
         if not self.is_fitted:
             raise ValueError("Model must be fitted first")
         
@@ -85,8 +117,48 @@ class AutoETSModel:
         
         return np.array(forecasts)
     
+    def predict_batch(self, series_names: List[str], steps: int, contexts: List[List[float]] = None) -> Dict[str, np.ndarray]:
+        """Predict many series with one array expression over the stored states"""
+        if not self.is_fitted:
+            raise ValueError("Model must be fitted first")
+        
+        series_names, contexts = self._predictable(series_names, contexts, self.models)
+        
+        if self._states is None:
+            names = list(self.models.keys())
+            periods = np.array([self.models[series_name]['seasonal_periods'] for series_name in names], dtype=int)
+            season = np.zeros((len(names), periods.max() if len(names) else 1))
+            for i, series_name in enumerate(names):
+                if self.models[series_name]['season']:
+                    season[i, :periods[i]] = self.models[series_name]['season']
+            self._states = {
+                'index': {series_name: i for i, series_name in enumerate(names)},
+                'level': np.array([self.models[series_name]['level'] for series_name in names], dtype=float),
+                'trend': np.array([self.models[series_name]['trend'] or 0 for series_name in names], dtype=float),
+                'season': season,
+                'periods': periods
+            }
+        rows = np.array([self._states['index'][series_name] for series_name in series_names], dtype=int)
+        
+        horizon = np.arange(steps)
+        season_idx = horizon[None, :] % self._states['periods'][rows, None]
+        forecasts = (self._states['level'][rows, None]
+                     + (horizon[None, :] + 1) * self._states['trend'][rows, None]
+                     + np.take_along_axis(self._states['season'][rows], season_idx, axis=1))
+        
+        return {series_name: forecasts[i] for i, series_name in enumerate(series_names)}
+    
+    def carry_over(self, previous: ForecastModel, series_names: List[str]) -> None:
+        """Copy already fitted series from a previous AutoETS model"""
+        for series_name in series_names:
+            self.models[series_name] = previous.models[series_name]
+            if series_name not in self.series_names:
+                self.series_names.append(series_name)
+        self._states = None
+        self.is_fitted = True
+    
     def save(self, filepath: str) -> None:
-        """Save ALL models to ONE JSON file - Already works!"""
+        """Save ALL models to ONE JSON file"""
         Path(filepath).parent.mkdir(parents=True, exist_ok=True)
         with open(filepath, 'w') as f:
             json.dump({
@@ -98,11 +170,12 @@ class AutoETSModel:
         print(f"✓ Saved {len(self.models)} AutoETS models to {filepath}")
     
     def load(self, filepath: str) -> None:
-        """Load ALL models from ONE JSON file - Already works!"""
+        """Load ALL models from ONE JSON file"""
         with open(filepath, 'r') as f:
             data = json.load(f)
             self.models = data['models']
             self.series_names = data['series_names']
             self.is_fitted = True
+            self._states = None
         
         print(f"✓ Loaded {len(self.models)} AutoETS models from {filepath}")
@@ -2,7 +2,7 @@ from abc import ABC, abstractmethod
 import numpy as np
 import pandas as pd
 import json
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 from pathlib import Path
 
 
@@ -24,6 +24,39 @@ class ForecastModel(ABC):
         """Generate forecasts for a specific series"""
         pass
     
+    def predict_batch(self, series_names: List[str], steps: int, contexts: List[List[float]]) -> Dict[str, np.ndarray]:
+        """
+        Generate forecasts for many series at once, models override this with a vectorised version.
+        Series the model cannot forecast are skipped & reported, the result only holds the others.
+        """
+        series_names, contexts = self._predictable(series_names, contexts, self.series_names)
+        return {series_name: self.predict(series_name=series_name, steps=steps, last_values=last_values)
+                for series_name, last_values in zip(series_names, contexts)}
+    
+    def _predictable(self, series_names: List[str], contexts: Optional[List[List[float]]], fitted,
+                     min_context: int = 0) -> Tuple[List[str], List[List[float]]]:
+        """The requested series (& their contexts) that are fitted and have at least min_context values"""
+        contexts = contexts if contexts is not None else [None] * len(series_names)
+        kept_names, kept_contexts, missing, short = [], [], [], []
+        for series_name, last_values in zip(series_names, contexts):
+            if series_name not in fitted:
+                missing.append(series_name)
+            elif min_context and (last_values is None or len(last_values) < min_context):
+                short.append(series_name)
+            else:
+                kept_names.append(series_name)
+                kept_contexts.append(last_values)
+        if missing:
+            print(f"  ✗ Skipping {len(missing)} series not found in trained models: {missing}")
+        if short:
+            print(f"  ✗ Skipping {len(short)} series with fewer than {min_context} historical values: {short}")
+        return kept_names, kept_contexts
+    
+    @abstractmethod
+    def carry_over(self, previous: 'ForecastModel', series_names: List[str]) -> None:
+        """Copy the fitted state of the given series from a previously trained model"""
+        pass
+    
     @abstractmethod
     def save(self, filepath: str) -> None:
         """Save model weights/parameters"""
@@ -34,6 +67,10 @@ class ForecastModel(ABC):
         """Load model weights/parameters"""
         pass
     
+    def memory_bytes(self) -> Optional[int]:
+        """Estimated memory held by the loaded model, None when unknown (ModelRegistry then counts the artifact size)"""
+        return None
+    
     def get_metadata(self) -> Dict[str, Any]:
         """Return model metadata"""
         return {
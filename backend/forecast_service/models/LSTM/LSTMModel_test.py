@@ -0,0 +1,130 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import torch
+from sklearn.preprocessing import StandardScaler
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")) # forecast_service modules
+from models.LSTM.Model import LSTMModel
+
+PARAMS = {"input_size": 6, "output_size": 3, "hidden_size": 8, "num_layers": 2}
+
+def salesData(lengths, seed=0):
+    rng = np.random.default_rng(seed)
+    data = {}
+    for i, n_months in enumerate(lengths):
+        t = np.arange(n_months)
+        data[f"6000-P{i:03d}::B000"] = list(1000 + 10 * t + 100 * np.sin(2 * np.pi * t / 12) + rng.normal(0, 10, n_months))
+    data["months"] = []
+    return data
+
+def trainSequentially(model, data, epochs, warm_start=None):
+    """Train every series on its own module with a plain Adam loop, the per-series training stacking replaced"""
+    torch.manual_seed(0) # modules are initialised in the same order as in train
+    state_dicts = {}
+    for series_name in [k for k in data if k != "months"]:
+        X, y = model._create_sequences([data[series_name]], model.input_size, model.output_size)
+        scaler = warm_start.models[series_name]["scaler"] if warm_start else StandardScaler().fit(X.reshape(-1, 1))
+        X_tensor = torch.FloatTensor(scaler.transform(X.reshape(-1, 1)).reshape(X.shape)).unsqueeze(-1)
+        y_tensor = torch.FloatTensor(scaler.transform(y.reshape(-1, 1)).reshape(y.shape))
+
+        module = model._new_model()
+        if warm_start:
+            module.load_state_dict(warm_start.models[series_name]["model"].state_dict())
+        optimizer = torch.optim.Adam(module.parameters(), lr=0.001)
+        for _ in range(epochs):
+            optimizer.zero_grad()
+            loss = torch.nn.MSELoss()(module(X_tensor), y_tensor)
+            loss.backward()
+            optimizer.step()
+        state_dicts[series_name] = module.state_dict()
+    return state_dicts
+
+class TestLSTMStackedTraining(unittest.TestCase):
+    def assertMatchesSequential(self, model, expected):
+        for series_name, state_dict in expected.items():
+            trained = model.models[series_name]["model"].state_dict()
+            for name, value in state_dict.items():
+                np.testing.assert_allclose(trained[name].numpy(), value.numpy(), atol=1e-5, err_msg=f"{series_name} {name}")
+
+    def test_stacked_training_matches_training_each_series_alone(self):
+        data = salesData([30, 30, 30, 24]) # two stacking groups
+        torch.manual_seed(0)
+        model = LSTMModel()
+        model.train(data, epochs=20, **PARAMS)
+
+        self.assertMatchesSequential(model, trainSequentially(model, data, 20))
+
+    def test_warm_start_matches_fine_tuning_each_series_alone(self):
+        data = salesData([30, 30, 24])
+        torch.manual_seed(1)
+        previous = LSTMModel()
+        previous.train(data, epochs=10, **PARAMS)
+
+        data = salesData([30, 30, 24], seed=1)
+        torch.manual_seed(0)
+        model = LSTMModel()
+        model.train(data, epochs=20, warm_start=previous, warm_start_epochs=5, **PARAMS)
+
+        self.assertMatchesSequential(model, trainSequentially(model, data, 5, warm_start=previous))
+
+class TestLSTMBatchedInference(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.data = salesData([30] * 5)
+        self.series_names = [k for k in self.data if k != "months"]
+        self.contexts = [self.data[series_name][-PARAMS["input_size"]:] for series_name in self.series_names]
+        torch.manual_seed(0)
+        self.model = LSTMModel()
+        self.model.train(self.data, epochs=5, **PARAMS)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def test_predict_batch_matches_predict(self):
+        for series_names in [self.series_names, self.series_names[3:]]: # every stacked series, then a few rows
+            contexts = self.contexts[-len(series_names):]
+            batch = self.model.predict_batch(series_names, steps=3, contexts=contexts)
+            for series_name, last_values in zip(series_names, contexts):
+                np.testing.assert_allclose(batch[series_name],
+                        self.model.predict(series_name, steps=3, last_values=last_values), rtol=1e-5)
+
+    def test_unknown_series_and_short_contexts_are_skipped(self):
+        series_names = ["6000-P999::B000"] + self.series_names[:2]
+        contexts = [self.contexts[0], self.contexts[0], self.contexts[1][-PARAMS["input_size"] + 1:]] # last one too short
+
+        batch = self.model.predict_batch(series_names, steps=3, contexts=contexts)
+
+        self.assertEqual(list(batch), [self.series_names[0]])
+        np.testing.assert_allclose(batch[self.series_names[0]],
+                self.model.predict(self.series_names[0], steps=3, last_values=self.contexts[0]), rtol=1e-5)
+
+    def test_carried_series_stay_bit_exact_across_re_saves(self):
+        filepath = os.path.join(self.work_dir, "weight.npy")
+        self.model.save(filepath)
+        previous = LSTMModel()
+        previous.load(filepath)
+
+        changed = {"months": [], self.series_names[0]: self.data[self.series_names[0]]}
+        model = LSTMModel()
+        model.train(changed, epochs=5, warm_start=previous, **PARAMS)
+        model.carry_over(previous, self.series_names[1:])
+        model.save(filepath)
+        reloaded = LSTMModel()
+        reloaded.load(filepath)
+
+        before, after = self.model.models.matrix(), reloaded.models.matrix()
+        for series_name in self.series_names[1:]:
+            row_before, row_after = before["index"][series_name], after["index"][series_name]
+            self.assertTrue(np.array_equal(after["weights"][row_after], before["weights"][row_before]))
+            self.assertEqual(after["mean"][row_after], before["mean"][row_before])
+            self.assertEqual(after["scale"][row_after], before["scale"][row_before])
+        self.assertFalse(np.array_equal(after["weights"][after["index"][self.series_names[0]]],
+                before["weights"][before["index"][self.series_names[0]]]))
+
+if __name__ == '__main__':
+    unittest.main()
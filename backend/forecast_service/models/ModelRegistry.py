@@ -5,8 +5,25 @@ from .AutoETS.Model import AutoETSModel
 from .LSTM.Model import LSTMModel
 from .NBEATS.Model import NBeatsModel
 from .Static.Model import StaticModel
+from .SeriesModelStore import index_path
 
 from typing import Dict, Any, List, Tuple
+from collections import OrderedDict
+import os
+
+# Weight file written by each model type, weights/<trend>/weight.<extension>
+MODEL_TO_WEIGHT_EXTENSION_TYPE_MAP = {
+    'sarimax': 'npz',
+    'autoets': 'json',
+    'lstm': 'npy',
+    'nbeats': 'npy',
+    'static': 'json'
+}
+LEGACY_WEIGHT_EXTENSION_TYPE_MAP = { # Older weight formats still loadable, converted on the next train
+    'sarimax': 'pkl',
+    'lstm': 'pt',
+    'nbeats': 'ckpt'
+}
 
 class ModelRegistry:
     """Factory for creating and loading models"""
@@ -19,6 +36,12 @@ class ModelRegistry:
         'static': StaticModel
     }
     
+    # LRU cache of loaded models, keyed by (model_type, abs_path, (mtime_ns, size) of the artifact & of its index)
+    # so re-saving either file is a miss
+    _cache = OrderedDict()  # {cache_key: (model, model_bytes)}
+    _cache_bytes = 0
+    _cache_max_bytes = 512 * 1024 ** 2  # bound on the summed memory of cached models
+    
     # Instantiate empty model object, typically for training
     @classmethod
     def create(cls, model_type: str) -> ForecastModel:
@@ -26,13 +49,79 @@ class ModelRegistry:
             raise ValueError(f"Unknown model: {model_type}. Available: {list(cls._models.keys())}")
         return cls._models[model_type]()
     
-    # Instantiate model object with specified weights (by path)
+    # Instantiate model object with specified weights (by path), reusing the cached object if the artifact is unchanged
     @classmethod
-    def load_model(cls, model_type: str, filepath: str) -> ForecastModel:
+    def load_model(cls, model_type: str, filepath: str, use_cache: bool = True) -> ForecastModel:
+        if use_cache:
+            cache_key = cls._cache_key(model_type, filepath)
+            if cache_key in cls._cache:
+                cls._cache.move_to_end(cache_key)
+                model = cls._cache[cache_key][0]
+                cls._resize(cache_key) # lazily loaded models grow as they are used
+                return model
+        
         model = cls.create(model_type)
         model.load(filepath)
+        if use_cache:
+            cls.cache_model(model_type, filepath, model)
         return model
     
+    # Hand a model that was just saved to filepath straight to later load_model calls
+    @classmethod
+    def cache_model(cls, model_type: str, filepath: str, model: ForecastModel) -> None:
+        cache_key = cls._cache_key(model_type, filepath)
+        for stale_key in [key for key in cls._cache if key[:2] == cache_key[:2]]:
+            cls._evict(stale_key)
+        
+        model_bytes = cls._model_bytes(model, cache_key)
+        if model_bytes > cls._cache_max_bytes:
+            return
+        cls._cache[cache_key] = (model, model_bytes)
+        cls._cache_bytes += model_bytes
+        cls._evict_to_limit()
+    
+    @classmethod
+    def set_cache_limit(cls, max_bytes: int) -> None:
+        cls._cache_max_bytes = max_bytes
+        cls._evict_to_limit()
+    
+    @classmethod
+    def clear_cache(cls) -> None:
+        cls._cache.clear()
+        cls._cache_bytes = 0
+    
+    @classmethod
+    def _cache_key(cls, model_type: str, filepath: str) -> Tuple:
+        stat = os.stat(filepath)
+        index_file = index_path(filepath)
+        index_stat = os.stat(index_file) if os.path.exists(index_file) else None
+        return (model_type, os.path.abspath(filepath), (stat.st_mtime_ns, stat.st_size),
+                (index_stat.st_mtime_ns, index_stat.st_size) if index_stat else None)
+    
+    @staticmethod
+    def _model_bytes(model: ForecastModel, cache_key: Tuple) -> int:
+        # Resident size as the model reports it (a memory mapped store is mostly not), else the artifact size on disk
+        model_bytes = model.memory_bytes()
+        return model_bytes if model_bytes is not None else cache_key[2][1] + (cache_key[3][1] if cache_key[3] else 0)
+    
+    @classmethod
+    def _resize(cls, cache_key: Tuple) -> None:
+        model, model_bytes = cls._cache[cache_key]
+        new_bytes = cls._model_bytes(model, cache_key)
+        cls._cache[cache_key] = (model, new_bytes)
+        cls._cache_bytes += new_bytes - model_bytes
+        cls._evict_to_limit()
+    
+    @classmethod
+    def _evict(cls, cache_key: Tuple) -> None:
+        _, model_bytes = cls._cache.pop(cache_key)
+        cls._cache_bytes -= model_bytes
+    
+    @classmethod
+    def _evict_to_limit(cls) -> None:
+        while cls._cache_bytes > cls._cache_max_bytes:
+            cls._evict(next(iter(cls._cache)))  # least recently used first
+    
     @classmethod
     def list_models(cls) -> List[str]:
-        return list(cls._models.keys())
\ No newline at end of file
+        return list(cls._models.keys())
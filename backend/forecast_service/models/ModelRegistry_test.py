@@ -0,0 +1,89 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")) # forecast_service modules
+from models.ModelRegistry import ModelRegistry
+from models.SeriesModelStore import index_path
+
+class TestModelRegistryCache(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.max_bytes = ModelRegistry._cache_max_bytes
+        ModelRegistry.clear_cache()
+
+    def tearDown(self):
+        ModelRegistry.set_cache_limit(self.max_bytes)
+        ModelRegistry.clear_cache()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def saveStatic(self, name, last_value=1.0):
+        model = ModelRegistry.create("static")
+        model.train({"months": ["01-2024"], "9020-C000::B000": [last_value]})
+        filepath = os.path.join(self.work_dir, name, "weight.json")
+        model.save(filepath)
+        return filepath
+
+    def saveLSTM(self, n_series=4):
+        torch.manual_seed(0)
+        model = ModelRegistry.create("lstm")
+        data = {f"6000-P{i:03d}::B000": [float(v) for v in range(20)] for i in range(n_series)}
+        model.train({"months": [], **data}, input_size=6, output_size=3, hidden_size=8, num_layers=1, epochs=1)
+        filepath = os.path.join(self.work_dir, "lstm", "weight.npy")
+        model.save(filepath)
+        return filepath
+
+    def test_least_recently_used_model_is_evicted_first(self):
+        paths = [self.saveStatic(name) for name in ["a", "b", "c"]]
+        ModelRegistry.set_cache_limit(2 * os.path.getsize(paths[0]))
+        a = ModelRegistry.load_model("static", paths[0])
+        b = ModelRegistry.load_model("static", paths[1])
+        self.assertIs(ModelRegistry.load_model("static", paths[0]), a) # a is now the most recently used
+
+        ModelRegistry.load_model("static", paths[2])
+
+        self.assertIs(ModelRegistry.load_model("static", paths[0]), a)
+        self.assertIsNot(ModelRegistry.load_model("static", paths[1]), b)
+        self.assertLessEqual(ModelRegistry._cache_bytes, ModelRegistry._cache_max_bytes)
+
+    def test_re_saved_artifact_or_index_is_reloaded(self):
+        filepath = self.saveStatic("a")
+        cached = ModelRegistry.load_model("static", filepath)
+        self.saveStatic("a", last_value=2.0)
+        reloaded = ModelRegistry.load_model("static", filepath)
+        self.assertIsNot(reloaded, cached)
+        self.assertEqual(reloaded.last_values["9020-C000::B000"], 2.0)
+
+        filepath = self.saveLSTM()
+        cached = ModelRegistry.load_model("lstm", filepath)
+        stat = os.stat(index_path(filepath))
+        os.utime(index_path(filepath), ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000)) # only the index changed
+        self.assertIsNot(ModelRegistry.load_model("lstm", filepath), cached)
+        self.assertEqual(len(ModelRegistry._cache), 2) # the stale entry of each path was dropped
+
+    def test_use_cache_false_neither_reads_nor_fills_the_cache(self):
+        filepath = self.saveStatic("a")
+        uncached = ModelRegistry.load_model("static", filepath, use_cache=False)
+        self.assertEqual(len(ModelRegistry._cache), 0)
+
+        cached = ModelRegistry.load_model("static", filepath)
+        self.assertIsNot(cached, uncached)
+        self.assertIsNot(ModelRegistry.load_model("static", filepath, use_cache=False), cached)
+        self.assertIs(ModelRegistry.load_model("static", filepath), cached)
+
+    def test_memory_mapped_models_count_the_series_they_built(self):
+        filepath = self.saveLSTM()
+        model = ModelRegistry.load_model("lstm", filepath)
+        opened_bytes = ModelRegistry._cache_bytes
+        self.assertLess(opened_bytes, os.path.getsize(filepath)) # the mapped weights are not resident
+
+        model.predict(model.series_names[0], steps=3, last_values=[1.0] * 6)
+        ModelRegistry.load_model("lstm", filepath)
+        self.assertGreater(ModelRegistry._cache_bytes, opened_bytes)
+
+if __name__ == '__main__':
+    unittest.main()
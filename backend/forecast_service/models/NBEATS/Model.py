@@ -1,4 +1,5 @@
 from ..ForecastModel import ForecastModel
+from ..SeriesModelStore import SeriesModelStore, is_weight_matrix
 
 from abc import ABC, abstractmethod
 import numpy as np
@@ -17,13 +18,13 @@ from statsmodels.tsa.holtwinters import ExponentialSmoothing
 
 class NBeatsModel(ForecastModel):
     """
-    N-BEATS - Train separate model per series, store all in ONE file.
+    N-BEATS - Train separate model per series, store all in ONE memory mapped weight matrix.
     This matches the statistical models' behavior.
     """
     
     def __init__(self):
         self.model_name = "N-BEATS"
-        self.models = {}  # {series_name: {'model': model, 'scaler': scaler}}
+        self.models = SeriesModelStore(self._new_model)  # {series_name: {'model': model, 'scaler': scaler}}
         self.series_names = []
         self.input_size = None
         self.output_size = None
@@ -33,53 +34,108 @@ class NBeatsModel(ForecastModel):
               input_size: int = 10, 
               output_size: int = 5,
               epochs: int = 100,
+              series_batch_size: int = 256,
+              warm_start: ForecastModel = None,
+              warm_start_epochs: int = None,
               **kwargs):
-        """Train separate N-BEATS model for each series"""
+        """
+        Train separate N-BEATS model for each series, optimising up to series_batch_size series at once.
+        
+        Series already in warm_start (a previously trained model of the same architecture) reuse its
+        weights and scaler and are fine-tuned for warm_start_epochs (default epochs // 5) instead.
+        """
         
         self.series_names = [k for k in data.keys() if k != 'months']
         self.input_size = input_size
         self.output_size = output_size
         
+        warm_models = {}
+        if warm_start is not None and warm_start._architecture() == self._architecture():
+            warm_models = warm_start.models
+        if warm_start_epochs is None:
+            warm_start_epochs = max(1, epochs // 5)
+        
         print(f"Training N-BEATS for {len(self.series_names)} series...")
+        if warm_models:
+            print(f"Warm-starting {sum(s in warm_models for s in self.series_names)} series for {warm_start_epochs} epochs...")
         
+        # Series with the same warm/cold start and number of windows can be stacked into one optimisation
+        groups = {}
         for series_name in self.series_names:
             series_data = data[series_name]
             
             # Create sequences for this series
             X_train, y_train = self._create_sequences([series_data], input_size, output_size)
             
-            # Scale data
-            scaler = StandardScaler()
-            X_train_scaled = scaler.fit_transform(X_train.reshape(-1, 1)).reshape(X_train.shape)
+            # Scale data, keeping the previous scaler when warm-starting so the old weights still apply
+            warm = series_name in warm_models
+            scaler = warm_models[series_name]['scaler'] if warm else StandardScaler().fit(X_train.reshape(-1, 1))
+            X_train_scaled = scaler.transform(X_train.reshape(-1, 1)).reshape(X_train.shape)
             y_train_scaled = scaler.transform(y_train.reshape(-1, 1)).reshape(y_train.shape)
             
-            # Convert to tensors
-            X_tensor = torch.FloatTensor(X_train_scaled)
-            y_tensor = torch.FloatTensor(y_train_scaled)
-            
-            # Build and train model for this series
+            # Build model for this series, starting from its previous weights when warm-starting
             model = self._build_model(input_size, output_size)
-            criterion = nn.MSELoss()
-            optimizer = torch.optim.Adam(model.parameters(), lr=0.001)
-            
-            for epoch in range(epochs):
-                model.train()
-                optimizer.zero_grad()
-                outputs = model(X_tensor)
-                loss = criterion(outputs, y_tensor)
-                loss.backward()
-                optimizer.step()
-            
-            # Store model and scaler
+            if warm:
+                model.load_state_dict(warm_models[series_name]['model'].state_dict())
             self.models[series_name] = {
                 'model': model,
                 'scaler': scaler
             }
-            
-            print(f"  ✓ {series_name}: Final Loss={loss.item():.4f}")
+            groups.setdefault((warm, X_train.shape[0]), []).append((series_name, X_train_scaled, y_train_scaled))
+        
+        for (warm, _), group in groups.items():
+            for start in range(0, len(group), series_batch_size):
+                batch = group[start:start + series_batch_size]
+                batch_names = [series_name for series_name, _, _ in batch]
+                X_tensor = torch.FloatTensor(np.stack([X for _, X, _ in batch]))
+                y_tensor = torch.FloatTensor(np.stack([y for _, _, y in batch]))
+                
+                losses = self._train_stacked(batch_names, X_tensor, y_tensor, warm_start_epochs if warm else epochs)
+                for series_name, loss in zip(batch_names, losses):
+                    print(f"  ✓ {series_name}: Final Loss={loss:.4f}")
         
         self.is_fitted = True
     
+    def _train_stacked(self, series_names, X_tensor, y_tensor, epochs):
+        """
+        Train the given series' models as one stacked model. Every series keeps its own weights and
+        Adam state, and the summed loss leaves each series' gradient untouched, so this is equivalent
+        to training them one by one. Returns each series' final loss.
+        """
+        models = [self.models[series_name]['model'] for series_name in series_names]
+        weights = self._stack_weights(models, requires_grad=True)
+        optimizer = torch.optim.Adam(weights.values(), lr=0.001)
+        
+        for epoch in range(epochs):
+            optimizer.zero_grad()
+            outputs = self._stacked_forward(weights, X_tensor)
+            losses = ((outputs - y_tensor) ** 2).mean(dim=(1, 2))  # MSELoss per series
+            losses.sum().backward()
+            optimizer.step()
+        
+        for i, model in enumerate(models):
+            model.load_state_dict({name: weight[i].detach() for name, weight in weights.items()})
+            model.eval()
+        return losses.tolist()
+    
+    def _stack_weights(self, models, requires_grad=False):
+        """Stack each parameter of the given models along a new leading series dimension"""
+        state_dicts = [model.state_dict() for model in models]
+        return {name: torch.stack([state_dict[name] for state_dict in state_dicts]).requires_grad_(requires_grad)
+                for name in state_dicts[0]}
+    
+    def _stacked_forward(self, weights, x):
+        """SimpleNBeats forward over stacked weights: x is (series, batch, input_size)"""
+        x = torch.relu(torch.baddbmm(weights['fc1.bias'].unsqueeze(1), x, weights['fc1.weight'].transpose(1, 2)))
+        x = torch.relu(torch.baddbmm(weights['fc2.bias'].unsqueeze(1), x, weights['fc2.weight'].transpose(1, 2)))
+        return torch.baddbmm(weights['fc3.bias'].unsqueeze(1), x, weights['fc3.weight'].transpose(1, 2))
+    
+    def _architecture(self):
+        return (self.input_size, self.output_size)
+    
+    def _new_model(self):
+        return self._build_model(self.input_size, self.output_size)
+    
     def _build_model(self, input_size, output_size):
         class SimpleNBeats(nn.Module):
             def __init__(self, input_size, output_size):
@@ -132,30 +188,84 @@ class NBeatsModel(ForecastModel):
             
             return prediction[:steps]
     
-    def save(self, filepath: str) -> None:
-        """Save ALL models to ONE .pt file"""
-        Path(filepath).parent.mkdir(parents=True, exist_ok=True)
-        
-        # Extract state dicts from all models
-        models_state = {}
-        for series_name, model_data in self.models.items():
-            models_state[series_name] = {
-                'model_state_dict': model_data['model'].state_dict(),
-                'scaler': model_data['scaler']
-            }
+    def predict_batch(self, series_names: List[str], steps: int, contexts: List[List[float]]) -> Dict[str, np.ndarray]:
+        """Predict many series in one forward pass over their stacked weights"""
+        if not self.is_fitted:
+            raise ValueError("Model must be fitted first")
         
-        torch.save({
-            'models': models_state,  # All series models
+        series_names, contexts = self._predictable(series_names, contexts, self.models, min_context=self.input_size)
+        
+        if not series_names:
+            return {}
+        
+        matrix = self.models.matrix()
+        rows = [matrix['index'][series_name] for series_name in series_names]
+        mean = matrix['mean'][rows][:, None]
+        scale = matrix['scale'][rows][:, None]
+        
+        with torch.no_grad():
+            input_data = np.array([last_values[-self.input_size:] for last_values in contexts], dtype=float)
+            input_scaled = (input_data - mean) / scale
+            
+            n_stacked = len(matrix['index'])
+            if 2 * len(rows) >= n_stacked:
+                # Most series requested: run every stacked series rather than copying weight rows out
+                stacked_input = np.zeros((n_stacked, self.input_size))
+                stacked_input[rows] = input_scaled
+                input_tensor = torch.FloatTensor(stacked_input).unsqueeze(1)
+                weights = self.models.unpack(matrix['weights'])
+                prediction_scaled = self._stacked_forward(weights, input_tensor).numpy()[rows, 0, :]
+            else:
+                # Only the requested rows are read, from a loaded model's memory map that is O(requested series)
+                weights = self.models.unpack(matrix['weights'][rows])
+                input_tensor = torch.FloatTensor(input_scaled).unsqueeze(1)
+                prediction_scaled = self._stacked_forward(weights, input_tensor).numpy()[:, 0, :]
+            prediction = prediction_scaled * scale + mean
+        
+        return {series_name: prediction[i, :steps] for i, series_name in enumerate(series_names)}
+    
+    def carry_over(self, previous: ForecastModel, series_names: List[str]) -> None:
+        """Copy already trained series from a previous N-BEATS with the same architecture"""
+        if previous._architecture() != self._architecture():
+            raise ValueError("Cannot carry over series from an N-BEATS with a different architecture")
+        
+        self.models.carry_over(previous.models, series_names)
+        for series_name in series_names:
+            if series_name not in self.series_names:
+                self.series_names.append(series_name)
+        self.is_fitted = True
+    
+    def memory_bytes(self) -> int:
+        return self.models.memory_bytes()
+    
+    def save(self, filepath: str) -> None:
+        """Save ALL models to ONE weight matrix (.npy) with its JSON index next to it"""
+        self.models.save(filepath, {
+            'model_name': self.model_name,
             'input_size': self.input_size,
             'output_size': self.output_size,
-            'series_names': self.series_names,
             'is_fitted': self.is_fitted
-        }, filepath)
+        })
         
         print(f"✓ Saved {len(self.models)} N-BEATS models to {filepath}")
     
     def load(self, filepath: str) -> None:
-        """Load ALL models from ONE .pt file"""
+        """Open ALL models from ONE weight matrix, series are built when first used. Legacy torch checkpoints load eagerly"""
+        if not is_weight_matrix(filepath):
+            self._load_legacy(filepath)
+            return
+        checkpoint = SeriesModelStore.read_index(filepath)
+        
+        self.input_size = checkpoint['input_size']
+        self.output_size = checkpoint['output_size']
+        self.series_names = checkpoint['series_names']
+        self.is_fitted = checkpoint['is_fitted']
+        self.models = SeriesModelStore.open(filepath, self._new_model, index=checkpoint)
+        
+        print(f"✓ Loaded {len(self.models)} N-BEATS models from {filepath}")
+    
+    def _load_legacy(self, filepath):
+        # Weights were one torch.save of every series' state dict & scaler before the weight matrix
         checkpoint = torch.load(filepath, weights_only=False)
         
         self.input_size = checkpoint['input_size']
@@ -163,10 +273,9 @@ class NBeatsModel(ForecastModel):
         self.series_names = checkpoint['series_names']
         self.is_fitted = checkpoint['is_fitted']
         
-        # Reconstruct all models
-        self.models = {}
+        self.models = SeriesModelStore(self._new_model)
         for series_name, model_state in checkpoint['models'].items():
-            model = self._build_model(self.input_size, self.output_size)
+            model = self._new_model()
             model.load_state_dict(model_state['model_state_dict'])
             model.eval()
             
@@ -175,4 +284,4 @@ class NBeatsModel(ForecastModel):
                 'scaler': model_state['scaler']
             }
         
-        print(f"✓ Loaded {len(self.models)} N-BEATS models from {filepath}")
\ No newline at end of file
+        print(f"✓ Loaded {len(self.models)} N-BEATS models from legacy checkpoint {filepath}")
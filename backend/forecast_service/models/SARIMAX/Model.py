@@ -1,88 +1,205 @@
 from ..ForecastModel import ForecastModel
 
-from abc import ABC, abstractmethod
 import numpy as np
-import pandas as pd
-import json
-from typing import Dict, Any, List, Tuple
+from typing import Dict, List
 from pathlib import Path
 import pickle
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 
-import torch
-import torch.nn as nn
-from sklearn.preprocessing import StandardScaler
 from statsmodels.tsa.statespace.sarimax import SARIMAX
-from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+FORMAT_VERSION = 1  # of the .npz layout written by SARIMAXModel.save
+
+def _fit_series(series_name, series_data, order, seasonal_order):
+    """Fit one series into its compact state, returning the error instead of raising so one bad series does not abort the pool"""
+    try:
+        model = SARIMAX(series_data, order=order, seasonal_order=seasonal_order)
+        return series_name, _compact_state(model.fit(disp=False)), None
+    except Exception as e:
+        return series_name, None, str(e)
+
+def _compact_state(fitted_model):
+    """Fitted parameters & final filtered state are all a forecast needs, the results object drags the whole history along"""
+    return {
+        'params': np.asarray(fitted_model.params, dtype=float),
+        'state': np.asarray(fitted_model.filtered_state[:, -1], dtype=float),
+        'aic': float(fitted_model.aic)
+    }
+
 
 class SARIMAXModel(ForecastModel):
-    """SARIMAX model - stores separate model per series in ONE file"""
+    """SARIMAX model - stores the parameters & final filtered state of every series in ONE columnar .npz"""
     
     def __init__(self):
         self.model_name = "SARIMAX"
-        self.models = {}  # {series_name: fitted_model_object}
+        self.models = {}  # {series_name: {'params', 'state', 'aic'}}
         self.series_names = []
         self.is_fitted = False
-        self.training_data = {}  # Store for predictions
+        self.order = None
+        self.seasonal_order = None
+        self.fit_errors = {}  # {series_name: error_message} from the last train
+        self._matrices = None  # State space matrices of all series as arrays, rebuilt from params on first predict_batch
     
-    def train(self, data: Dict[str, List], order=(1, 1, 1), seasonal_order=(1, 1, 1, 12), **kwargs):
+    def train(self, data: Dict[str, List], order=(1, 1, 1), seasonal_order=(1, 1, 1, 12), n_jobs: int = 1, **kwargs):
+        """Fit one SARIMAX per series, fanned out over n_jobs processes when n_jobs > 1"""
         dates = data['months']
         self.series_names = [k for k in data.keys() if k != 'months']
+        self.order = tuple(order)
+        self.seasonal_order = tuple(seasonal_order)
+        self.fit_errors = {}
+        self._matrices = None
         
         print(f"Training SARIMAX for {len(self.series_names)} series...")
         
-        for series_name in self.series_names:
-            series_data = data[series_name]
-            
-            # Fit SARIMAX model
-            model = SARIMAX(series_data, order=order, seasonal_order=seasonal_order)
-            fitted_model = model.fit(disp=False)
+        n = len(self.series_names)
+        args = (list(self.series_names),
+                [data[series_name] for series_name in self.series_names],
+                [order] * n,
+                [seasonal_order] * n)
+        if n_jobs > 1 and n > 1:
+            # map() yields in submission order, so results (and the log) stay deterministic
+            with ProcessPoolExecutor(max_workers=n_jobs, mp_context=multiprocessing.get_context("spawn")) as executor:
+                results = list(executor.map(_fit_series, *args, chunksize=max(1, n // (n_jobs * 4))))
+        else:
+            results = map(_fit_series, *args)
+        
+        for i, (series_name, model_data, error) in enumerate(results, start=1):
+            if error is not None:
+                self.fit_errors[series_name] = error
+                print(f"  ✗ [{i}/{n}] {series_name}: {error}")
+                continue
             
-            # Store the FITTED model (not just parameters)
-            self.models[series_name] = fitted_model
-            # Store training data for predictions
-            self.training_data[series_name] = series_data
+            self.models[series_name] = model_data
             
-            print(f"  ✓ {series_name}: AIC={fitted_model.aic:.2f}")
+            print(f"  ✓ [{i}/{n}] {series_name}: AIC={model_data['aic']:.2f}")
         
-        self.is_fitted = True
+        # The series that did fit stay usable, so the caller can still save them & refit only the failures
+        self.series_names = [series_name for series_name in self.series_names if series_name not in self.fit_errors]
+        self.is_fitted = bool(self.models)
+        if self.fit_errors:
+            raise ValueError(f"SARIMAX failed to fit {len(self.fit_errors)}/{n} series: "
+                             + ", ".join(self.fit_errors.keys()))
     
     def predict(self, series_name: str, steps: int, **kwargs) -> np.ndarray:
         """Predict single series"""
+        if series_name not in self.models:
+            raise ValueError(f"Series '{series_name}' not found in trained models")
+        return self.predict_batch(series_names=[series_name], steps=steps)[series_name]
+    
+    def predict_batch(self, series_names: List[str], steps: int, contexts: List[List[float]] = None) -> Dict[str, np.ndarray]:
+        """Roll the final filtered state of every series forward through its state space, all series at once"""
         if not self.is_fitted:
             raise ValueError("Model must be fitted first")
         
-        if series_name not in self.models:
-            raise ValueError(f"Series '{series_name}' not found in trained models")
+        series_names, contexts = self._predictable(series_names, contexts, self.models)
+        
+        if self._matrices is None:
+            self._matrices = self._build_matrices()
+        rows = np.array([self._matrices['index'][series_name] for series_name in series_names], dtype=int)
         
-        # Use statsmodels' forecast method
-        fitted_model = self.models[series_name]
-        forecast = fitted_model.forecast(steps=steps)
+        transition = self._matrices['transition'][rows]
+        state_intercept = self._matrices['state_intercept'][rows]
+        state = self._matrices['state'][rows]
+        forecasts = np.empty((len(rows), steps))
+        for step in range(steps):
+            state = np.einsum('sij,sj->si', transition, state) + state_intercept
+            forecasts[:, step] = np.einsum('si,si->s', self._matrices['design'][rows], state) + self._matrices['obs_intercept'][rows]
         
-        return np.array(forecast)
+        return {series_name: forecasts[i] for i, series_name in enumerate(series_names)}
+    
+    def _build_matrices(self):
+        # One throwaway model per order: update() writes each series' params into its state space matrices
+        names = list(self.models.keys())
+        k_states = len(self.models[names[0]]['state']) if names else 0
+        template = SARIMAX(np.zeros(k_states + 1), order=self.order, seasonal_order=self.seasonal_order)
+        matrices = {
+            'index': {series_name: i for i, series_name in enumerate(names)},
+            'transition': np.empty((len(names), k_states, k_states)),
+            'design': np.empty((len(names), k_states)),
+            'state_intercept': np.empty((len(names), k_states)),
+            'obs_intercept': np.empty(len(names)),
+            'state': np.array([self.models[series_name]['state'] for series_name in names]).reshape(len(names), k_states)
+        }
+        for i, series_name in enumerate(names):
+            template.update(self.models[series_name]['params'])
+            matrices['transition'][i] = template.ssm['transition']
+            matrices['design'][i] = template.ssm['design'][0]
+            matrices['state_intercept'][i] = template.ssm['state_intercept']
+            matrices['obs_intercept'][i] = template.ssm['obs_intercept'][0]
+        return matrices
+    
+    def carry_over(self, previous: ForecastModel, series_names: List[str]) -> None:
+        """Copy already fitted series from a previous SARIMAX model"""
+        if series_names and (previous.order, previous.seasonal_order) != (self.order, self.seasonal_order):
+            raise ValueError(f"Cannot carry over SARIMAX{previous.order}x{previous.seasonal_order} series "
+                             f"into SARIMAX{self.order}x{self.seasonal_order}")
+        for series_name in series_names:
+            self.models[series_name] = previous.models[series_name]
+            if series_name not in self.series_names:
+                self.series_names.append(series_name)
+        self._matrices = None
+        self.is_fitted = True
+    
+    def memory_bytes(self) -> int:
+        """Compact per-series arrays plus the state space matrices once predict_batch built them"""
+        total = sum(model_data['params'].nbytes + model_data['state'].nbytes for model_data in self.models.values())
+        if self._matrices is not None:
+            total += sum(value.nbytes for key, value in self._matrices.items() if key != 'index')
+        return total
     
     def save(self, filepath: str) -> None:
-        """Save ALL models to ONE file using pickle"""
+        """Save ALL models to ONE .npz, one array per field with a row per series"""
         Path(filepath).parent.mkdir(parents=True, exist_ok=True)
         
-        # Pickle can serialize statsmodels objects
+        names = list(self.models.keys())
+        # Writing through a file object keeps np.savez from appending .npz to the path
         with open(filepath, 'wb') as f:
-            pickle.dump({
-                'model_name': self.model_name,
-                'models': self.models,  # All fitted models
-                'series_names': self.series_names,
-                'training_data': self.training_data,
-                'is_fitted': self.is_fitted
-            }, f)
+            np.savez(f,
+                     format_version=FORMAT_VERSION,
+                     order=np.array(self.order if self.order else (), dtype=int),
+                     seasonal_order=np.array(self.seasonal_order if self.seasonal_order else (), dtype=int),
+                     series_names=np.array(names, dtype=str),
+                     params=np.array([self.models[series_name]['params'] for series_name in names]).reshape(len(names), -1),
+                     state=np.array([self.models[series_name]['state'] for series_name in names]).reshape(len(names), -1),
+                     aic=np.array([self.models[series_name]['aic'] for series_name in names], dtype=float),
+                     is_fitted=self.is_fitted)
         
         print(f"✓ Saved {len(self.models)} SARIMAX models to {filepath}")
     
     def load(self, filepath: str) -> None:
-        """Load ALL models from ONE file"""
+        """Load ALL models from ONE .npz, or from a legacy pickle of statsmodels results"""
+        if not zipfile.is_zipfile(filepath):
+            self._load_legacy(filepath)
+            return
+        with np.load(filepath) as data:
+            if int(data['format_version']) > FORMAT_VERSION:
+                raise ValueError(f"{filepath} has SARIMAX format {int(data['format_version'])}, "
+                                 f"this version reads up to {FORMAT_VERSION}")
+            names = data['series_names'].tolist()
+            params, state, aic = data['params'], data['state'], data['aic']
+            self.order = tuple(data['order'].tolist()) or None
+            self.seasonal_order = tuple(data['seasonal_order'].tolist()) or None
+            self.models = {series_name: {'params': params[i], 'state': state[i], 'aic': float(aic[i])}
+                           for i, series_name in enumerate(names)}
+            self.series_names = names
+            self.is_fitted = bool(data['is_fitted'])
+            self._matrices = None
+        
+        print(f"✓ Loaded {len(self.models)} SARIMAX models from {filepath}")
+    
+    def _load_legacy(self, filepath):
+        # Weights pickled whole statsmodels results objects before the compact format, keep only what a forecast needs
         with open(filepath, 'rb') as f:
             data = pickle.load(f)
-            self.models = data['models']
-            self.series_names = data['series_names']
-            self.training_data = data.get('training_data', {})
-            self.is_fitted = data['is_fitted']
+        self.models = {series_name: _compact_state(fitted_model) for series_name, fitted_model in data['models'].items()}
+        if data['models']:
+            fitted_model = next(iter(data['models'].values()))
+            self.order = tuple(fitted_model.model.order)
+            self.seasonal_order = tuple(fitted_model.model.seasonal_order)
+        self.series_names = data['series_names']
+        self.is_fitted = data['is_fitted']
+        self._matrices = None
         
-        print(f"✓ Loaded {len(self.models)} SARIMAX models from {filepath}")
+        print(f"✓ Loaded {len(self.models)} SARIMAX models from legacy pickle {filepath}")
@@ -0,0 +1,94 @@
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import unittest
+import warnings
+
+import numpy as np
+from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")) # forecast_service modules
+from models.SARIMAX.Model import SARIMAXModel
+
+def seasonalData(lengths, seed=0):
+    rng = np.random.default_rng(seed)
+    data = {}
+    for i, n_months in enumerate(lengths):
+        t = np.arange(n_months)
+        data[f"7000-S{i:03d}::B000"] = list(500 + 3 * t + 50 * np.sin(2 * np.pi * t / 12) + rng.normal(0, 5, n_months))
+    data["months"] = []
+    return data
+
+class TestSARIMAXPredictBatch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.model = SARIMAXModel()
+        cls.model.train(seasonalData([36, 36, 30]))
+
+    def test_predict_batch_matches_predict(self):
+        series_names = self.model.series_names[::-1]
+        batch = self.model.predict_batch(series_names, steps=6)
+
+        self.assertEqual(list(batch), series_names)
+        for series_name in series_names:
+            np.testing.assert_allclose(batch[series_name], self.model.predict(series_name, steps=6), rtol=1e-9)
+
+    def test_unknown_series_are_skipped(self):
+        series_name = self.model.series_names[0]
+        batch = self.model.predict_batch(["7000-S999::B000", series_name], steps=6)
+
+        self.assertEqual(list(batch), [series_name])
+        np.testing.assert_allclose(batch[series_name], self.model.predict(series_name, steps=6), rtol=1e-9)
+        with self.assertRaises(ValueError):
+            self.model.predict("7000-S999::B000", steps=6)
+
+class TestSARIMAXForecast(unittest.TestCase):
+    """predict_batch rolls the compact state itself, it must agree with statsmodels' own forecast"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.work_dir = tempfile.mkdtemp()
+        cls.data = seasonalData([48, 36, 24, 16], seed=1) # the shortest ones barely cover the seasonal differencing
+        cls.series_names = [k for k in cls.data if k != "months"]
+        cls.model = SARIMAXModel()
+        cls.model.train(cls.data)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            cls.results = {series_name: SARIMAX(cls.data[series_name], order=(1, 1, 1), seasonal_order=(1, 1, 1, 12))
+                    .fit(disp=False) for series_name in cls.series_names}
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.work_dir, ignore_errors=True)
+
+    def assertMatchesStatsmodels(self, model):
+        forecasts = model.predict_batch(self.series_names, steps=12)
+        for series_name in self.series_names:
+            np.testing.assert_allclose(forecasts[series_name], self.results[series_name].forecast(12),
+                    rtol=1e-6, atol=1e-6, err_msg=series_name)
+
+    def test_predict_batch_matches_statsmodels_forecast(self):
+        self.assertMatchesStatsmodels(self.model)
+
+    def test_forecast_is_unchanged_by_an_npz_round_trip(self):
+        filepath = os.path.join(self.work_dir, "weight.npz")
+        self.model.save(filepath)
+        loaded = SARIMAXModel()
+        loaded.load(filepath)
+
+        self.assertEqual((loaded.order, loaded.seasonal_order), ((1, 1, 1), (1, 1, 1, 12)))
+        self.assertMatchesStatsmodels(loaded)
+
+    def test_legacy_pickle_forecasts_like_the_results_it_holds(self):
+        filepath = os.path.join(self.work_dir, "weight.pkl")
+        with open(filepath, "wb") as f:
+            pickle.dump({"models": self.results, "series_names": self.series_names, "is_fitted": True}, f)
+        loaded = SARIMAXModel()
+        loaded.load(filepath)
+
+        self.assertMatchesStatsmodels(loaded)
+
+if __name__ == '__main__':
+    unittest.main()
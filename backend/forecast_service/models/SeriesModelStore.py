@@ -0,0 +1,203 @@
+from collections.abc import MutableMapping
+import json
+import os
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+import torch
+import torch.nn as nn
+from sklearn.preprocessing import StandardScaler
+
+FORMAT_VERSION = 1  # of the .npy + index layout written by SeriesModelStore.save
+NPY_MAGIC = b"\x93NUMPY"
+SCALER_FIELDS = ("mean", "scale", "var", "n_samples_seen")
+
+
+def index_path(filepath: str) -> str:
+    """The JSON index saved next to a weight matrix: weights/<trend>/weight.npy -> weights/<trend>/weight.index.json"""
+    return str(Path(filepath).with_suffix(".index.json"))
+
+def is_weight_matrix(filepath: str) -> bool:
+    """True for weights saved by SeriesModelStore, False for a legacy torch checkpoint"""
+    with open(filepath, "rb") as f:
+        return f.read(len(NPY_MAGIC)) == NPY_MAGIC
+
+def _finish_interrupted_save(filepath: str) -> None:
+    # Only once the new matrix is in place (its .tmp gone) does a leftover index belong to it
+    tmp_index_path = f"{index_path(filepath)}.tmp"
+    if os.path.exists(tmp_index_path) and not os.path.exists(f"{filepath}.tmp"):
+        os.replace(tmp_index_path, index_path(filepath))
+
+
+class SeriesModelStore(MutableMapping):
+    """
+    {series_name: {'model': nn.Module, 'scaler': StandardScaler}} of the per-series NN models.
+
+    Saved as ONE float32 .npy holding a row of flattened parameters per series, plus a JSON index with the
+    architecture, the parameter layout of a row and every series' row & scaler. Opening it memory maps the matrix,
+    so a series' module & scaler are only built when it is accessed, and predict_batch reads the rows it needs
+    straight from the matrix. Loading cost grows with the series used, not with the series stored.
+    """
+
+    def __init__(self, build_model: Callable[[], nn.Module]):
+        self.build_model = build_model  # an untrained module with the architecture of every series
+        self.layout = None  # [(parameter name, shape)] in row order
+        self._slots = {}  # {series_name: {'model', 'scaler'} or (source, row) until accessed}
+        self._source = None  # the opened file's arrays, while the series are still exactly its rows
+        self._matrix = None  # {'index', 'weights', <scaler fields>} of all series, built on first matrix()
+
+    @classmethod
+    def open(cls, filepath: str, build_model: Callable[[], nn.Module], index: Dict = None) -> "SeriesModelStore":
+        index = index if index is not None else cls.read_index(filepath)
+        weights = np.load(filepath, mmap_mode="c")  # copy-on-write: torch gets writable arrays, the file is never touched
+        if weights.shape[0] != len(index["series_names"]):
+            raise ValueError(f"{filepath} has {weights.shape[0]} rows but its index lists "
+                             f"{len(index['series_names'])} series")
+        source = {"weights": weights, **{field: np.array(index["scaler"][field]) for field in SCALER_FIELDS}}
+
+        store = cls(build_model)
+        store.layout = [(name, tuple(shape)) for name, shape in index["layout"]]
+        store._slots = {series_name: (source, row) for row, series_name in enumerate(index["series_names"])}
+        store._source = source
+        return store
+
+    @staticmethod
+    def read_index(filepath: str) -> Dict:
+        _finish_interrupted_save(filepath)
+        with open(index_path(filepath), "r") as f:
+            index = json.load(f)
+        if index["format_version"] > FORMAT_VERSION:
+            raise ValueError(f"{filepath} has weight format {index['format_version']}, "
+                             f"this version reads up to {FORMAT_VERSION}")
+        return index
+
+    def save(self, filepath: str, metadata: Dict) -> None:
+        """Write every series to filepath & its index. metadata (architecture etc.) is kept in the index"""
+        Path(filepath).parent.mkdir(parents=True, exist_ok=True)
+        matrix = self.matrix()
+
+        # Written aside & swapped in: a model loaded from the old file keeps reading its own memory map.
+        # Swapping in the matrix commits the save, an index left behind by a crash after it is swapped in on open
+        tmp_path, tmp_index_path = f"{filepath}.tmp", f"{index_path(filepath)}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.save(f, matrix["weights"])
+            with open(tmp_index_path, "w") as f:
+                json.dump({
+                    "format_version": FORMAT_VERSION,
+                    **metadata,
+                    "layout": [[name, list(shape)] for name, shape in self.layout or []],
+                    "series_names": list(matrix["index"]),
+                    "scaler": {field: matrix[field].tolist() for field in SCALER_FIELDS}
+                }, f)
+            os.replace(tmp_path, filepath)
+        except BaseException:
+            for path in [tmp_path, tmp_index_path]: # the previous matrix & index are untouched
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+        os.replace(tmp_index_path, index_path(filepath))
+
+    def matrix(self) -> Dict:
+        """Parameters of all series as one [series, params] float32 array with the scaler statistics alongside"""
+        if self._matrix is not None:
+            return self._matrix
+        names = list(self._slots)
+        if self._source is not None:
+            # Untouched since open(): the memory mapped file already is the matrix
+            self._matrix = {"index": {series_name: i for i, series_name in enumerate(names)}, **self._source}
+            return self._matrix
+
+        if self.layout is None and names:
+            self.layout = [(name, tuple(value.shape)) for name, value in self[names[0]]["model"].state_dict().items()]
+        n_params = sum(int(np.prod(shape)) for _, shape in self.layout or [])
+        matrix = {"index": {series_name: i for i, series_name in enumerate(names)},
+                  "weights": np.empty((len(names), n_params), dtype=np.float32),
+                  **{field: np.empty(len(names)) for field in SCALER_FIELDS}}
+        for i, slot in enumerate(self._slots.values()):
+            if isinstance(slot, tuple):
+                source, row = slot
+                matrix["weights"][i] = source["weights"][row]
+                for field in SCALER_FIELDS:
+                    matrix[field][i] = source[field][row]
+            else:
+                state_dict = slot["model"].state_dict()
+                matrix["weights"][i] = np.concatenate([state_dict[name].detach().cpu().numpy().ravel()
+                                                       for name, _ in self.layout]) if self.layout else []
+                scaler = slot["scaler"]
+                matrix["mean"][i], matrix["scale"][i], matrix["var"][i] = scaler.mean_[0], scaler.scale_[0], scaler.var_[0]
+                matrix["n_samples_seen"][i] = np.max(scaler.n_samples_seen_)
+        self._matrix = matrix
+        return matrix
+
+    def memory_bytes(self) -> int:
+        """Built series & an in-memory matrix, memory mapped rows live in the page cache and are not counted"""
+        n_params = sum(int(np.prod(shape)) for _, shape in self.layout or [])
+        n_built = sum(not isinstance(slot, tuple) for slot in self._slots.values())
+        total = 4 * n_params * n_built + 8 * len(SCALER_FIELDS) * len(self._slots)
+        if self._matrix is not None and not isinstance(self._matrix["weights"], np.memmap):
+            total += self._matrix["weights"].nbytes
+        return total
+
+    def unpack(self, weights: np.ndarray) -> Dict[str, torch.Tensor]:
+        """Split [series, params] rows into stacked parameters {name: (series, *shape)}, without copying"""
+        stacked, offset = {}, 0
+        for name, shape in self.layout:
+            size = int(np.prod(shape))
+            stacked[name] = torch.from_numpy(weights[:, offset:offset + size].reshape(len(weights), *shape))
+            offset += size
+        return stacked
+
+    def carry_over(self, previous: "SeriesModelStore", series_names: List[str]) -> None:
+        """Take the given series from another store, without building the ones it has not built yet"""
+        if self.layout is None:
+            self.layout = previous.layout
+        for series_name in series_names:
+            self._slots[series_name] = previous._slots[series_name]
+        self._source = None
+        self._matrix = None
+
+    def _materialise(self, source, row):
+        model = self.build_model()
+        weights = source["weights"][row]
+        state_dict, offset = {}, 0
+        for name, shape in self.layout:
+            size = int(np.prod(shape))
+            state_dict[name] = torch.from_numpy(np.array(weights[offset:offset + size]).reshape(shape))
+            offset += size
+        model.load_state_dict(state_dict)
+        model.eval()
+
+        scaler = StandardScaler()
+        scaler.mean_ = np.array([source["mean"][row]])
+        scaler.scale_ = np.array([source["scale"][row]])
+        scaler.var_ = np.array([source["var"][row]])
+        scaler.n_samples_seen_ = int(source["n_samples_seen"][row])
+        scaler.n_features_in_ = 1
+        return {"model": model, "scaler": scaler}
+
+    def __getitem__(self, series_name):
+        slot = self._slots[series_name]
+        if isinstance(slot, tuple):
+            slot = self._slots[series_name] = self._materialise(*slot)
+        return slot
+
+    def __setitem__(self, series_name, model_data):
+        self._slots[series_name] = model_data
+        self._source = None
+        self._matrix = None
+
+    def __delitem__(self, series_name):
+        del self._slots[series_name]
+        self._source = None
+        self._matrix = None
+
+    def __contains__(self, series_name):
+        return series_name in self._slots
+
+    def __iter__(self):
+        return iter(self._slots)
+
+    def __len__(self):
+        return len(self._slots)
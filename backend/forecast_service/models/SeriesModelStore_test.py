@@ -0,0 +1,127 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import torch
+import torch.nn as nn
+from sklearn.preprocessing import StandardScaler
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")) # forecast_service modules
+import models.SeriesModelStore as series_model_store
+from models.SeriesModelStore import SeriesModelStore, index_path, is_weight_matrix
+
+def buildModel():
+    return nn.Linear(4, 2)
+
+def fittedSeries(seed):
+    torch.manual_seed(seed)
+    return {"model": buildModel(), "scaler": StandardScaler().fit(np.arange(seed, seed + 10.0).reshape(-1, 1))}
+
+class TestSeriesModelStore(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.work_dir, "weights", "weight.npy")
+        self.store = SeriesModelStore(buildModel)
+        for i, series_name in enumerate(["A::B1", "A::B2", "C::B1"]):
+            self.store[series_name] = fittedSeries(i)
+        self.store.save(self.filepath, {"input_size": 4})
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def test_open_builds_series_only_when_accessed(self):
+        store = SeriesModelStore.open(self.filepath, buildModel)
+
+        self.assertTrue(is_weight_matrix(self.filepath))
+        self.assertEqual(SeriesModelStore.read_index(self.filepath)["input_size"], 4)
+        self.assertEqual(list(store), ["A::B1", "A::B2", "C::B1"])
+        self.assertEqual(sum(not isinstance(slot, tuple) for slot in store._slots.values()), 0)
+
+        series = store["A::B2"]
+        expected = self.store["A::B2"]
+        for name, value in expected["model"].state_dict().items():
+            self.assertTrue(torch.equal(series["model"].state_dict()[name], value))
+        self.assertEqual(series["scaler"].transform([[3.0]])[0, 0], expected["scaler"].transform([[3.0]])[0, 0])
+        self.assertEqual(sum(not isinstance(slot, tuple) for slot in store._slots.values()), 1)
+
+    def test_unpack_stacks_the_requested_rows(self):
+        store = SeriesModelStore.open(self.filepath, buildModel)
+        matrix = store.matrix()
+        weights = store.unpack(matrix["weights"][[2, 0]])
+
+        self.assertEqual(tuple(weights["weight"].shape), (2, 2, 4))
+        self.assertTrue(torch.equal(weights["bias"][0], self.store["C::B1"]["model"].bias.detach()))
+
+    def test_carried_series_survive_overwriting_their_file(self):
+        previous = SeriesModelStore.open(self.filepath, buildModel)
+        store = SeriesModelStore(buildModel)
+        store["D::B1"] = fittedSeries(7)
+        store.carry_over(previous, ["A::B1", "C::B1"])
+        store.save(self.filepath, {"input_size": 4})
+
+        reopened = SeriesModelStore.open(self.filepath, buildModel)
+        self.assertEqual(list(reopened), ["D::B1", "A::B1", "C::B1"])
+        self.assertTrue(np.array_equal(reopened.matrix()["weights"][1], previous.matrix()["weights"][0]))
+        self.assertTrue(os.path.exists(index_path(self.filepath)))
+
+class TestSeriesModelStoreSave(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.work_dir, "weight.npy")
+        previous = SeriesModelStore(buildModel)
+        for i, series_name in enumerate(["A::B1", "A::B2"]):
+            previous[series_name] = fittedSeries(i)
+        previous.save(self.filepath, {"input_size": 4})
+        self.previous = SeriesModelStore.open(self.filepath, buildModel)
+        self.store = SeriesModelStore(buildModel)
+        self.store["C::B1"] = fittedSeries(5)
+        self.store.carry_over(self.previous, ["A::B2"])
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def assertReopensAs(self, series_names, expected):
+        reopened = SeriesModelStore.open(self.filepath, buildModel)
+        self.assertEqual(list(reopened), series_names)
+        self.assertTrue(np.array_equal(reopened.matrix()["weights"], expected.matrix()["weights"]))
+        self.assertTrue(np.array_equal(reopened.matrix()["mean"], expected.matrix()["mean"]))
+
+    def test_failed_save_leaves_the_previous_matrix_and_index(self):
+        expected = np.array(self.previous.matrix()["weights"])
+        with patch.object(series_model_store.json, "dump", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.store.save(self.filepath, {"input_size": 4})
+
+        self.assertEqual(sorted(os.listdir(self.work_dir)), ["weight.index.json", "weight.npy"]) # no .tmp left
+        reopened = SeriesModelStore.open(self.filepath, buildModel)
+        self.assertEqual(list(reopened), ["A::B1", "A::B2"])
+        self.assertTrue(np.array_equal(reopened.matrix()["weights"], expected))
+        self.assertTrue(np.array_equal(self.previous.matrix()["weights"], expected)) # its memory map still reads
+
+    def test_save_interrupted_after_swapping_in_the_matrix_is_finished_on_open(self):
+        replace = os.replace
+        def crashOnIndex(src, dst):
+            if dst == index_path(self.filepath):
+                raise OSError("killed")
+            replace(src, dst)
+
+        with patch.object(series_model_store.os, "replace", side_effect=crashOnIndex):
+            with self.assertRaises(OSError):
+                self.store.save(self.filepath, {"input_size": 4})
+
+        self.assertReopensAs(["C::B1", "A::B2"], self.store)
+        self.assertEqual(sorted(os.listdir(self.work_dir)), ["weight.index.json", "weight.npy"])
+
+    def test_save_interrupted_before_swapping_in_the_matrix_keeps_the_previous_one(self):
+        with patch.object(series_model_store.os, "replace", side_effect=OSError("killed")):
+            with self.assertRaises(OSError):
+                self.store.save(self.filepath, {"input_size": 4})
+
+        self.assertReopensAs(["A::B1", "A::B2"], self.previous)
+
+if __name__ == '__main__':
+    unittest.main()
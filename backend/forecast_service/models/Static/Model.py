@@ -14,10 +14,12 @@ class StaticModel(ForecastModel):
         self.series_names = []
         self.last_values = {}  # {series_name: last_observed_value}
         self.is_fitted = False
+        self._last_values = None  # Last values of all series as an array, built on first predict_batch
     
     def train(self, data: Dict[str, List], **kwargs) -> None:
         """Store the last value of each series"""
         self.series_names = [k for k in data.keys() if k != 'months']
+        self._last_values = None
         
         print(f"Training Static model for {len(self.series_names)} series...")
         
@@ -42,6 +44,33 @@ class StaticModel(ForecastModel):
         # Return array of the last value repeated 'steps' times
         return np.full(steps, self.last_values[series_name])
     
+    def predict_batch(self, series_names: List[str], steps: int, contexts: List[List[float]] = None) -> Dict[str, np.ndarray]:
+        """Repeat every requested series' last value in one array operation"""
+        if not self.is_fitted:
+            raise ValueError("Model must be fitted first")
+        
+        series_names, contexts = self._predictable(series_names, contexts, self.last_values)
+        
+        if self._last_values is None:
+            names = list(self.last_values.keys())
+            self._last_values = {
+                'index': {series_name: i for i, series_name in enumerate(names)},
+                'values': np.array([self.last_values[series_name] for series_name in names], dtype=float)
+            }
+        rows = [self._last_values['index'][series_name] for series_name in series_names]
+        forecasts = np.repeat(self._last_values['values'][rows, None], steps, axis=1)
+        
+        return {series_name: forecasts[i] for i, series_name in enumerate(series_names)}
+    
+    def carry_over(self, previous: ForecastModel, series_names: List[str]) -> None:
+        """Copy already stored series from a previous Static model"""
+        for series_name in series_names:
+            self.last_values[series_name] = previous.last_values[series_name]
+            if series_name not in self.series_names:
+                self.series_names.append(series_name)
+        self._last_values = None
+        self.is_fitted = True
+    
     def save(self, filepath: str) -> None:
         """Save last values to JSON file"""
         Path(filepath).parent.mkdir(parents=True, exist_ok=True)
@@ -65,5 +94,6 @@ class StaticModel(ForecastModel):
             self.last_values = data['last_values']
             self.series_names = data['series_names']
             self.is_fitted = data['is_fitted']
+            self._last_values = None
         
         print(f"✓ Loaded Static model with {len(self.last_values)} series from {filepath}")
\ No newline at end of file
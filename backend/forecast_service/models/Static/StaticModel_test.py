@@ -0,0 +1,39 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")) # forecast_service modules
+from models.Static.Model import StaticModel
+
+class TestStaticPredictBatch(unittest.TestCase):
+    def setUp(self):
+        self.model = StaticModel()
+        self.model.train({"months": ["01-2024", "02-2024"], "9020-C000::B000": [10.0, 12.5],
+                "9020-C001::B000": [3.0, 0.0], "9020-C002::B000": [7.0, 7.25]})
+
+    def test_predict_batch_matches_predict(self):
+        series_names = ["9020-C002::B000", "9020-C000::B000"]
+        batch = self.model.predict_batch(series_names, steps=4)
+
+        self.assertEqual(list(batch), series_names)
+        for series_name in series_names:
+            np.testing.assert_allclose(batch[series_name], self.model.predict(series_name, steps=4))
+
+    def test_unknown_series_are_skipped(self):
+        batch = self.model.predict_batch(["9020-C000::B000", "9020-C999::B000"], steps=2)
+
+        self.assertEqual(list(batch), ["9020-C000::B000"])
+        np.testing.assert_allclose(batch["9020-C000::B000"], [12.5, 12.5])
+
+    def test_carried_series_are_predicted_after_the_batch_cache_was_built(self):
+        self.model.predict_batch(["9020-C000::B000"], steps=1)
+        previous = StaticModel()
+        previous.train({"months": ["01-2024"], "9020-C003::B000": [42.0]})
+        self.model.carry_over(previous, ["9020-C003::B000"])
+
+        np.testing.assert_allclose(self.model.predict_batch(["9020-C003::B000"], steps=2)["9020-C003::B000"], [42.0, 42.0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class NotificationDispatcher:
+    """
+    Sends alerts on a bounded thread pool so a forecast run waits for the slowest send, not the sum of all of them.
+    WhatsApp messages share one keep-alive HTTP session; other channels submit their own send callable.
+    Latency and success counts are kept per channel; observer, if given, is called with
+    (channel, success, latency_s) after every send, e.g. to feed metrics.
+    """
+
+    def __init__(self, max_workers=8, whatsapp_api_url=None, whatsapp_phone_id=None, whatsapp_access_token=None, timeout=10,
+                 observer=None):
+        self.max_workers = max_workers
+        self.observer = observer
+        self.whatsapp_url = f"{whatsapp_api_url}/{whatsapp_phone_id}/messages"
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"Bearer {whatsapp_access_token}",
+            "Content-Type": "application/json"
+        })
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers) # one pooled connection per worker
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="notify")
+        self._pending = []
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def submit(self, channel, send_fn, *args):
+        """
+        Queue send_fn(*args). The future resolves to (success, detail): a send fails if it raises or returns False,
+        and detail is then the error message, otherwise the send's return value.
+        """
+        future = self._executor.submit(self._timed, channel, send_fn, *args)
+        with self._lock:
+            self._pending.append(future)
+        return future
+
+    def send_whatsapp(self, phone_number, subject, body, idempotency_key=None):
+        return self.submit("whatsapp", self._post_whatsapp, phone_number, subject, body, idempotency_key)
+
+    def wait(self):
+        """Block until every queued send has finished and return the per-channel stats"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        wait(pending)
+        return self.stats()
+
+    def stats(self):
+        with self._lock:
+            return {
+                channel: {
+                    "sent": s["sent"],
+                    "failed": s["failed"],
+                    "mean_latency_s": round(s["total_latency_s"] / (s["sent"] + s["failed"]), 4),
+                    "max_latency_s": round(s["max_latency_s"], 4)
+                }
+                for channel, s in self._stats.items()
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {}
+
+    def close(self):
+        self.wait()
+        self._executor.shutdown()
+        self.session.close()
+
+    def _timed(self, channel, send_fn, *args):
+        start = time.perf_counter()
+        try:
+            result = send_fn(*args)
+            success = result is not False
+        except Exception as e:
+            print(f" * Error sending {channel} notification: {e}")
+            result, success = str(e), False
+        latency = time.perf_counter() - start
+
+        with self._lock:
+            s = self._stats.setdefault(channel, {"sent": 0, "failed": 0, "total_latency_s": 0.0, "max_latency_s": 0.0})
+            s["sent" if success else "failed"] += 1
+            s["total_latency_s"] += latency
+            s["max_latency_s"] = max(s["max_latency_s"], latency)
+        if self.observer is not None:
+            self.observer(channel, success, latency)
+        return success, result
+
+    def _post_whatsapp(self, phone_number, subject, body, idempotency_key=None):
+        data = {
+            "messaging_product": "whatsapp",
+            "to": phone_number,      # single number
+            "type": "text",
+            "text": {"body": f"{subject}\n\n{body}"}
+        }
+        if idempotency_key:
+            data["biz_opaque_callback_data"] = idempotency_key # echoed back in delivery webhooks to match retries
+        response = self.session.post(self.whatsapp_url, json=data, timeout=self.timeout)
+        response.raise_for_status()
+        print(f" * WhatsApp message sent to {phone_number} successfully!")
+        return response.json()
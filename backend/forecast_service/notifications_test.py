@@ -0,0 +1,84 @@
+import unittest
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from notifications import NotificationDispatcher
+
+class StubWhatsappHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # keep-alive, so the dispatcher can reuse connections
+    delay = 0.2
+    received = []
+    connections = set()
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(self.delay)
+        StubWhatsappHandler.received.append(payload)
+        StubWhatsappHandler.connections.add(self.client_address)
+        status = 500 if payload["to"] == "fail" else 200
+        body = json.dumps({"messages": [{"id": payload["to"]}]}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class TestNotificationDispatcher(unittest.TestCase):
+    def setUp(self):
+        StubWhatsappHandler.received = []
+        StubWhatsappHandler.connections = set()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubWhatsappHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.dispatcher = NotificationDispatcher(
+            max_workers=4,
+            whatsapp_api_url=f"http://127.0.0.1:{self.server.server_port}",
+            whatsapp_phone_id="123",
+            whatsapp_access_token="token"
+        )
+
+    def tearDown(self):
+        self.dispatcher.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_sends_in_parallel_with_bounded_concurrency(self):
+        start = time.perf_counter()
+        for i in range(8):
+            self.dispatcher.send_whatsapp(f"+65{i}", "subject", "body")
+        stats = self.dispatcher.wait()
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(len(StubWhatsappHandler.received), 8)
+        self.assertLess(elapsed, 8 * StubWhatsappHandler.delay) # faster than one after the other
+        self.assertGreaterEqual(elapsed, 2 * StubWhatsappHandler.delay) # but never more than 4 at once
+        self.assertLessEqual(len(StubWhatsappHandler.connections), 4) # connections are reused
+        self.assertEqual(stats["whatsapp"]["sent"], 8)
+        self.assertEqual(stats["whatsapp"]["failed"], 0)
+        self.assertGreaterEqual(stats["whatsapp"]["max_latency_s"], StubWhatsappHandler.delay)
+
+    def test_counts_failures_per_channel(self):
+        self.dispatcher.send_whatsapp("fail", "subject", "body")
+        self.dispatcher.send_whatsapp("+651", "subject", "body")
+        self.dispatcher.submit("email", lambda *args: False, "a@b.com", "subject", "body")
+        self.dispatcher.submit("email", lambda *args: True, "c@d.com", "subject", "body")
+        stats = self.dispatcher.wait()
+
+        self.assertEqual((stats["whatsapp"]["sent"], stats["whatsapp"]["failed"]), (1, 1))
+        self.assertEqual((stats["email"]["sent"], stats["email"]["failed"]), (1, 1))
+
+    def test_observer_sees_every_send(self):
+        observed = []
+        self.dispatcher.observer = lambda channel, success, latency: observed.append((channel, success))
+        self.dispatcher.send_whatsapp("fail", "subject", "body")
+        self.dispatcher.submit("email", lambda *args: True, "c@d.com", "subject", "body")
+        self.dispatcher.wait()
+
+        self.assertEqual(sorted(observed), [("email", True), ("whatsapp", False)])
+
+if __name__ == '__main__':
+    unittest.main()
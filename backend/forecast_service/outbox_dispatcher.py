@@ -0,0 +1,161 @@
+from datetime import timedelta
+import os
+import sys
+import time
+from dotenv import load_dotenv
+
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.orm import sessionmaker
+from prometheus_client import Counter, Histogram, start_http_server
+
+from db_classes import *
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared")) # shared/ is copied next to the app in Docker
+from email_sender import EmailSender
+from notifications import NotificationDispatcher
+
+load_dotenv()
+
+# SQL Alchemy Setup
+engine = create_engine(os.environ.get("DATABASE_URL"), pool_size=2, max_overflow=2)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine) # claimed entries stay readable while sending
+
+# Notification Constants
+WHATSAPP_API_URL = os.getenv("WHATSAPP_API_URL", "https://graph.facebook.com/v22.0")
+WHATSAPP_PHONE_ID = os.getenv("WHATSAPP_PHONE_ID")
+WHATSAPP_ACCESS_TOKEN = os.getenv("WHATSAPP_ACCESS_TOKEN")
+SENDER_EMAIL = os.getenv("SENDER_EMAIL")
+SENDER_PASSWORD = os.getenv("SENDER_PASSWORD")
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true" # only disable for a local debugging server
+NOTIFICATION_WORKERS = int(os.getenv("NOTIFICATION_WORKERS", 8)) # concurrent sends across all channels
+
+# Metrics Setup
+METRICS_PORT = int(os.getenv("METRICS_PORT", 5012))
+SEND_SECONDS = Histogram("notification_send_seconds", "Latency of one notification send", ["channel", "outcome"],
+        buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+OUTBOX_ENTRIES = Counter("notification_outbox_entries", "Outbox entries processed by outcome", ["channel", "outcome"])
+
+notifier = NotificationDispatcher(NOTIFICATION_WORKERS, WHATSAPP_API_URL, WHATSAPP_PHONE_ID, WHATSAPP_ACCESS_TOKEN,
+        observer=lambda channel, success, latency: SEND_SECONDS.labels(channel, "sent" if success else "failed").observe(latency))
+emailer = EmailSender(SENDER_EMAIL, SENDER_PASSWORD, SMTP_HOST, SMTP_PORT, SMTP_STARTTLS) # kept open while the outbox has work
+
+# Outbox Constants
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 100))
+OUTBOX_POLL_INTERVAL_S = float(os.getenv("OUTBOX_POLL_INTERVAL_S", 2))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 5)) # then the entry is parked as FAILED
+OUTBOX_BACKOFF_BASE_S = float(os.getenv("OUTBOX_BACKOFF_BASE_S", 30)) # doubles after every failed attempt
+OUTBOX_BACKOFF_MAX_S = float(os.getenv("OUTBOX_BACKOFF_MAX_S", 3600))
+OUTBOX_LEASE_S = float(os.getenv("OUTBOX_LEASE_S", 300)) # a SENDING entry is claimable again after this, e.g. if its dispatcher died
+
+def runDispatcher():
+    try:
+        dbSession = SessionLocal()
+        print(" * Draining notification outbox...")
+        while True:
+            if dispatchBatch(dbSession) < OUTBOX_BATCH_SIZE: # outbox drained, idle until new alerts arrive
+                emailer.close()
+                time.sleep(OUTBOX_POLL_INTERVAL_S)
+    except KeyboardInterrupt:
+        print(" * Dispatcher interrupted manually by user")
+    finally:
+        notifier.close()
+        emailer.close()
+        dbSession.close()
+
+def dispatchBatch(dbSession):
+    """Claim one batch of due outbox entries, send it outside any transaction and record the outcome. Returns the number of entries claimed"""
+    try:
+        batch = claimOutboxBatch(dbSession, OUTBOX_BATCH_SIZE)
+    except Exception as e:
+        dbSession.rollback()
+        print(f" * Error claiming notification outbox entries:", str(e))
+        return 0
+    if not batch:
+        return 0
+
+    try:
+        notifier.reset_stats()
+        sends = [(entry, sendOutboxEntry(entry, notification)) for entry, notification in batch]
+        stats = notifier.wait()
+        outcomes = []
+        for entry, future in sends:
+            success, detail = future.result()
+            outcomes.append((entry.channel, recordOutcome(entry, success, detail)))
+        dbSession.commit()
+        for channel, outcome in outcomes: # counted once the outcome is stored
+            OUTBOX_ENTRIES.labels(channel, outcome).inc()
+    except Exception as e:
+        dbSession.rollback() # the claimed entries are retried once their lease expires
+        print(f" * Error dispatching notification outbox:", str(e))
+        return 0
+
+    for channel, channel_stats in stats.items():
+        print(f" * {channel}: {channel_stats['sent']} sent, {channel_stats['failed']} failed, "
+              f"mean {channel_stats['mean_latency_s']}s, max {channel_stats['max_latency_s']}s")
+    return len(batch)
+
+def claimOutboxBatch(dbSession, batch_size):
+    """Lease due entries (PENDING, or SENDING with an expired lease) to this dispatcher and commit, so no lock is held while sending"""
+    # SKIP LOCKED lets several dispatchers claim at once without taking the same entry
+    batch = dbSession.execute(
+        select(NotificationOutbox, Notification)
+        .join(Notification, Notification.id == NotificationOutbox.notification_id)
+        .where(NotificationOutbox.status.in_(["PENDING", "SENDING"]))
+        .where(NotificationOutbox.next_attempt_at <= func.localtimestamp()) # a SENDING entry's lease deadline
+        .order_by(NotificationOutbox.id)
+        .limit(batch_size)
+        .with_for_update(of=NotificationOutbox, skip_locked=True)
+    ).all()
+    claimed = [(entry, notification) for entry, notification in batch if claimEntry(entry)]
+    dbSession.commit()
+    for entry, _ in batch:
+        if entry.status == "FAILED": # counted once the outcome is stored
+            OUTBOX_ENTRIES.labels(entry.channel, "failed").inc()
+    return claimed
+
+def claimEntry(entry):
+    """Lease the entry for one send attempt. False when its lease expired on the last attempt, it is then FAILED"""
+    # Attempts are counted when claimed, so an entry whose dispatcher keeps dying mid-send still ends up FAILED
+    if entry.status == "SENDING" and entry.attempts >= OUTBOX_MAX_ATTEMPTS:
+        entry.status = "FAILED"
+        entry.last_error = "Lease expired before the send outcome was recorded"
+        return False
+    entry.status = "SENDING"
+    entry.attempts += 1
+    entry.next_attempt_at = func.localtimestamp() + timedelta(seconds=OUTBOX_LEASE_S)
+    return True
+
+def sendOutboxEntry(entry, notification):
+    if entry.channel == "whatsapp":
+        return notifier.send_whatsapp(entry.recipient, notification.subject, notification.body, entry.idempotency_key)
+    if entry.channel == "email":
+        return notifier.submit("email", emailer.send, entry.recipient, notification.subject, notification.body,
+                entry.idempotency_key.replace(":", "."))
+    return notifier.submit(entry.channel, unknownChannel, entry.channel)
+
+def unknownChannel(channel):
+    raise ValueError(f"Unknown notification channel: {channel}")
+
+def recordOutcome(entry, success, detail):
+    if success:
+        entry.status = "SENT"
+        entry.sent_at = func.localtimestamp()
+        entry.last_error = None
+    elif entry.attempts >= OUTBOX_MAX_ATTEMPTS:
+        entry.status = "FAILED"
+        entry.last_error = detail if isinstance(detail, str) else "Send failed"
+    else:
+        entry.status = "PENDING"
+        entry.next_attempt_at = func.localtimestamp() + timedelta(seconds=backoffSeconds(entry.attempts))
+        entry.last_error = detail if isinstance(detail, str) else "Send failed"
+    return "retry" if entry.status == "PENDING" else entry.status.lower()
+
+def backoffSeconds(attempts):
+    return min(OUTBOX_BACKOFF_BASE_S * 2 ** (attempts - 1), OUTBOX_BACKOFF_MAX_S)
+
+if __name__ == '__main__':
+    print(" * Notification outbox dispatcher running:" + os.path.basename(__file__) + "...")
+    start_http_server(METRICS_PORT)
+    print(f" * Serving metrics on port {METRICS_PORT}")
+    runDispatcher()
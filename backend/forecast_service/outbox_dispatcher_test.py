@@ -0,0 +1,127 @@
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+# outbox_dispatcher reads its settings on import, nothing connects until a test uses them
+os.environ.setdefault("DATABASE_URL", "postgresql://postgres@localhost/forecast_test")
+import outbox_dispatcher
+from outbox_dispatcher import NotificationOutbox
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL") # an empty, disposable Postgres DB, its tables are dropped
+
+def outboxEntry(status="SENDING", attempts=1):
+    return NotificationOutbox(notification_id=1, channel="email", recipient="a@example.com",
+            idempotency_key="1:email", status=status, attempts=attempts)
+
+@patch.object(outbox_dispatcher, "OUTBOX_MAX_ATTEMPTS", 3)
+class TestRecordOutcome(unittest.TestCase):
+    def test_sent_entry_is_done(self):
+        entry = outboxEntry()
+        entry.last_error = "Timed out"
+
+        self.assertEqual(outbox_dispatcher.recordOutcome(entry, True, "wamid.1"), "sent")
+        self.assertEqual(entry.status, "SENT")
+        self.assertIsNotNone(entry.sent_at)
+        self.assertIsNone(entry.last_error)
+
+    def test_failed_entry_is_retried_after_a_backoff(self):
+        entry = outboxEntry(attempts=2)
+
+        with patch.object(outbox_dispatcher, "backoffSeconds", wraps=outbox_dispatcher.backoffSeconds) as backoffSeconds:
+            self.assertEqual(outbox_dispatcher.recordOutcome(entry, False, "HTTP 500"), "retry")
+        backoffSeconds.assert_called_once_with(2)
+        self.assertEqual(entry.status, "PENDING")
+        self.assertEqual(entry.last_error, "HTTP 500")
+        self.assertIsNotNone(entry.next_attempt_at)
+
+    def test_entry_fails_on_its_last_attempt(self):
+        entry = outboxEntry(attempts=3)
+
+        self.assertEqual(outbox_dispatcher.recordOutcome(entry, False, None), "failed")
+        self.assertEqual(entry.status, "FAILED")
+        self.assertEqual(entry.last_error, "Send failed")
+
+    def test_claim_counts_the_attempt_and_leases_the_entry(self):
+        entry = outboxEntry(status="PENDING", attempts=0)
+        self.assertTrue(outbox_dispatcher.claimEntry(entry))
+        self.assertEqual((entry.status, entry.attempts), ("SENDING", 1))
+
+        expired = outboxEntry(status="SENDING", attempts=3) # its dispatcher died during the last attempt
+        self.assertFalse(outbox_dispatcher.claimEntry(expired))
+        self.assertEqual((expired.status, expired.attempts), ("FAILED", 3))
+
+class TestBackoffSeconds(unittest.TestCase):
+    @patch.object(outbox_dispatcher, "OUTBOX_BACKOFF_BASE_S", 30)
+    @patch.object(outbox_dispatcher, "OUTBOX_BACKOFF_MAX_S", 200)
+    def test_backoff_doubles_up_to_the_cap(self):
+        self.assertEqual([outbox_dispatcher.backoffSeconds(attempts) for attempts in range(1, 6)], [30, 60, 120, 200, 200])
+
+class TestDispatchBatch(unittest.TestCase):
+    def test_claim_is_committed_before_sending(self):
+        events = []
+        dbSession = MagicMock()
+        dbSession.commit.side_effect = lambda: events.append("commit")
+        entry, notification = outboxEntry(status="PENDING", attempts=0), MagicMock()
+        dbSession.execute.return_value.all.return_value = [(entry, notification)]
+        future = MagicMock()
+        future.result.return_value = (True, "sent")
+        def send(*args):
+            events.append(("send", entry.status))
+            return future
+
+        with patch.object(outbox_dispatcher, "sendOutboxEntry", side_effect=send), \
+                patch.object(outbox_dispatcher, "notifier") as notifier:
+            notifier.wait.return_value = {}
+            self.assertEqual(outbox_dispatcher.dispatchBatch(dbSession), 1)
+
+        self.assertEqual(events, ["commit", ("send", "SENDING"), "commit"])
+        self.assertEqual(entry.status, "SENT")
+
+@unittest.skipUnless(TEST_DATABASE_URL, "TEST_DATABASE_URL is not set")
+class TestClaimOutboxBatchPostgres(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_engine(TEST_DATABASE_URL)
+        outbox_dispatcher.base.metadata.drop_all(cls.engine)
+        outbox_dispatcher.base.metadata.create_all(cls.engine)
+        cls.Session = sessionmaker(bind=cls.engine, expire_on_commit=False)
+        with cls.Session() as dbSession:
+            dbSession.add(outbox_dispatcher.BusinessUnit(alias="B1"))
+            dbSession.flush()
+            dbSession.add(outbox_dispatcher.Employee(id="E1", name="Ann", email="e1@example.com", phone_number="1",
+                    role="manager", business_unit="B1", password_hash="x", created_at=outbox_dispatcher.func.localtimestamp()))
+            dbSession.flush()
+            dbSession.add(outbox_dispatcher.Notification(id=1, employee_id="E1", type="alert", subject="Alert", body="Body"))
+            dbSession.flush()
+            dbSession.add_all([NotificationOutbox(notification_id=1, channel="email", recipient=f"{i}@example.com",
+                    idempotency_key=f"1:{i}") for i in range(3)])
+            dbSession.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        outbox_dispatcher.base.metadata.drop_all(cls.engine)
+        cls.engine.dispose()
+
+    def test_claimed_entries_are_leased_without_holding_locks(self):
+        with self.Session() as first, self.Session() as second:
+            claimed = outbox_dispatcher.claimOutboxBatch(first, 2)
+            self.assertFalse(first.in_transaction())
+
+            # Another dispatcher neither waits on nor re-claims the leased entries
+            self.assertEqual([entry.recipient for entry, _ in outbox_dispatcher.claimOutboxBatch(second, 10)], ["2@example.com"])
+            self.assertEqual([entry.recipient for entry, _ in claimed], ["0@example.com", "1@example.com"])
+
+            first.execute(NotificationOutbox.__table__.update()
+                    .where(NotificationOutbox.id == claimed[0][0].id)
+                    .values(next_attempt_at=outbox_dispatcher.func.localtimestamp() - outbox_dispatcher.timedelta(seconds=1)))
+            first.commit() # the first dispatcher died and its lease ran out
+            reclaimed = outbox_dispatcher.claimOutboxBatch(second, 10)
+            self.assertEqual([(entry.recipient, entry.attempts) for entry, _ in reclaimed], [("0@example.com", 2)])
+            statuses = second.scalars(select(NotificationOutbox.status).order_by(NotificationOutbox.id)).all()
+            self.assertEqual(statuses, ["SENDING"] * 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+from dateutil.relativedelta import relativedelta
+import numpy as np
+
+
+class PNLSnapshot:
+    """
+    Read-only panel of every PNL entry in the widest window a forecast run needs, fetched once and
+    shared by the training and forecasting phases. Each phase reads its own window from it.
+    """
+
+    def __init__(self, latest_date, pnl_codes, business_units, months, values, trends):
+        # One element per PNL entry, in month order as returned by the query
+        self._latest_date = latest_date
+        keys = np.char.add(np.char.add(np.asarray(pnl_codes, dtype=str), "::"), np.asarray(business_units, dtype=str))
+        series_keys, series_idx = np.unique(keys, return_inverse=True)
+        trend_names, trend_idx = np.unique(np.char.lower(np.asarray(trends, dtype=str)), return_inverse=True)
+
+        self._series_keys = series_keys
+        self._series_idx = series_idx
+        self._trend_names = trend_names
+        self._trend_idx = trend_idx
+        self._months = np.asarray(months, dtype="datetime64[D]")
+        self._values = np.asarray(values, dtype=float) # None (NULL) becomes NaN
+        for array in (self._series_keys, self._series_idx, self._trend_idx, self._months, self._values):
+            array.flags.writeable = False
+
+    @property
+    def latest_date(self):
+        return self._latest_date
+
+    @property
+    def trends(self):
+        return tuple(self._trend_names.tolist())
+
+    def window(self, trend_name, n_months):
+        """Series of a trend over the last n_months, in the { key: [values], "months": [...] } model input format"""
+        cutoff = np.datetime64(self._latest_date - relativedelta(months=n_months), "D")
+        in_window = self._months > cutoff
+
+        output_data = {}
+        trend_matches = np.flatnonzero(self._trend_names == trend_name)
+        if len(trend_matches):
+            rows = np.flatnonzero(in_window & (self._trend_idx == trend_matches[0]))
+            # Rank series by their first row inside the window, which is where the row-by-row grouping met them
+            _, first_row, window_series_idx = np.unique(self._series_idx[rows], return_index=True, return_inverse=True)
+            window_rank = np.empty_like(first_row)
+            window_rank[np.argsort(first_row, kind="stable")] = np.arange(len(first_row))
+            window_rank = window_rank[window_series_idx]
+            order = np.lexsort((self._months[rows], window_rank)) # group by series, months ascending
+            rows, window_rank = rows[order], window_rank[order]
+            boundaries = np.flatnonzero(np.diff(window_rank)) + 1
+            for series_rows in np.split(rows, boundaries) if len(rows) else []:
+                output_data[str(self._series_keys[self._series_idx[series_rows[0]]])] = self._values[series_rows].tolist()
+        output_data["months"] = [month.strftime("%m-%Y") for month in np.unique(self._months[in_window]).astype(object)]
+        return output_data
@@ -0,0 +1,99 @@
+from datetime import date
+import math
+import unittest
+
+from dateutil.relativedelta import relativedelta
+
+from snapshot import PNLSnapshot
+
+LATEST_DATE = date(2025, 6, 1)
+ROWS = [ # (pnl_code, business_unit, month, value, trend) in month order, like the snapshot query returns them
+    ("4000", "B1", date(2024, 11, 1), 1.0, "Seasonal"),
+    ("5000", "B1", date(2024, 11, 1), 9.0, "static"),
+    ("4000", "B1", date(2024, 12, 1), 2.0, "Seasonal"),
+    ("4100", "B2", date(2024, 12, 1), 5.0, "SEASONAL"),
+    ("4000", "B1", date(2025, 1, 1), None, "Seasonal"),
+    ("4100", "B2", date(2025, 1, 1), 6.0, "SEASONAL"),
+    ("5000", "B1", date(2025, 1, 1), 10.0, "static"),
+    ("4100", "B2", date(2025, 4, 1), 7.0, "SEASONAL"),
+    ("4000", "B1", date(2025, 4, 1), 3.0, "Seasonal"),
+    ("5000", "B1", date(2025, 6, 1), 11.0, "static"),
+]
+
+TREND_SET = ["seasonal", "static", "growth"]
+
+def groupRows(rows, latest_date, n_months):
+    """The per-row grouping retrieveTrainingData/retrieveForecastingData did before the snapshot, NULL kept as NaN"""
+    months = []
+    output_data = {trend_name: {} for trend_name in TREND_SET}
+    for pnl_code, business_unit, month, value, trend in rows:
+        if month <= latest_date - relativedelta(months=n_months):
+            continue
+        trend_name = trend.lower()
+        key = pnl_code + "::" + business_unit
+        mth = month.strftime("%m-%Y")
+        if mth not in months:
+            months.append(mth)
+        output_data[trend_name].setdefault(key, []).append(float(value) if value is not None else math.nan)
+    for trend in output_data:
+        output_data[trend]["months"] = months
+    return output_data
+
+def makeSnapshot(rows, latest_date=LATEST_DATE):
+    pnl_codes, business_units, months, values, trends = zip(*rows) if rows else ([], [], [], [], [])
+    return PNLSnapshot(latest_date, pnl_codes, business_units, months, values, trends)
+
+class TestPNLSnapshot(unittest.TestCase):
+    def assertSameWindow(self, window, expected):
+        # NaN != NaN, so compare values through repr
+        self.assertEqual(list(window), list(expected))
+        self.assertEqual({key: repr(values) for key, values in window.items()}, {key: repr(values) for key, values in expected.items()})
+
+    def test_windows_match_the_per_row_grouping(self):
+        snapshot = makeSnapshot(ROWS)
+
+        for n_months in (8, 6, 5, 2, 1): # the whole snapshot, cutoffs on and between entry months
+            expected = groupRows(ROWS, LATEST_DATE, n_months)
+            for trend_name in TREND_SET:
+                with self.subTest(n_months=n_months, trend_name=trend_name):
+                    self.assertSameWindow(snapshot.window(trend_name, n_months), expected[trend_name])
+
+    def test_cutoff_month_is_excluded(self):
+        window = makeSnapshot(ROWS).window("seasonal", 5) # cutoff 01-2025
+
+        self.assertEqual(window["months"], ["04-2025", "06-2025"])
+        self.assertEqual(window, {"4100::B2": [7.0], "4000::B1": [3.0], "months": ["04-2025", "06-2025"]})
+
+    def test_series_follow_month_order_when_rows_arrive_unsorted(self):
+        rows = sorted(ROWS, key=lambda row: row[2], reverse=True)
+        window = makeSnapshot(rows).window("seasonal", 8)
+
+        self.assertEqual(window["4000::B1"][:2] + window["4000::B1"][3:], [1.0, 2.0, 3.0])
+        self.assertTrue(math.isnan(window["4000::B1"][2]))
+        self.assertEqual(window["4100::B2"], [5.0, 6.0, 7.0])
+        self.assertEqual(window["months"], ["11-2024", "12-2024", "01-2025", "04-2025", "06-2025"])
+
+    def test_trend_names_are_lowercased(self):
+        snapshot = makeSnapshot(ROWS)
+
+        self.assertEqual(snapshot.trends, ("seasonal", "static"))
+        self.assertEqual(list(snapshot.window("seasonal", 8)), ["4000::B1", "4100::B2", "months"])
+        self.assertEqual(snapshot.window("Seasonal", 8), {"months": snapshot.window("seasonal", 8)["months"]})
+
+    def test_null_values_become_nan(self):
+        values = makeSnapshot(ROWS).window("seasonal", 8)["4000::B1"]
+
+        self.assertIsInstance(values[2], float)
+        self.assertTrue(math.isnan(values[2]))
+
+    def test_trend_without_entries_only_has_months(self):
+        self.assertEqual(makeSnapshot(ROWS).window("growth", 8), {"months": ["11-2024", "12-2024", "01-2025", "04-2025", "06-2025"]})
+
+    def test_empty_snapshot(self):
+        snapshot = makeSnapshot([])
+
+        self.assertEqual(snapshot.trends, ())
+        self.assertEqual(snapshot.window("seasonal", 24), {"months": []})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,6 +4,8 @@ import re
 from dateutil.relativedelta import relativedelta
 from zoneinfo import ZoneInfo
 import os
+import sys
+import uuid
 from dotenv import load_dotenv
 
 from flask import Flask, jsonify, request
@@ -14,6 +16,9 @@ from flask_cors import CORS
 import redis
 
 from db_classes import *
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared")) # shared/ is copied next to the app in Docker
+from kpi_engine import calculateKPIMatrix, kpiRowToDict
+from run_status import RunStatus
 
 pd.set_option('display.max_columns', None)
 load_dotenv() # only for local development with .env file >> loads variables into system environment
@@ -30,7 +35,9 @@ CORS(app)
 # Redis Producer
 REDIS_URL = os.environ.get("REDIS_URL").split(":")
 producer = redis.Redis(host=REDIS_URL[0], port=REDIS_URL[1])
-REDIS_TOPIC = os.environ.get("REDIS_TOPIC")
+REDIS_TOPIC = os.environ.get("REDIS_TOPIC") # Redis stream the forecast service consumes as a group
+REDIS_STREAM_MAXLEN = int(os.environ.get("REDIS_STREAM_MAXLEN", 1000)) # trim old, already-acknowledged triggers
+RUN_STATUS_TTL_S = int(os.environ.get("RUN_STATUS_TTL_S", 7 * 24 * 3600)) # how long a run's status can be polled
 
 # Constants
 timezone = ZoneInfo(os.environ.get("TIMEZONE"))
@@ -430,6 +437,25 @@ def getPNLForecastsByCodeAndBU(pnl_code, bu_alias):
         }
     ), 404
 
+@app.route("/forecast/status/<run_id>/")
+def getForecastRunStatus(run_id):
+    status = RunStatus.read(producer, run_id)
+
+    if status:
+        return jsonify(
+            {
+                "code": 200,
+                "data": status
+            }
+        ), 200
+    return jsonify(
+        {
+            "code": 404,
+            "data": {},
+            "message": "No forecast run found :("
+        }
+    ), 404
+
 @app.route("/forecast/sales/<bu_alias>/")
 def getNext3MonthsSalesPNLForecastsByBU(bu_alias):
     latest_date = getLatestPNLEntryDate(bu_alias)
@@ -814,9 +840,11 @@ def loadData(month):
 
     # Calculate and insert KPIs into DB
     df["Code"] = df["Code"].str.strip() # Strip all whitespaces for Code column
+    bus = list(df.columns)[2:]
+    bu_kpi_dicts = calculateKPIsPerBU(df, bus) # all BUs in one pass
     bu_kpis = {}
-    for bu in list(df.columns)[2:]:
-        added_kpis = insertKPIEntriesPerBU(df, bu, month) # Insert once and get change log
+    for bu in bus:
+        added_kpis = insertKPIEntriesPerBU(bu_kpi_dicts[bu], bu, month) # Insert once and get change log
         output_data["kpi_entries"].extend(added_kpis) # Add to output data
         bu_kpis[bu] = { entry["kpi_alias"]:entry["value"] for entry in added_kpis } # Store KPI - value mappings for each BU for notifications
 
@@ -824,13 +852,14 @@ def loadData(month):
         db.session.commit()
         # db.session.rollback() # For testing
         
-        # Trigger Forecast Service
-        triggerForecastService()
+        # Trigger Forecast Service for the series this upload created or changed
+        run_id = publishForecastTrigger(changedScope(month, output_data["pnl_entries"]))
 
         return jsonify(
             {
                 "code": 200,
                 "data": output_data,
+                "run_id": run_id, # poll /forecast/status/<run_id>/ for progress
                 "message": "Data has been loaded successfully. :) Triggering Machine Learning retraining and forecast generation..."
             }
         ), 200
@@ -1069,16 +1098,15 @@ def insertPNLEntriesPerRow(series, month_str):
 
     return output_entries
 
-def insertKPIEntriesPerBU(df, bu, month_str):
+def calculateKPIsPerBU(df, bus):
+    entries = df.drop_duplicates(subset="Code", keep="last") # a repeated code counts once, last row wins
+    values = entries[bus].apply(lambda col: pd.to_numeric(col.str.strip(), errors="coerce")) # non-numeric cells are skipped
+    kpi_matrix = calculateKPIMatrix(entries["Code"].tolist(), values.to_numpy(dtype=float).T) # one row per BU
+    return {bu: kpiRowToDict(kpi_row) for bu, kpi_row in zip(bus, kpi_matrix)}
+
+def insertKPIEntriesPerBU(kpi_dict, bu, month_str):
     output_data = []
     month = datetime.strptime(month_str, "%m-%Y").date()
-    entry_dict = df.set_index("Code")[bu].to_dict() # convert to Code-Value dict for PNL entries
-
-    kpi_dict = { # calculate KPIs and consolidate
-        **calculateProfitKPIs(entry_dict),
-        **calculateSalesKPIs(entry_dict),
-        **calculateCostKPIs(entry_dict)
-    }
 
     for kpi_alias, kpi_value in kpi_dict.items():
         change_status = "unchanged"
@@ -1114,148 +1142,25 @@ def insertKPIEntriesPerBU(df, bu, month_str):
 
     return output_data
 
-def calculateProfitKPIs(entries):
-    output_data = {
-        "PROF": None, #TODO: Very arbitrary, currently just takes all the income minus all the costs
-        "GPM": None,
-        "OPM": None,
-        "NPM": None,
-        "QR": None
-    }
-    
-    # summing data
-    sales_revenue = 0
-    sales_adjustments = 0
-    other_incomes = 0
-    cogs = 0
-    op_expenses = 0
-    fin_expenses = 0
-    for code, val in entries.items():
-        if pd.isna(val): # skip if value is pd.NA (does not trigger ValueError because NaN is a special float value) or None
-            continue
-        try:
-            val = float(str(val).strip())
-        except ValueError:
-            continue  # skip if value cannot be converted to float (non-numeric)
-
-        if code.startswith("5000-") and code not in ["5000-A015", "5000-M004"]:
-            sales_revenue += val
-        if code.startswith("5500"):
-            sales_adjustments += val
-        if code.startswith("8") or code in ["5000-A015", "5000-M004"]:
-            other_incomes += val
-        if code.startswith("6"):
-            cogs += val
-        if code.startswith("901") or code.startswith("902"):
-            op_expenses += val
-        if code.startswith("900"):
-            fin_expenses += val
-
-    # intermediate calculations
-    net_sales = sales_revenue - sales_adjustments
-    all_expenses = op_expenses + fin_expenses
-    all_incomes = sales_revenue + other_incomes - sales_adjustments
-
-    # KPI calculations
-    output_data["PROF"] = round(all_incomes - cogs - all_expenses, 2)
-    output_data["GPM"] = round((sales_revenue - cogs) / sales_revenue * 100, 4) if sales_revenue != 0 else None
-    output_data["OPM"] = round((net_sales - cogs - op_expenses) / net_sales * 100, 4) if net_sales != 0 else None
-    output_data["NPM"] = round((all_incomes - cogs - all_expenses) / all_incomes * 100, 4) if all_incomes != 0 else None
-    output_data["QR"] = None
-
-    return output_data
-
-def calculateSalesKPIs(entries):
-    output_data = {
-        "SALES": None, #TODO: Very arbitrary, currently just sums all income except "Other Incomes"
-        "ROS": None,
-        "DSO": None,
-        "RT": None
-    }
-
-    # summing data
-    sales_revenue = 0
-    sales_adjustments = 0
-    cogs = 0
-    op_expenses = 0
-    for code, val in entries.items():
-        if pd.isna(val): # skip if value is pd.NA (does not trigger ValueError because NaN is a special float value) or None
-            continue
-        try:
-            val = float(str(val).strip())
-        except ValueError:
-            continue  # skip if value cannot be converted to float (non-numeric)
-
-        if code.startswith("5000-") and code not in ["5000-A015", "5000-M004"]:
-            sales_revenue += val
-        if code.startswith("5500"):
-            sales_adjustments += val
-        if code.startswith("6"):
-            cogs += val
-        if code.startswith("901") or code.startswith("902"):
-            op_expenses += val
-
-    # intermediate calculations
-    net_sales = sales_revenue - sales_adjustments
-    operating_profit = sales_revenue - sales_adjustments - cogs - op_expenses
-
-    # KPI calculations
-    output_data["SALES"] = round(net_sales, 2)
-    output_data["ROS"] = round(operating_profit / net_sales * 100, 4) if net_sales != 0 else None
-    output_data["DSO"] = None
-    output_data["RT"] = None
-
-    return output_data
-
-def calculateCostKPIs(entries):
-    output_data = {
-        "COST": None, #TODO: Very arbitrary, currently just sums all cogs and expenses
-        "COGSR": None,
-        "DPO": None,
-        "OHR": None
+def changedScope(month_str, pnl_entries):
+    changed = [entry for entry in pnl_entries if entry["change_status"] in ["created", "updated"]]
+    return {
+        "month": month_str,
+        "business_units": sorted({entry["business_unit"] for entry in changed}),
+        "codes": sorted({entry["pnl_code"] for entry in changed})
     }
 
-    # summing data
-    sales_revenue = 0
-    sales_adjustments = 0
-    cogs = 0
-    all_expenses = 0
-    overhead_costs = 0
-    for code, val in entries.items():
-        if pd.isna(val): # skip if value is pd.NA (does not trigger ValueError because NaN is a special float value) or None
-            continue
-        try:
-            val = float(str(val).strip())
-        except ValueError:
-            continue  # skip if value cannot be converted to float (non-numeric)
-
-        if code.startswith("5000-") and code not in ["5000-A015", "5000-M004"]:
-            sales_revenue += val
-        if code.startswith("5500"):
-            sales_adjustments += val
-        if code.startswith("6"):
-            cogs += val
-        if code.startswith("9"):
-            all_expenses += val
-        if code.startswith("902") or code.startswith("9000-D"):
-            overhead_costs += val
-
-    # intermediate calculations
-    net_sales = sales_revenue - sales_adjustments
-
-    # KPI calculations
-    output_data["COST"] = round(cogs + all_expenses, 2)
-    output_data["COGSR"] = round(cogs / net_sales * 100, 4) if net_sales != 0 else None
-    output_data["DPO"] = None
-    output_data["OHR"] = round(overhead_costs / net_sales * 100, 4) if net_sales != 0 else None
-
-    return output_data
-
 @app.route("/test/trigger/", methods=['POST'])
 def triggerForecastService(): #TODO test
-    message = json.dumps("initiate") # replace "initiate" with data in future if needed
-    producer.publish(REDIS_TOPIC, message)
-    return jsonify({"status": "success", "message": "Forecast service triggered"}), 200
+    run_id = publishForecastTrigger()
+    return jsonify({"status": "success", "message": "Forecast service triggered", "run_id": run_id}), 200
+
+def publishForecastTrigger(scope=None):
+    run_id = uuid.uuid4().hex
+    RunStatus.queue(producer, run_id, scope, RUN_STATUS_TTL_S) # pollable before a worker picks the run up
+    payload = {"run_id": run_id, **scope} if scope is not None else {"run_id": run_id, "full": True} # full reprocesses every series
+    producer.xadd(REDIS_TOPIC, {"message": json.dumps(payload)}, maxlen=REDIS_STREAM_MAXLEN, approximate=True) # persisted until a worker acks it
+    return run_id
 
 ######################## Helper Functions ########################
 # General
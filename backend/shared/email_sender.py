@@ -0,0 +1,94 @@
+import smtplib
+import threading
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+
+class EmailSender:
+    """
+    Sends plain-text emails over one authenticated SMTP session that stays open between messages,
+    so a batch of alerts pays for the connect, STARTTLS and login handshake once. A dropped session
+    is reopened and the message retried. Safe to share between threads; sends are serialised on the session.
+    """
+
+    def __init__(self, sender_email, sender_password, host="smtp.gmail.com", port=587, use_tls=True,
+                 sender_name="Traffic-light Simulation Hub", timeout=30, max_retries=1):
+        self.sender_email = sender_email
+        self.sender_password = sender_password
+        self.host = host
+        self.port = port
+        self.use_tls = use_tls
+        self.sender_name = sender_name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.connections_opened = 0
+
+        self._server = None
+        self._lock = threading.Lock()
+
+    def send(self, email, subject, body, message_id=None):
+        """
+        Send one email, reconnecting if the session was dropped. Returns True on success.
+        A stable message_id (e.g. an idempotency key) lets mail clients drop a resent duplicate.
+        """
+        message = MIMEMultipart()
+        message["From"] = f"{self.sender_name} <{self.sender_email}>"
+        message["To"] = email
+        message["Subject"] = subject
+        if message_id:
+            message["Message-ID"] = f"<{message_id}@{self.sender_email.split('@')[-1]}>"
+        message.attach(MIMEText(body, "plain"))
+
+        with self._lock:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    if self._server is None:
+                        self._connect()
+                    self._server.send_message(message)
+                    print(f" * Email sent to {email} successfully")
+                    return True
+                except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError) as e:
+                    self._disconnect() # stale or broken session, reopen on the next attempt
+                    error = e
+                except smtplib.SMTPException as e:
+                    error = e # rejected message, the session itself is still usable
+                    break
+        print(f" * Failed to send email to {email}: {error}")
+        return False
+
+    def close(self):
+        """End the session; the next send opens a new one"""
+        with self._lock:
+            if self._server is not None:
+                try:
+                    self._server.quit()
+                except (smtplib.SMTPException, OSError):
+                    pass
+                self._server = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls() # Upgrade the connection to a secure encrypted SSL/TLS connection
+            if self.sender_password:
+                server.login(self.sender_email, self.sender_password)
+        except Exception:
+            server.close()
+            raise
+        self._server = server
+        self.connections_opened += 1
+
+    def _disconnect(self):
+        if self._server is not None:
+            try:
+                self._server.close()
+            except OSError:
+                pass
+            self._server = None
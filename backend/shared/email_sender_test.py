@@ -0,0 +1,69 @@
+import unittest
+import socket
+
+from email_sender import EmailSender
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
+
+def freePort():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((session.peer, envelope.rcpt_tos, envelope.content.decode()))
+        return "250 Message accepted for delivery"
+
+@unittest.skipIf(Controller is None, "aiosmtpd is not installed")
+class TestEmailSender(unittest.TestCase):
+    def setUp(self):
+        self.handler = RecordingHandler()
+        self.port = freePort()
+        self.startServer()
+        self.sender = EmailSender("alerts@example.com", None, host="127.0.0.1", port=self.port, use_tls=False)
+
+    def tearDown(self):
+        self.sender.close()
+        self.stopServer()
+
+    def startServer(self):
+        self.controller = Controller(self.handler, hostname="127.0.0.1", port=self.port)
+        self.controller.start()
+
+    def stopServer(self):
+        if self.controller is not None:
+            self.controller.stop()
+            self.controller = None
+
+    def test_reuses_one_session_for_a_batch(self):
+        for i in range(5):
+            self.assertTrue(self.sender.send(f"user{i}@example.com", "Subject", f"Body {i}"))
+
+        self.assertEqual(len(self.handler.messages), 5)
+        self.assertEqual(self.sender.connections_opened, 1)
+        self.assertEqual(len({peer for peer, _, _ in self.handler.messages}), 1)
+        self.assertEqual(self.handler.messages[3][1], ["user3@example.com"])
+        self.assertIn("Body 3", self.handler.messages[3][2])
+
+    def test_reconnects_after_the_server_drops_the_session(self):
+        self.assertTrue(self.sender.send("user@example.com", "Subject", "Before"))
+        self.stopServer() # drops the open session
+        self.startServer()
+
+        self.assertTrue(self.sender.send("user@example.com", "Subject", "After"))
+        self.assertEqual(self.sender.connections_opened, 2)
+        self.assertEqual(len(self.handler.messages), 2)
+
+    def test_reports_failure_when_the_server_is_gone(self):
+        self.stopServer()
+        self.assertFalse(self.sender.send("user@example.com", "Subject", "Body"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+from functools import lru_cache
+import numpy as np
+
+# Buckets each P&L code can contribute to, decided by code prefix. A code may sit in several buckets.
+BUCKETS = (
+    "sales_revenue",
+    "sales_adjustments",
+    "other_incomes",
+    "cogs",
+    "op_expenses",
+    "fin_expenses",
+    "expenses",
+    "overhead_costs"
+)
+OTHER_INCOME_SALES_CODES = ("5000-A015", "5000-M004") # booked under 5000- but counted as other income
+
+# KPI aliases in output order, grouped like the Profit, Sales and Cost KPI categories
+PROFIT_KPIS = ("PROF", "GPM", "OPM", "NPM", "QR")
+SALES_KPIS = ("SALES", "ROS", "DSO", "RT")
+COST_KPIS = ("COST", "COGSR", "DPO", "OHR")
+KPI_ALIASES = PROFIT_KPIS + SALES_KPIS + COST_KPIS
+KPI_DECIMALS = {"PROF": 2, "SALES": 2, "COST": 2} # every other KPI is a percentage rounded to 4dp
+
+
+def codeBuckets(code):
+    """Bucket membership flags of a single P&L code, in BUCKETS order"""
+    return (
+        code.startswith("5000-") and code not in OTHER_INCOME_SALES_CODES,
+        code.startswith("5500"),
+        code.startswith("8") or code in OTHER_INCOME_SALES_CODES,
+        code.startswith("6"),
+        code.startswith("901") or code.startswith("902"),
+        code.startswith("900"),
+        code.startswith("9"),
+        code.startswith("902") or code.startswith("9000-D")
+    )
+
+@lru_cache(maxsize=32)
+def bucketMembership(codes):
+    """[n_codes, n_buckets] 0/1 matrix for a tuple of P&L codes, compiled once per distinct code set"""
+    membership = np.array([codeBuckets(code) for code in codes], dtype=float).reshape(len(codes), len(BUCKETS))
+    membership.flags.writeable = False
+    return membership
+
+def calculateKPIMatrix(codes, values):
+    """
+    KPIs for many P&L columns at once.
+    values is [n_columns, n_codes] (e.g. one row per BU and month), aligned with codes. Missing values are NaN
+    and are skipped. Returns [n_columns, len(KPI_ALIASES)] with NaN where a KPI is undefined.
+    """
+    values = np.nan_to_num(np.atleast_2d(np.asarray(values, dtype=float)), nan=0.0, posinf=0.0, neginf=0.0)
+    totals = values @ bucketMembership(tuple(codes))
+    sales_revenue, sales_adjustments, other_incomes, cogs, op_expenses, fin_expenses, expenses, overhead_costs = totals.T
+
+    # intermediate calculations
+    net_sales = sales_revenue - sales_adjustments
+    all_incomes = sales_revenue + other_incomes - sales_adjustments
+    profit = all_incomes - cogs - op_expenses - fin_expenses
+    operating_profit = net_sales - cogs - op_expenses
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        def percentage(numerator, denominator):
+            return np.where(denominator != 0, numerator / denominator * 100, np.nan)
+
+        undefined = np.full(len(values), np.nan)
+        kpis = {
+            "PROF": profit,
+            "GPM": percentage(sales_revenue - cogs, sales_revenue),
+            "OPM": percentage(operating_profit, net_sales),
+            "NPM": percentage(profit, all_incomes),
+            "QR": undefined,
+            "SALES": net_sales,
+            "ROS": percentage(operating_profit, net_sales),
+            "DSO": undefined,
+            "RT": undefined,
+            "COST": cogs + expenses,
+            "COGSR": percentage(cogs, net_sales),
+            "DPO": undefined,
+            "OHR": percentage(overhead_costs, net_sales)
+        }
+    return np.column_stack([kpis[alias] for alias in KPI_ALIASES])
+
+def kpiRowToDict(kpi_row):
+    """One row of calculateKPIMatrix as {kpi_alias: value}, rounded per KPI, None where undefined"""
+    return {
+        alias: None if np.isnan(value) else round(float(value), KPI_DECIMALS.get(alias, 4))
+        for alias, value in zip(KPI_ALIASES, kpi_row)
+    }
+
+def calculateKPIs(entries):
+    """All KPIs for one {pnl_code: value} mapping of numeric values"""
+    codes = list(entries.keys())
+    values = np.array([np.nan if value is None else value for value in entries.values()], dtype=float)
+    return kpiRowToDict(calculateKPIMatrix(codes, values)[0])
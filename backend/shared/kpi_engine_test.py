@@ -0,0 +1,48 @@
+import unittest
+import numpy as np
+
+from kpi_engine import KPI_ALIASES, bucketMembership, calculateKPIMatrix, calculateKPIs, kpiRowToDict
+
+class TestKPIEngine(unittest.TestCase):
+    def test_bucket_membership(self):
+        membership = bucketMembership(("5000-A000", "5000-A015", "9020-1", "9000-D1"))
+        np.testing.assert_array_equal(membership, [
+            [1, 0, 0, 0, 0, 0, 0, 0],
+            [0, 0, 1, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 1, 0, 1, 1],
+            [0, 0, 0, 0, 0, 1, 1, 1]
+        ])
+
+    def test_calculate_kpis(self):
+        kpis = calculateKPIs({
+            "5000-A000": 1000, "5000-A015": 50, "5500-1": 100, "6000-1": 400,
+            "9010-1": 100, "9020-1": 50, "9000-D1": 30, "8000-1": 20, "7000-1": 999, "6000-2": None
+        })
+        self.assertEqual(list(kpis.keys()), list(KPI_ALIASES))
+        self.assertEqual(kpis["PROF"], 390.0) # 1000 + 50 + 20 - 100 - 400 - 150 - 30
+        self.assertEqual(kpis["GPM"], 60.0)
+        self.assertEqual(kpis["OPM"], round(350 / 900 * 100, 4))
+        self.assertEqual(kpis["NPM"], round(390 / 970 * 100, 4))
+        self.assertEqual(kpis["SALES"], 900.0)
+        self.assertEqual(kpis["COST"], 580.0)
+        self.assertEqual(kpis["OHR"], round(80 / 900 * 100, 4))
+        self.assertIsNone(kpis["QR"])
+
+    def test_zero_sales_leaves_ratios_undefined(self):
+        kpis = calculateKPIs({"6000-1": 10, "9010-1": 5})
+        self.assertEqual(kpis["COST"], 15.0)
+        self.assertEqual(kpis["SALES"], 0.0)
+        for alias in ("GPM", "OPM", "ROS", "COGSR", "OHR"):
+            self.assertIsNone(kpis[alias])
+
+    def test_matrix_matches_per_column(self):
+        codes = ["5000-A000", "5500-1", "6000-1", "9020-1"]
+        values = np.array([[1000, 100, 400, np.nan], [0, 0, 10, 20], [500, 0, 0, 50]])
+        kpi_matrix = calculateKPIMatrix(codes, values)
+        self.assertEqual(kpi_matrix.shape, (3, len(KPI_ALIASES)))
+        for row, kpi_row in zip(values, kpi_matrix):
+            expected = calculateKPIs({code: value for code, value in zip(codes, row)})
+            self.assertEqual(kpiRowToDict(kpi_row), expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import time
+import redis
+
+STATUS_KEY_PREFIX = "forecast-run"
+STATUS_TTL_S = 7 * 24 * 3600
+
+
+def statusKey(run_id):
+    return f"{STATUS_KEY_PREFIX}:{run_id}:status"
+
+def now():
+    return datetime.now().astimezone().isoformat(timespec="seconds")
+
+
+class RunStatus:
+    """
+    Progress of a forecast run, kept in one small Redis hash per run ID so clients can poll it cheaply.
+    main_service queues the run; the forecast worker that picks it up records each phase with its timing.
+    Triggers coalesced into one run share the same status, and every one of their run IDs points at it.
+    Status writes are best effort and never fail the run itself.
+    observer, if given, is called with (phase name, duration_s) for every recorded phase, e.g. to feed metrics.
+    """
+
+    def __init__(self, redis_client, run_ids, ttl_s=STATUS_TTL_S, observer=None):
+        self.redis = redis_client
+        self.run_ids = list(dict.fromkeys(run_ids)) # unique, in trigger order
+        self.ttl_s = ttl_s
+        self.observer = observer
+        self.phases = []
+        self._started = None
+
+    @classmethod
+    def queue(cls, redis_client, run_id, scope=None, ttl_s=STATUS_TTL_S):
+        status = cls(redis_client, [run_id], ttl_s)
+        status._write({"run_id": run_id, "state": "QUEUED", "queued_at": now(), "scope": json.dumps(scope)})
+        return status
+
+    @staticmethod
+    def read(redis_client, run_id):
+        """The run's status as a dict, or None if the run is unknown or expired"""
+        fields = {key.decode(): value.decode() for key, value in redis_client.hgetall(statusKey(run_id)).items()}
+        if not fields:
+            return None
+        fields.setdefault("run_id", run_id)
+        for key in ["scope", "phases", "merged_run_ids"]:
+            if key in fields:
+                fields[key] = json.loads(fields[key])
+        if "duration_s" in fields:
+            fields["duration_s"] = float(fields["duration_s"])
+        return fields
+
+    def start(self):
+        self._started = time.perf_counter()
+        self.phases = []
+        self._write({"state": "RUNNING", "started_at": now(), "current_phase": "", "phases": "[]", "error": "",
+                "merged_run_ids": json.dumps(self.run_ids)})
+
+    @contextmanager
+    def phase(self, name):
+        """Time the enclosed block and record it as a phase of the run"""
+        started_at = now()
+        self._write({"current_phase": name})
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, started_at)
+
+    def record(self, name, duration_s, started_at=None):
+        """Record a phase that was timed elsewhere, e.g. in a worker process"""
+        self.phases.append({"name": name, "started_at": started_at, "duration_s": round(duration_s, 3)})
+        self._write({"phases": json.dumps(self.phases)})
+        if self.observer is not None:
+            self.observer(name, duration_s)
+
+    def finish(self, error=None):
+        duration_s = time.perf_counter() - self._started if self._started is not None else 0.0
+        self._write({"state": "FAILED" if error else "SUCCEEDED", "finished_at": now(), "current_phase": "",
+                "duration_s": round(duration_s, 3), "error": str(error) if error else ""})
+
+    def _write(self, fields):
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for run_id in self.run_ids:
+                pipe.hset(statusKey(run_id), mapping=fields)
+                pipe.expire(statusKey(run_id), self.ttl_s)
+            pipe.execute()
+        except redis.exceptions.RedisError as e:
+            print(f" * Could not update forecast run status:", str(e))
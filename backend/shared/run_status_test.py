@@ -0,0 +1,64 @@
+import unittest
+
+from run_status import RunStatus, statusKey
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class TestRunStatus(unittest.TestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+
+    def test_queued_run_is_readable(self):
+        RunStatus.queue(self.redis, "run1", {"codes": ["5000-A000"]})
+        status = RunStatus.read(self.redis, "run1")
+
+        self.assertEqual(status["state"], "QUEUED")
+        self.assertEqual(status["scope"], {"codes": ["5000-A000"]})
+        self.assertIsNone(RunStatus.read(self.redis, "unknown"))
+        self.assertGreater(self.redis.ttl(statusKey("run1")), 0)
+
+    def test_records_phases_for_every_coalesced_run(self):
+        RunStatus.queue(self.redis, "run1")
+        RunStatus.queue(self.redis, "run2")
+        status = RunStatus(self.redis, ["run1", "run2", "run1"])
+        status.start()
+        with status.phase("load"):
+            self.assertEqual(RunStatus.read(self.redis, "run2")["current_phase"], "load")
+        status.record("train:static", 1.23456, "2025-01-01T00:00:00+00:00")
+        status.finish()
+
+        for run_id in ["run1", "run2"]:
+            run = RunStatus.read(self.redis, run_id)
+            self.assertEqual(run["run_id"], run_id)
+            self.assertEqual(run["state"], "SUCCEEDED")
+            self.assertEqual(run["merged_run_ids"], ["run1", "run2"])
+            self.assertEqual([phase["name"] for phase in run["phases"]], ["load", "train:static"])
+            self.assertEqual(run["phases"][1]["duration_s"], 1.235)
+            self.assertIn("queued_at", run)
+            self.assertIn("finished_at", run)
+
+    def test_observer_sees_every_phase(self):
+        observed = []
+        status = RunStatus(self.redis, [], observer=lambda name, duration_s: observed.append(name))
+        status.start()
+        with status.phase("load"):
+            pass
+        status.record("forecast:static", 0.5)
+
+        self.assertEqual(observed, ["load", "forecast:static"])
+
+    def test_failed_run_keeps_the_error(self):
+        status = RunStatus(self.redis, ["run1"])
+        status.start()
+        status.finish(ValueError("boom"))
+
+        run = RunStatus.read(self.redis, "run1")
+        self.assertEqual(run["state"], "FAILED")
+        self.assertEqual(run["error"], "boom")
+
+if __name__ == '__main__':
+    unittest.main()